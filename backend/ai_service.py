@@ -1,22 +1,13 @@
-import hmac
 import json
-import os
-import requests
-from typing import List, Dict
-
-from dotenv import load_dotenv
-load_dotenv()
-
 import logging
+import time
+from typing import AsyncIterator, Dict, List, Tuple
 
-# Configure logging to write to the same file
-logging.basicConfig(
-    filename='app_error.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "your_openrouter_api_key_here")
+import http_client
+import metrics
+import model_router
+import prompts
+import resilience
 
 def get_platform_logo(platform: str):
     """
@@ -41,80 +32,218 @@ def get_platform_logo(platform: str):
             return url
     return "https://images.unsplash.com/photo-1516321318423-f06f85e504b3?w=800"
 
-def get_ai_recommendations(profile_data: Dict):
+class AIServiceError(model_router.InvalidOutput):
+    """Raised when the model returns no usable recommendations."""
+
+def build_recommendation_prompt(profile_data: Dict) -> str:
+    return prompts.recommendation_prompt(profile_data)
+
+def format_recommendations(data: Dict) -> Dict:
     """
-    Get job and course recommendations based on profile data using OpenRouter.
+    Ensure tags and skills are strings and replace banners with real logos.
     """
-    prompt = f"""
-    Based on the following user profile, suggest 5 relevant courses and 5 relevant jobs.
-    Return the response in a strict JSON format with keys 'courses' and 'jobs'.
-    Each course should have 'title', 'platform', 'link', 'banner_url', 'tags'.
-    IMPORTANT: For 'banner_url', try to provide a relevant educational image or logo.
-    Each job should have 'title', 'company', 'location', 'description', 'required_skills', 'link'.
+    for course in data.get('courses', []):
+        if isinstance(course.get('tags'), list):
+            course['tags'] = ", ".join(course['tags'])
+        
+        # Use real logos if platform is recognized
+        course['banner_url'] = get_platform_logo(course.get('platform', ''))
     
-    Profile:
-    Full Name: {profile_data.get('full_name')}
-    Skills: {profile_data.get('skills')}
-    Experience: {profile_data.get('experience')}
-    Education: {profile_data.get('education')}
-    Summary: {profile_data.get('summary')}
+    for job in data.get('jobs', []):
+        if isinstance(job.get('required_skills'), list):
+            job['required_skills'] = ", ".join(job['required_skills'])
+    return data
+
+def _json_content(result: Dict) -> Dict:
+    content = result['choices'][0]['message']['content'].strip()
+    # Clean up JSON if AI adds markdown backticks
+    if "```" in content:
+        start = content.find("{")
+        end = content.rfind("}") + 1
+        if start != -1 and end != 0:
+            content = content[start:end]
+    return json.loads(content)
+
+def _validate_recommendations(result: Dict) -> Dict:
+    data = _json_content(result)
+    # Validation and Formatting for Frontend
+    if not data.get('courses') or not data.get('jobs'):
+        raise AIServiceError("AI returned empty lists")
+    return format_recommendations(data)
+
+def _sender(endpoint: str, prompt: str):
+    def send(model: str):
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "response_format": { "type": "json_object" }
+        }
+        return resilience.call(endpoint, lambda: http_client.post_chat_completion(payload))
+    return send
+
+async def request_ai_recommendations(profile_data: Dict) -> Dict:
+    """
+    Ask OpenRouter for recommendations. Raises on network errors, malformed
+    JSON and empty results so callers can decide whether to cache the answer.
+    The model router picks the model and escalates on unusable output.
     """
+    prompt = build_recommendation_prompt(profile_data)
+    return await model_router.complete(
+        "recommendations", prompt, _sender("recommendations", prompt), _validate_recommendations
+    )
+
+class RecommendationStreamParser:
+    """
+    Incremental scanner over the streamed JSON. Emits ('courses' | 'jobs', item)
+    as soon as an object inside one of the top-level arrays is closed, without
+    waiting for the rest of the document. Text before the first '{' (such as a
+    markdown fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key = None
+        self._section = None
+        self._item_start = None
+        self._pos = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict]]:
+        items = []
+        self._buffer.append(chunk)
+        text = "".join(self._buffer)
+        self._buffer = [text]
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:i]
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "[" and self._depth == 2:
+                    self._section = self._last_key
+                elif ch == "{" and self._depth == 3 and self._section in ("courses", "jobs"):
+                    self._item_start = i
+            elif ch in "}]":
+                if ch == "}" and self._depth == 3 and self._item_start is not None:
+                    try:
+                        items.append((self._section, json.loads(text[self._item_start:i + 1])))
+                    except ValueError:
+                        pass
+                    self._item_start = None
+                elif ch == "]" and self._depth == 2:
+                    self._section = None
+                self._depth -= 1
+        self._pos = len(text)
+        # Nothing before the current item can be emitted again, so drop it
+        keep_from = self._item_start if self._item_start is not None else (
+            self._string_start if self._in_string else len(text))
+        self._buffer = [text[keep_from:]]
+        self._pos -= keep_from
+        if self._item_start is not None:
+            self._item_start -= keep_from
+        if self._in_string:
+            self._string_start -= keep_from
+        return items
+
+
+def format_item(section: str, item: Dict) -> Dict:
+    return format_recommendations({section: [item]})[section][0]
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": "google/gemini-2.0-flash-001", # High speed, good for simple logic
-        "messages": [
-            {"role": "user", "content": prompt}
-        ],
-        "response_format": { "type": "json_object" }
-    }
 
+async def stream_ai_recommendations(profile_data: Dict) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Stream recommendations from OpenRouter, yielding ('courses' | 'jobs', item)
+    pairs with logos already applied. Raises AIServiceError at the end if either
+    list came back empty.
+    """
+    prompt = build_recommendation_prompt(profile_data)
+    models = model_router.plan("recommendations", prompt)
+    for i, model in enumerate(models):
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "response_format": { "type": "json_object" }
+        }
+        # Streams are not retried or hedged (cards may already be on screen), but
+        # they honour and feed the shared circuit breaker.
+        breaker = resilience.breaker
+        if not breaker.allow():
+            raise resilience.CircuitOpenError(f"Circuit '{breaker.name}' is open")
+        parser = RecommendationStreamParser()
+        seen = set()
+        started = time.monotonic()
+        try:
+            async for delta in http_client.stream_chat_completion(payload):
+                for section, item in parser.feed(delta):
+                    seen.add(section)
+                    yield section, format_item(section, item)
+        except Exception as e:
+            if resilience.is_retryable(e):
+                breaker.record_failure()
+            metrics.llm_latency.observe(time.monotonic() - started, endpoint="stream", outcome="error")
+            raise
+        breaker.record_success()
+        metrics.llm_latency.observe(time.monotonic() - started, endpoint="stream", outcome="ok")
+        model_router.record("recommendations", model, seen == {"courses", "jobs"}, time.monotonic() - started)
+        if seen == {"courses", "jobs"}:
+            return
+        if seen or i == len(models) - 1:
+            # Cards are already on screen; the caller fills in what is missing
+            raise AIServiceError("AI returned empty lists")
+        model_router.escalated("recommendations", model)
+        logging.info(f"Streamed recommendations from {model} were empty; escalating to {models[i + 1]}")
+
+async def request_batch_recommendations(profiles: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Ask for recommendations for several profiles in one completion. `profiles`
+    maps an opaque id to profile data; the result maps ids to recommendations.
+    Ids the model skipped or answered with empty lists are left out, so the
+    caller can retry them one by one.
+    """
+    # The model sees short ordinals, which it echoes far more reliably (and
+    # cheaply) than long opaque keys
+    keys = {str(n): key for n, key in enumerate(profiles, 1)}
+    prompt = prompts.batch_prompt({n: profiles[key] for n, key in keys.items()})
+
+    def validate(result: Dict) -> Dict[str, Dict]:
+        answers = {}
+        for entry in _json_content(result).get("results", []):
+            key = keys.get(str(entry.get("id")))
+            if key is not None and entry.get("courses") and entry.get("jobs"):
+                answers[key] = format_recommendations({"courses": entry["courses"], "jobs": entry["jobs"]})
+        if not answers:
+            raise AIServiceError("AI returned no usable profiles")
+        return answers
+
+    return await model_router.complete("batch", prompt, _sender("batch", prompt), validate)
+
+async def get_ai_recommendations(profile_data: Dict):
+    """
+    Get job and course recommendations based on profile data using OpenRouter.
+    Falls back to static data if the call fails.
+    """
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            data=json.dumps(payload),
-            timeout=60
-        )
-        response.raise_for_status()
-        result = response.json()
-        content = result['choices'][0]['message']['content']
-        
-        # Clean up JSON if AI adds markdown backticks
-        content = content.strip()
-        if "```" in content:
-            start = content.find("{")
-            end = content.rfind("}") + 1
-            if start != -1 and end != 0:
-                content = content[start:end]
-        
-        data = json.loads(content)
-        
-        # Validation and Formatting for Frontend
-        if not data.get('courses') or not data.get('jobs'):
-            print("DEBUG: AI returned empty lists, using fallback data")
-            data = get_fallback_data()
-            
-        # Ensure tags and skills are strings and update logos
-        for course in data.get('courses', []):
-            if isinstance(course.get('tags'), list):
-                course['tags'] = ", ".join(course['tags'])
-            
-            # Use real logos if platform is recognized
-            course['banner_url'] = get_platform_logo(course.get('platform', ''))
-        
-        for job in data.get('jobs', []):
-            if isinstance(job.get('required_skills'), list):
-                job['required_skills'] = ", ".join(job['required_skills'])
-                
-        return data
+        return await request_ai_recommendations(profile_data)
     except Exception as e:
         logging.error(f"AI Recommendations Error: {e}", exc_info=True)
-        print(f"AI Service Error: {e}")
         return get_fallback_data()
 
 def get_fallback_data():
@@ -131,45 +260,20 @@ def get_fallback_data():
         ]
     }
 
-def parse_resume_to_profile(file_content: str):
+async def parse_resume_to_profile(file_content: str):
     """
     Parse resume text to extract profile details using OpenRouter.
     """
-    prompt = f"""
-    Extract personal information from this resume text and return it in a strict JSON format with keys:
-    'full_name', 'skills', 'experience', 'education', 'summary'.
-    
-    Resume Text:
-    {file_content}
-    """
+    prompt = prompts.resume_prompt(file_content)
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": "google/gemini-2.0-flash-001",
-        "messages": [
-            {"role": "user", "content": prompt}
-        ],
-        "response_format": { "type": "json_object" }
-    }
+    def validate(result: Dict) -> Dict:
+        data = _json_content(result)
+        if not isinstance(data, dict) or not any(data.get(key) for key in ("skills", "experience", "education")):
+            raise AIServiceError("AI returned no profile fields")
+        return data
 
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            data=json.dumps(payload),
-            timeout=60
-        )
-        response.raise_for_status()
-        result = response.json()
-        content = result['choices'][0]['message']['content']
-        # Clean up JSON if AI adds markdown backticks
-        if content.startswith("```json"):
-            content = content.replace("```json", "").replace("```", "").strip()
-        return json.loads(content)
+        return await model_router.complete("resume", prompt, _sender("resume", prompt), validate)
     except Exception as e:
-        print(f"AI Service Error during parsing: {e}")
+        logging.warning(f"Resume parsing failed: {e}")
         return None
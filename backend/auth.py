@@ -1,30 +1,29 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 import models, database
-
-from dotenv import load_dotenv
+from ttl_cache import TTLCache
 import os
 
-load_dotenv()
-
 # OpenSSL generate secret: openssl rand -hex 32
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Comma-separated usernames allowed to call the /admin endpoints
+ADMIN_USERNAMES = {u.strip() for u in os.getenv("ADMIN_USERNAMES", "").split(",") if u.strip()}
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Authenticated principals are cached by token subject to skip the users query
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+# Put the user id and active flag in the token itself so requests need no lookup at all.
+# A deactivated user keeps access until their token expires.
+AUTH_EMBED_CLAIMS = os.getenv("AUTH_EMBED_CLAIMS", "false").lower() in ("1", "true", "yes")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -36,12 +35,52 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+class Principal(NamedTuple):
+    id: int
+    username: str
+    is_active: bool
+
+_principals = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+def token_claims(user: models.User) -> dict:
+    claims = {"sub": user.username}
+    if AUTH_EMBED_CLAIMS:
+        claims.update({"uid": user.id, "act": bool(user.is_active)})
+    return claims
+
+def invalidate_user(username: str):
+    """
+    Drop the cached principal. Called for every ORM update or delete of a User
+    (see below), but only in this process: other workers keep their copy until
+    AUTH_CACHE_TTL_SECONDS runs out, which is the only bound across workers.
+    Bulk query.update()/delete() skips ORM events and must call this itself.
+    """
+    _principals.pop(username)
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # A rename leaves the old name in the attribute history
+    for username in {target.username, *inspect(target).attrs.username.history.deleted}:
+        if username:
+            invalidate_user(username)
+
+def principal_cache_stats():
+    return _principals.stats()
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    """
+    Identify the caller with as little database work as possible: from the
+    token claims, then the principal cache, then a narrow users query.
+    """
+    credentials_exception = _credentials_exception()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -49,7 +88,36 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
+    if "uid" in payload and "act" in payload:
+        principal = Principal(payload["uid"], username, bool(payload["act"]))
+    else:
+        principal = _principals.get(username)
+        if principal is None:
+            row = db.query(models.User.id, models.User.username, models.User.is_active).filter(
+                models.User.username == username
+            ).first()
+            if row is None:
+                raise credentials_exception
+            principal = Principal(row.id, row.username, bool(row.is_active))
+            _principals.set(username, principal)
+    if not principal.is_active:
         raise credentials_exception
+    return principal
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Full User row, for endpoints that need more than the id and username.
+    """
+    user = db.get(models.User, principal.id)
+    if user is None:
+        invalidate_user(principal.username)
+        raise _credentials_exception()
     return user
+
+async def get_current_admin(current_user: Principal = Depends(get_current_principal)):
+    if current_user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
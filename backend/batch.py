@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+import ai_service
+import database
+import models
+import rec_cache
+import recommender
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+# Profiles whose prompt inputs are shorter than this are packed together
+BATCH_PACK_MAX_CHARS = int(os.getenv("BATCH_PACK_MAX_CHARS", "1500"))
+BATCH_PACK_SIZE = int(os.getenv("BATCH_PACK_SIZE", "4"))
+
+# Summary of the most recent run in this process, reported on /stats
+last_run: Dict = {}
+
+
+async def _in_session(fn, *args):
+    """
+    Run a blocking database step on a worker thread with a session of its own,
+    so the event loop keeps serving requests while a large cohort is read or
+    written.
+    """
+    def run():
+        db = database.SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    return await asyncio.to_thread(run)
+
+
+def _select_profiles(db: Session, user_ids: Optional[List[int]], only_empty: bool) -> List[Tuple[int, int, Dict]]:
+    """
+    (id, version, prompt inputs) for each profile in the cohort, as plain
+    values so they outlive the session.
+    """
+    query = db.query(models.Profile)
+    if user_ids:
+        query = query.filter(models.Profile.user_id.in_(user_ids))
+    if only_empty:
+        query = query.filter((models.Profile.recommendations == None) | (models.Profile.recommendations == ""))
+    return [(profile.id, profile.version, rec_cache.prompt_inputs(profile)) for profile in query]
+
+
+def _input_size(profile_data: Dict) -> int:
+    return sum(len(value or "") for value in profile_data.values())
+
+
+async def _generate(
+    keys_to_inputs: Dict[str, Dict],
+    pack_results: Dict[str, Dict],
+    concurrency: int,
+    pack_size: int
+) -> Dict[str, Dict]:
+    """
+    Produce recommendations for every fingerprint, packing small profiles into
+    shared prompts. Anything a packed call misses is retried individually.
+    Individual calls cache their own results; packed answers are collected in
+    `pack_results` for the caller to store in bulk.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results: Dict[str, Dict] = {}
+
+    if pack_size > 1:
+        small = [k for k, data in keys_to_inputs.items() if _input_size(data) <= BATCH_PACK_MAX_CHARS]
+    else:
+        small = []
+    packed = set(small)
+    large = [k for k in keys_to_inputs if k not in packed]
+    packs = [small[i:i + pack_size] for i in range(0, len(small), pack_size)]
+
+    async def run_pack(keys: List[str]):
+        async with semaphore:
+            try:
+                answers = await ai_service.request_batch_recommendations({k: keys_to_inputs[k] for k in keys})
+            except Exception as e:
+                logging.error(f"Packed recommendation call failed: {e}", exc_info=True)
+                answers = {}
+        results.update(answers)
+        pack_results.update(answers)
+        await asyncio.gather(*(run_single(k) for k in keys if k not in answers))
+
+    async def run_single(key: str):
+        async with semaphore:
+            try:
+                # Goes through single-flight, so live requests for the same key share it
+                results[key] = await recommender.generate_recommendations(key, keys_to_inputs[key])
+            except Exception as e:
+                logging.error(f"Recommendation generation failed for {key[:12]}: {e}")
+
+    await asyncio.gather(*(run_pack(p) for p in packs), *(run_single(k) for k in large))
+    return results
+
+
+def _save(db: Session, updates: List[Dict]) -> int:
+    """
+    Write recommendations back, skipping profiles edited since they were
+    loaded: their version moved on, so the answer belongs to old inputs.
+    Bulk statements skip ORM events, so the version is bumped here.
+    """
+    if not updates:
+        return 0
+    Profile = models.Profile.__table__
+    stmt = (
+        update(Profile)
+        .where(Profile.c.id == bindparam("profile_id"), Profile.c.version == bindparam("loaded_version"))
+        .values(recommendations=bindparam("payload"), version=Profile.c.version + 1)
+    )
+    result = db.execute(stmt, updates)
+    db.commit()
+    if db.get_bind().dialect.supports_sane_multi_rowcount:
+        return result.rowcount
+    return len(updates)
+
+
+async def warm_recommendations(
+    user_ids: Optional[List[int]] = None,
+    only_empty: bool = True,
+    concurrency: int = BATCH_CONCURRENCY,
+    pack_size: int = BATCH_PACK_SIZE
+) -> Dict:
+    """
+    Fill Profile.recommendations for a cohort. Profiles are grouped by prompt
+    fingerprint, served from the shared cache where possible, generated with
+    bounded parallelism otherwise, and written back in a single transaction.
+    """
+    started = time.perf_counter()
+    profiles = await _in_session(_select_profiles, user_ids, only_empty)
+    groups: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    inputs: Dict[str, Dict] = {}
+    for profile_id, version, data in profiles:
+        key = rec_cache.fingerprint(data)
+        groups[key].append((profile_id, version))
+        inputs[key] = data
+
+    cached = await _in_session(rec_cache.store.get_many, list(groups))
+    missing = {key: data for key, data in inputs.items() if key not in cached}
+    pack_results: Dict[str, Dict] = {}
+    generated = await _generate(missing, pack_results, concurrency, pack_size) if missing else {}
+    if pack_results:
+        await _in_session(rec_cache.store.set_many, pack_results)
+
+    results = {**cached, **generated}
+    updates = [
+        {"profile_id": profile_id, "loaded_version": version, "payload": json.dumps(results[key])}
+        for key, members in groups.items() if key in results
+        for profile_id, version in members
+    ]
+    updated = await _in_session(_save, updates)
+
+    summary = {
+        "profiles": len(profiles),
+        "fingerprints": len(groups),
+        "cache_hits": len(cached),
+        "generated": len(generated),
+        "failed": len(missing) - len(generated),
+        "updated": updated,
+        "stale": len(updates) - updated,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    last_run.clear()
+    last_run.update(summary)
+    logging.info(f"Batch recommendations: {summary}")
+    return summary
+
+
+async def run_in_background(user_ids: Optional[List[int]], only_empty: bool):
+    try:
+        await warm_recommendations(user_ids=user_ids, only_empty=only_empty)
+    except Exception as e:
+        logging.error(f"Batch recommendations failed: {e}", exc_info=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import http_client
+
+    parser = argparse.ArgumentParser(description="Generate recommendations for many profiles at once")
+    parser.add_argument("--user-ids", type=int, nargs="*", help="limit to these users")
+    parser.add_argument("--all", action="store_true", help="include profiles that already have recommendations")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--pack-size", type=int, default=BATCH_PACK_SIZE)
+    args = parser.parse_args()
+
+    async def main():
+        try:
+            summary = await warm_recommendations(
+                user_ids=args.user_ids, only_empty=not args.all,
+                concurrency=args.concurrency, pack_size=args.pack_size
+            )
+            print(json.dumps(summary, indent=2))
+        finally:
+            await http_client.close_client()
+
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""
+Side-by-side comparison of two `bench.run` reports.
+
+    python -m bench.compare before.json after.json
+"""
+import argparse
+import json
+from typing import Dict, Optional
+
+METRICS = [
+    # (label, path into the scenario result, higher is better)
+    ("rps", ("throughput_rps",), True),
+    ("p50 ms", ("latency_ms", "p50"), False),
+    ("p95 ms", ("latency_ms", "p95"), False),
+    ("p99 ms", ("latency_ms", "p99"), False),
+    ("err %", ("error_rate",), False),
+]
+
+
+def _get(result: Dict, path) -> Optional[float]:
+    for key in path:
+        result = (result or {}).get(key)
+    return result
+
+
+def _change(before: Optional[float], after: Optional[float]) -> str:
+    if before is None or after is None:
+        return "n/a"
+    if before == 0:
+        return "same" if after == 0 else "new"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(before: Dict, after: Dict) -> Dict:
+    out = {}
+    for name in before.get("scenarios", {}):
+        if name not in after.get("scenarios", {}):
+            continue
+        b, a = before["scenarios"][name], after["scenarios"][name]
+        out[name] = {
+            label: {"before": _get(b, path), "after": _get(a, path), "change": _change(_get(b, path), _get(a, path))}
+            for label, path, _ in METRICS
+        }
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args(argv)
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    result = compare(before, after)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"before {before['meta'].get('git_commit')}  after {after['meta'].get('git_commit')}")
+    for name, rows in result.items():
+        print(f"\n{name}")
+        for label, row in rows.items():
+            print(f"  {label:<7} {str(row['before']):>10} -> {str(row['after']):>10}  {row['change']}")
+
+
+if __name__ == "__main__":
+    main()
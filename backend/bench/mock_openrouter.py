@@ -0,0 +1,187 @@
+"""
+Local stand-in for the OpenRouter chat completions API, so benchmarks never
+touch the network. Latency, jitter, error rates and streaming speed are
+configurable; answers are valid for every prompt the backend sends.
+
+    python -m bench.mock_openrouter --port 9100 --latency-ms 800 --jitter-ms 300 --error-rate 0.02
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class Settings:
+    def __init__(self):
+        self.latency_ms = float(os.getenv("MOCK_LATENCY_MS", "500"))
+        self.jitter_ms = float(os.getenv("MOCK_JITTER_MS", "200"))
+        # Fraction of calls that fail, and how many of those are 429 rather than 500
+        self.error_rate = float(os.getenv("MOCK_ERROR_RATE", "0"))
+        self.rate_limit_share = float(os.getenv("MOCK_RATE_LIMIT_SHARE", "0.5"))
+        # Streaming: characters per delta and the pause between deltas
+        self.stream_chunk_chars = int(os.getenv("MOCK_STREAM_CHUNK_CHARS", "40"))
+        self.stream_delay_ms = float(os.getenv("MOCK_STREAM_DELAY_MS", "20"))
+        self.seed = os.getenv("MOCK_SEED")
+        # Models with "lite" in the name answer this much faster, and return an
+        # unusable (empty) answer this often, to exercise cheap-first routing
+        self.lite_latency_factor = float(os.getenv("MOCK_LITE_LATENCY_FACTOR", "0.5"))
+        self.lite_invalid_rate = float(os.getenv("MOCK_LITE_INVALID_RATE", "0.05"))
+
+
+settings = Settings()
+stats = {"requests": 0, "errors": 0, "streams": 0, "models": {}}
+_random = random.Random(settings.seed)
+_PROFILE_ID_RE = re.compile(r"Profile id: (\S+)")
+
+app = FastAPI(title="Mock OpenRouter")
+
+
+def _recommendations(seed: int) -> Dict:
+    return {
+        "courses": [
+            {
+                "title": f"Course {seed}-{i}",
+                "platform": ["Coursera", "Udemy", "edX"][i % 3],
+                "link": f"https://example.com/course/{seed}/{i}",
+                "banner_url": "",
+                "tags": ["python", "ml", "ros2"][: 1 + i % 3],
+            }
+            for i in range(5)
+        ],
+        "jobs": [
+            {
+                "title": f"Intern {seed}-{i}",
+                "company": f"Company {i}",
+                "location": "Remote",
+                "description": "Work on interesting problems with a friendly team. " * 3,
+                "required_skills": ["python", "sql"],
+                "link": f"https://example.com/job/{seed}/{i}",
+            }
+            for i in range(5)
+        ],
+    }
+
+
+def _is_lite(model: str) -> bool:
+    return "lite" in model
+
+
+def _answer(prompt: str, model: str) -> str:
+    seed = abs(hash(prompt)) % 10000
+    if _is_lite(model) and _random.random() < settings.lite_invalid_rate:
+        return json.dumps({"courses": [], "jobs": []})
+    if "Extract personal information" in prompt:
+        return json.dumps({
+            "full_name": "Bench User",
+            "skills": ["Python", "ROS2", "SQL"],
+            "experience": "Two internships in robotics software.",
+            "education": "BSc Computer Engineering",
+            "summary": "Robotics and backend enthusiast.",
+        })
+    ids = _PROFILE_ID_RE.findall(prompt)
+    if ids:
+        return json.dumps({"results": [dict(id=profile_id, **_recommendations(seed + n)) for n, profile_id in enumerate(ids)]})
+    return json.dumps(_recommendations(seed))
+
+
+def _delay(model: str) -> float:
+    latency = max(0.0, settings.latency_ms + _random.uniform(-settings.jitter_ms, settings.jitter_ms)) / 1000.0
+    return latency * settings.lite_latency_factor if _is_lite(model) else latency
+
+
+def _maybe_error():
+    if settings.error_rate and _random.random() < settings.error_rate:
+        stats["errors"] += 1
+        if _random.random() < settings.rate_limit_share:
+            return JSONResponse({"error": {"message": "Rate limited"}}, status_code=429, headers={"Retry-After": "1"})
+        return JSONResponse({"error": {"message": "Upstream failure"}}, status_code=500)
+    return None
+
+
+def _usage(prompt: str, content: str) -> Dict:
+    # Roughly four characters per token, like the real tokenizers on English text
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+@app.get("/models")
+async def models():
+    return {"data": [{"id": "google/gemini-2.0-flash-lite-001"}, {"id": "google/gemini-2.0-flash-001"}]}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+    model = body.get("model", "mock")
+    stats["models"][model] = stats["models"].get(model, 0) + 1
+    content = _answer(prompt, model)
+
+    if not body.get("stream"):
+        await asyncio.sleep(_delay(model))
+        error = _maybe_error()
+        if error is not None:
+            return error
+        return {
+            "id": f"mock-{time.time_ns()}",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": _usage(prompt, content),
+        }
+
+    stats["streams"] += 1
+    # Time to first token is the configured latency; the rest trickles in
+    await asyncio.sleep(_delay(model))
+    error = _maybe_error()
+    if error is not None:
+        return error
+    chunks: List[str] = [content[i:i + settings.stream_chunk_chars] for i in range(0, len(content), settings.stream_chunk_chars)]
+
+    async def events():
+        for chunk in chunks:
+            yield "data: " + json.dumps({"model": model, "choices": [{"index": 0, "delta": {"content": chunk}}]}) + "\n\n"
+            await asyncio.sleep(settings.stream_delay_ms / 1000.0)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield "data: " + json.dumps({"model": model, "choices": [], "usage": _usage(prompt, content)}) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock OpenRouter server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=settings.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=settings.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=settings.error_rate)
+    parser.add_argument("--rate-limit-share", type=float, default=settings.rate_limit_share)
+    parser.add_argument("--stream-chunk-chars", type=int, default=settings.stream_chunk_chars)
+    parser.add_argument("--stream-delay-ms", type=float, default=settings.stream_delay_ms)
+    parser.add_argument("--seed", default=settings.seed)
+    parser.add_argument("--lite-latency-factor", type=float, default=settings.lite_latency_factor)
+    parser.add_argument("--lite-invalid-rate", type=float, default=settings.lite_invalid_rate)
+    args = parser.parse_args()
+    for name in ("latency_ms", "jitter_ms", "error_rate", "rate_limit_share", "stream_chunk_chars", "stream_delay_ms", "seed",
+                 "lite_latency_factor", "lite_invalid_rate"):
+        setattr(settings, name, getattr(args, name))
+    _random.seed(settings.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,240 @@
+"""
+Benchmark runner. By default it starts the mock OpenRouter server and the app
+(uvicorn, fresh SQLite database in a temp dir), runs the chosen scenarios and
+prints one JSON document with throughput, latency percentiles and error rates.
+
+    cd backend
+    python -m bench.run --requests 200 --concurrency 20 --output before.json
+    python -m bench.run --scenarios auth cached_recommendations --latency-ms 1500
+    python -m bench.run --app-url http://localhost:8000   # an already running app
+
+Compare two runs with `python -m bench.compare before.json after.json`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench import scenarios
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_USERNAME = "bench-admin"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} during startup")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def _stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+@contextmanager
+def local_servers(args):
+    """
+    Start the mock upstream and the app as subprocesses; yields the app URL.
+    """
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    mock_port, app_port = _free_port(), _free_port()
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "bench.mock_openrouter", "--port", str(mock_port),
+         "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+         "--error-rate", str(args.error_rate), "--stream-delay-ms", str(args.stream_delay_ms),
+         "--seed", str(args.seed)],
+        cwd=BACKEND_DIR,
+    )
+    app = None
+    try:
+        _wait_ready(f"http://127.0.0.1:{mock_port}/models", mock)
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            OPENROUTER_BASE_URL=f"http://127.0.0.1:{mock_port}",
+            OPENROUTER_API_KEY="bench",
+            ADMIN_USERNAMES=ADMIN_USERNAME,
+            UPLOAD_DIR=os.path.join(workdir, "uploads"),
+            EMBEDDING_DIR=os.path.join(workdir, "embeddings"),
+            LOG_FILE=os.path.join(workdir, "app.log"),
+            HTTP_WARMUP="false",
+            # Every simulated user shares one IP and loops on expensive routes;
+            # pass --app-env RATE_LIMIT_ENABLED=true to measure the limiter itself
+            RATE_LIMIT_ENABLED="false",
+            LLM_DAILY_TOKEN_QUOTA="0",
+        )
+        env.update(dict(item.split("=", 1) for item in args.app_env))
+        app = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port),
+             "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+            cwd=BACKEND_DIR,
+            env=env,
+        )
+        app_url = f"http://127.0.0.1:{app_port}"
+        _wait_ready(f"{app_url}/stats", app)
+        yield app_url
+    finally:
+        if app is not None:
+            _stop(app)
+        _stop(mock)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(q / 100.0 * len(sorted_values) + 0.4999)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], errors: int, elapsed: float) -> Dict:
+    latencies = sorted(latencies)
+    total = len(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / total) if total else None,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]) if total else None,
+        },
+        "status_codes": dict(sorted(statuses.items())),
+    }
+
+
+async def run_scenario(app_url: str, scenario: scenarios.Scenario, concurrency: int, timeout: float) -> Dict:
+    limits = httpx.Limits(max_connections=concurrency + 5, max_keepalive_connections=concurrency + 5)
+    async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+        await scenario.setup(client, concurrency)
+        latencies: List[float] = []
+        statuses: Dict[str, int] = {}
+        errors = 0
+        next_index = 0
+
+        async def worker():
+            nonlocal next_index, errors
+            while next_index < scenario.requests:
+                i = next_index
+                next_index += 1
+                started = time.perf_counter()
+                try:
+                    response = await scenario.op(client, i)
+                    # Streaming and export bodies count until the last byte
+                    await response.aread()
+                    status = str(response.status_code)
+                    failed = response.is_error
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                    failed = True
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+                errors += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        result = summarize(latencies, statuses, errors, time.perf_counter() - started)
+    result["description"] = scenario.description
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, app_url: str) -> Dict:
+    results = {}
+    for name in args.scenarios:
+        scenario = scenarios.SCENARIOS[name](args.requests)
+        print(f"running {name} ({args.requests} ops, concurrency {args.concurrency})", file=sys.stderr)
+        results[name] = await run_scenario(app_url, scenario, args.concurrency, args.timeout)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API against a mock OpenRouter")
+    parser.add_argument("--scenarios", nargs="+", choices=scenarios.names(), default=scenarios.names())
+    parser.add_argument("--requests", type=int, default=100, help="timed operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request client timeout in seconds")
+    parser.add_argument("--app-url", help="benchmark a running app instead of starting one (its LLM settings are its own)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local app")
+    parser.add_argument("--app-env", nargs="*", default=[], metavar="KEY=VALUE", help="extra environment for the local app")
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream-delay-ms", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "git_commit": _git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+        }
+    }
+    if args.app_url:
+        report["scenarios"] = asyncio.run(run(args, args.app_url))
+    else:
+        with local_servers(args) as app_url:
+            report["scenarios"] = asyncio.run(run(args, app_url))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark scenarios. Each scenario prepares its own users and data in
+`setup`, outside the timed section, then `op(client, i)` performs the i-th
+timed operation and returns the response (non-2xx counts as an error).
+"""
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+PASSWORD = "bench-password"
+
+RESUME_TEXT = """Bench User
+Robotics software engineer. Skills: Python, ROS2, SQL, Docker.
+Experience: two internships building navigation stacks.
+Education: BSc Computer Engineering.
+"""
+
+
+def _profile(n: int) -> Dict:
+    return {
+        "full_name": f"Bench User {n}",
+        "skills": ["Python, SQL", "ROS2, C++, Python", "React, TypeScript, Node"][n % 3],
+        "experience": "Two internships in software engineering.",
+        "education": "BSc Computer Engineering",
+        "summary": f"Benchmark profile number {n}.",
+    }
+
+
+async def register(client: httpx.AsyncClient, username: str) -> httpx.Response:
+    return await client.post("/register", json={"username": username, "email": f"{username}@bench.local", "password": PASSWORD})
+
+
+async def login(client: httpx.AsyncClient, username: str) -> httpx.Response:
+    return await client.post("/token", json={"username": username, "email": "", "password": PASSWORD})
+
+
+async def new_user(client: httpx.AsyncClient, prefix: str, username: Optional[str] = None) -> Dict[str, str]:
+    """
+    Register (if needed) and log in; returns auth headers.
+    """
+    username = username or f"{prefix}-{uuid.uuid4().hex[:10]}"
+    response = await register(client, username)
+    if response.status_code not in (200, 400):
+        response.raise_for_status()
+    response = await login(client, username)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class Scenario:
+    name = ""
+    description = ""
+
+    def __init__(self, requests: int):
+        self.requests = requests
+
+    async def setup(self, client: httpx.AsyncClient, concurrency: int):
+        pass
+
+    async def op(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        raise NotImplementedError
+
+
+class AuthBurst(Scenario):
+    name = "auth"
+    description = "register a new user then log in (one op = both calls)"
+
+    async def setup(self, client, concurrency):
+        self.run_id = uuid.uuid4().hex[:8]
+
+    async def op(self, client, i):
+        username = f"auth-{self.run_id}-{i}"
+        response = await register(client, username)
+        if response.is_error:
+            return response
+        return await login(client, username)
+
+
+class ProfileRecommendations(Scenario):
+    name = "profile_recommendations"
+    description = "save a changed profile, then fetch recommendations (cold, hits the LLM)"
+
+    async def setup(self, client, concurrency):
+        self.headers = [await new_user(client, "prof") for _ in range(concurrency)]
+
+    async def op(self, client, i):
+        headers = self.headers[i % len(self.headers)]
+        profile = _profile(i)
+        # A unique summary changes the prompt, so every op misses the cache
+        profile["summary"] += f" Revision {uuid.uuid4().hex}."
+        response = await client.post("/profile", json=profile, headers=headers)
+        if response.is_error:
+            return response
+        return await client.get("/recommendations", headers=headers)
+
+
+class CachedRecommendations(Scenario):
+    name = "cached_recommendations"
+    description = "GET /recommendations for profiles whose recommendations are already stored"
+
+    async def setup(self, client, concurrency):
+        self.headers = []
+        for n in range(concurrency):
+            headers = await new_user(client, "cached")
+            (await client.post("/profile", json=_profile(n), headers=headers)).raise_for_status()
+            (await client.get("/recommendations", headers=headers)).raise_for_status()
+            self.headers.append(headers)
+
+    async def op(self, client, i):
+        return await client.get("/recommendations", headers=self.headers[i % len(self.headers)])
+
+
+class StreamRecommendations(Scenario):
+    name = "stream_recommendations"
+    description = "GET /recommendations/stream?refresh=true, timed until the final SSE event"
+
+    async def setup(self, client, concurrency):
+        self.headers = []
+        for n in range(concurrency):
+            headers = await new_user(client, "stream")
+            (await client.post("/profile", json=_profile(n), headers=headers)).raise_for_status()
+            self.headers.append(headers)
+
+    async def op(self, client, i):
+        return await client.get("/recommendations/stream", params={"refresh": "true"}, headers=self.headers[i % len(self.headers)])
+
+
+class ResumeUpload(Scenario):
+    name = "resume_upload"
+    description = "upload a distinct small text resume (parsing continues in the background)"
+
+    async def setup(self, client, concurrency):
+        self.headers = [await new_user(client, "resume") for _ in range(concurrency)]
+
+    async def op(self, client, i):
+        content = (RESUME_TEXT + f"\nRevision {uuid.uuid4().hex}\n").encode("utf-8")
+        files = {"file": (f"resume-{i}.txt", content, "text/plain")}
+        return await client.post("/profile/resume", files=files, headers=self.headers[i % len(self.headers)])
+
+
+class UserExport(Scenario):
+    name = "export"
+    description = "GET /export/{csv,json,jsonl,xlsx} for the user's own profile"
+    formats = ("csv", "json", "jsonl", "xlsx")
+
+    async def setup(self, client, concurrency):
+        self.headers = []
+        for n in range(concurrency):
+            headers = await new_user(client, "export")
+            (await client.post("/profile", json=_profile(n), headers=headers)).raise_for_status()
+            self.headers.append(headers)
+
+    async def op(self, client, i):
+        format = self.formats[i % len(self.formats)]
+        return await client.get(f"/export/{format}", headers=self.headers[i % len(self.headers)])
+
+
+class BulkExport(Scenario):
+    name = "bulk_export"
+    description = "admin streams every user as CSV/JSONL (needs the admin user in ADMIN_USERNAMES)"
+    formats = ("csv", "jsonl")
+
+    def __init__(self, requests: int, admin_username: str = "bench-admin"):
+        super().__init__(requests)
+        self.admin_username = admin_username
+
+    async def setup(self, client, concurrency):
+        self.headers = await new_user(client, "admin", self.admin_username)
+
+    async def op(self, client, i):
+        format = self.formats[i % len(self.formats)]
+        return await client.get(f"/admin/export/{format}", headers=self.headers)
+
+
+SCENARIOS: Dict[str, Callable[..., Scenario]] = {
+    cls.name: cls
+    for cls in (AuthBurst, ProfileRecommendations, CachedRecommendations, StreamRecommendations, ResumeUpload,
+                UserExport, BulkExport)
+}
+
+
+def names() -> List[str]:
+    return list(SCENARIOS)
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+import ai_service
+import database
+import models
+from skills import normalize_skill, parse_skills
+
+# Re-check the tables for new rows at most this often
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# How much an exact skill/tag match counts relative to text relevance
+SKILL_WEIGHT = 2.0
+MAX_QUERY_TERMS = 32
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or our the this to with we you your will".split()
+)
+def tokenize(text: Optional[str]) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+class CatalogIndex:
+    """
+    Inverted index over one catalog table. Skills get their own postings and text
+    (title + description) is scored with BM25. Term weights are computed at build
+    time and postings are stored as NumPy arrays, so a query is a handful of
+    vectorized scatter-adds followed by a partial sort.
+    """
+
+    def __init__(self, docs: List[Dict], text_fields: Tuple[str, ...], skill_field: str):
+        self.docs = docs
+        self.skill_idf: Dict[str, float] = {}
+        self.term_idf: Dict[str, float] = {}
+
+        skill_lists: Dict[str, List[int]] = defaultdict(list)
+        term_freqs = []
+        lengths = []
+        for i, doc in enumerate(docs):
+            for skill in parse_skills(doc.get(skill_field)):
+                skill_lists[skill].append(i)
+            tokens = []
+            for field in text_fields:
+                tokens.extend(tokenize(doc.get(field)))
+            term_freqs.append(Counter(tokens))
+            lengths.append(len(tokens))
+
+        n = len(docs) or 1
+        avgdl = (sum(lengths) / n) or 1.0
+        doc_freq = Counter()
+        for tf in term_freqs:
+            doc_freq.update(tf.keys())
+        for term, df in doc_freq.items():
+            self.term_idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+        term_ids: Dict[str, List[int]] = defaultdict(list)
+        term_weights: Dict[str, List[float]] = defaultdict(list)
+        for i, tf in enumerate(term_freqs):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[i] / avgdl)
+            for term, freq in tf.items():
+                term_ids[term].append(i)
+                term_weights[term].append(self.term_idf[term] * freq * (BM25_K1 + 1) / (freq + norm))
+
+        self.term_postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            term: (np.array(ids, dtype=np.int32), np.array(term_weights[term], dtype=np.float32))
+            for term, ids in term_ids.items()
+        }
+        self.skill_postings: Dict[str, np.ndarray] = {
+            skill: np.array(ids, dtype=np.int32) for skill, ids in skill_lists.items()
+        }
+        for skill, ids in skill_lists.items():
+            self.skill_idf[skill] = math.log(1 + n / len(ids))
+
+    def search(self, skills: Iterable[str], terms: Iterable[str], k: int = 5) -> List[Dict]:
+        if not self.docs:
+            return []
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for skill in set(skills):
+            ids = self.skill_postings.get(skill)
+            if ids is not None:
+                scores[ids] += SKILL_WEIGHT * self.skill_idf[skill]
+        # Rarest terms carry the most signal; cap the query length to bound latency
+        known = sorted({t for t in terms if t in self.term_idf}, key=self.term_idf.get, reverse=True)
+        for term in known[:MAX_QUERY_TERMS]:
+            ids, weights = self.term_postings[term]
+            scores[ids] += weights
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [dict(self.docs[i]) for i in top if scores[i] > 0]
+
+
+_JOB_FIELDS = ("title", "company", "location", "description", "required_skills", "link")
+_COURSE_FIELDS = ("title", "platform", "link", "banner_url", "tags")
+
+_indexes: Dict[str, CatalogIndex] = {}
+_stamps: Dict[str, Tuple[int, int]] = {}
+_last_check = 0.0
+_lock: Optional[asyncio.Lock] = None
+
+
+def _table_stamp(db, model) -> Tuple[int, int]:
+    count, max_id = db.query(func.count(model.id), func.max(model.id)).one()
+    return count or 0, max_id or 0
+
+
+def _rows(db, model, fields) -> List[Dict]:
+    columns = [getattr(model, f) for f in fields]
+    return [dict(zip(fields, row)) for row in db.query(*columns).yield_per(5000)]
+
+
+def _refresh_indexes():
+    db = database.SessionLocal()
+    try:
+        for name, model, fields, text_fields, skill_field in (
+            ("jobs", models.Job, _JOB_FIELDS, ("title", "description"), "required_skills"),
+            ("courses", models.Course, _COURSE_FIELDS, ("title", "tags"), "tags"),
+        ):
+            stamp = _table_stamp(db, model)
+            if _stamps.get(name) == stamp:
+                continue
+            started = time.perf_counter()
+            _indexes[name] = CatalogIndex(_rows(db, model, fields), text_fields, skill_field)
+            _stamps[name] = stamp
+            logging.info(f"Catalog index '{name}' built: {stamp[0]} rows in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+async def ensure_indexes():
+    """
+    Build or rebuild the indexes off the event loop when the tables changed.
+    """
+    global _last_check, _lock
+    if _indexes and time.monotonic() - _last_check < CATALOG_REFRESH_SECONDS:
+        return
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        if _indexes and time.monotonic() - _last_check < CATALOG_REFRESH_SECONDS:
+            return
+        await asyncio.to_thread(_refresh_indexes)
+        _last_check = time.monotonic()
+
+
+def search(profile_data: Dict, k: int = 5) -> Optional[Dict]:
+    """
+    Rank catalog jobs and courses for a profile using the indexes already in memory.
+    Returns None when the catalog is empty.
+    """
+    jobs_index = _indexes.get("jobs")
+    courses_index = _indexes.get("courses")
+    if not (jobs_index and jobs_index.docs) and not (courses_index and courses_index.docs):
+        return None
+
+    skills = parse_skills(profile_data.get("skills"))
+    terms = [t for s in skills for t in tokenize(s)]
+    terms += tokenize(profile_data.get("summary"))
+    terms += tokenize(profile_data.get("education"))
+
+    courses = courses_index.search(skills, terms, k) if courses_index else []
+    for course in courses:
+        if not course.get("banner_url"):
+            course["banner_url"] = ai_service.get_platform_logo(course.get("platform") or "")
+    jobs = jobs_index.search(skills, terms, k) if jobs_index else []
+    return {"courses": courses, "jobs": jobs}
+
+
+async def recommend(profile_data: Dict, k: int = 5) -> Optional[Dict]:
+    await ensure_indexes()
+    return search(profile_data, k)
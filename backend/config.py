@@ -0,0 +1,44 @@
+import json
+import logging
+import os
+
+from dotenv import load_dotenv
+
+# Imported before any module that reads settings at import time, so values in
+# .env are visible to all of them. Runs once per process.
+load_dotenv()
+
+LOG_FILE = os.getenv("LOG_FILE", "app_error.log")  # empty string logs to stderr
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# One JSON object per line, for log collectors
+LOG_JSON = os.getenv("LOG_JSON", "false").lower() in ("1", "true", "yes")
+
+_logging_configured = False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def setup_logging():
+    """
+    Configure the root logger once, however many modules or app instances ask.
+    """
+    global _logging_configured
+    if _logging_configured:
+        return
+    logging.basicConfig(filename=LOG_FILE or None, level=LOG_LEVEL, format=LOG_FORMAT)
+    if LOG_JSON:
+        for handler in logging.getLogger().handlers:
+            handler.setFormatter(JsonFormatter())
+    _logging_configured = True
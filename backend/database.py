@@ -1,23 +1,85 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
 
+import config  # noqa: F401  loads .env before the settings below are read
+import metrics
+
 # Default to local SQLite, but use DATABASE_URL if available (for production)
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
 
-# Fix for Postgres URLs which often use 'postgres://' (standard in Heroku/Render) 
+# Fix for Postgres URLs which often use 'postgres://' (standard in Heroku/Render)
 # but SQLAlchemy requires 'postgresql://'
 if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
     SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-# SQLite requires specific connect_args, Postgres does not
-if "sqlite" in SQLALCHEMY_DATABASE_URL:
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+
+# Each gunicorn worker has its own pool, so the most connections the app can
+# open is workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW). Keep that below the
+# server's max_connections (Render's smaller Postgres plans allow ~100).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle before managed Postgres / proxies drop idle connections
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Connections opened at worker startup so the first requests skip the handshake
+DB_WARM_CONNECTIONS = int(os.getenv("DB_WARM_CONNECTIONS", "1"))
+
+# SQLite: milliseconds a writer waits for the lock before "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Optional async engine, e.g. postgresql+asyncpg://... or sqlite+aiosqlite:///...
+# Derived from DATABASE_URL when not set; only created on first use.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+if not ASYNC_DATABASE_URL:
+    if IS_SQLITE:
+        ASYNC_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    else:
+        ASYNC_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
+def _pool_options() -> dict:
+    if IS_SQLITE:
+        # SQLite connections are cheap and file locks do the limiting. Without
+        # unlimited overflow, async endpoints waiting on hashing or the LLM can
+        # hold every pooled connection and the next checkout blocks the loop.
+        return {
+            "connect_args": {"check_same_thread": False},
+            "poolclass": QueuePool,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": -1,
+        }
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while a writer holds the lock; NORMAL sync is
+    # durable across app crashes and only risks the last commit on power loss.
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_pool_options())
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+metrics.instrument_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -29,3 +91,58 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def upsert(table):
+    """
+    INSERT supporting .on_conflict_do_update(), for SQLite and Postgres alike.
+    """
+    return (sqlite if IS_SQLITE else postgresql).insert(table)
+
+
+def warm_up(connections: int = DB_WARM_CONNECTIONS):
+    """
+    Open pool connections ahead of traffic. Fails fast if the database is down.
+    """
+    opened = [engine.connect() for _ in range(max(1, connections))]
+    for conn in opened:
+        conn.close()
+
+
+_async_engine = None
+AsyncSessionLocal = None
+
+
+def get_async_engine():
+    """
+    Lazily create the async engine. Needs the async driver for the database
+    (asyncpg or aiosqlite) to be installed.
+    """
+    global _async_engine, AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+        options = _pool_options()
+        options.pop("connect_args", None)
+        options.pop("poolclass", None)
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **options)
+        if IS_SQLITE:
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        AsyncSessionLocal = sessionmaker(
+            _async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    global _async_engine, AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        AsyncSessionLocal = None
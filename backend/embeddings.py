@@ -0,0 +1,327 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import ai_service
+import database
+import models
+
+# Vectors live in flat float32 files that every worker memory-maps read-only, so
+# the OS page cache holds a single copy no matter how many workers are running.
+EMBEDDING_DIR = os.getenv("EMBEDDING_DIR", "data/embeddings")
+# Name of a local sentence-transformers model; empty means hashed n-grams
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "512"))
+EMBEDDING_REFRESH_SECONDS = float(os.getenv("EMBEDDING_REFRESH_SECONDS", "60"))
+EMBEDDING_BATCH_SIZE = 2048
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+
+class HashingEmbedder:
+    """
+    Offline fallback: signed feature hashing of words, word bigrams and character
+    trigrams into a fixed number of dimensions, L2-normalized.
+    crc32 is used instead of hash() so vectors are identical across processes.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(text.lower())
+        features = list(words)
+        features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text or ""):
+                h = zlib.crc32(feature.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(model_name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self._model.encode(list(texts), batch_size=64, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+_embedder = None
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        if EMBEDDING_MODEL:
+            try:
+                _embedder = SentenceTransformerEmbedder(EMBEDDING_MODEL)
+            except Exception as e:
+                logging.warning(f"Could not load embedding model {EMBEDDING_MODEL}, using hashed n-grams: {e}")
+        if _embedder is None:
+            _embedder = HashingEmbedder(EMBEDDING_DIM)
+    return _embedder
+
+
+def job_text(row) -> str:
+    return f"{row.title or ''}. {row.required_skills or ''}. {row.description or ''}"
+
+
+def course_text(row) -> str:
+    return f"{row.title or ''}. {row.platform or ''}. {row.tags or ''}"
+
+
+def profile_text(profile_data: Dict) -> str:
+    return ". ".join(
+        profile_data.get(field) or "" for field in ("skills", "experience", "summary", "education")
+    )
+
+
+class VectorIndex:
+    """
+    Append-only on-disk matrix of row vectors plus the matching database ids.
+    Vectors are appended before ids, so readers that size the index by the id
+    file never see a row without its vector.
+
+    Only rows with ids above the last indexed one are embedded. Edited catalog
+    rows keep their old vector and deleted rows keep their slot (they are
+    dropped when results are fetched) until `python embeddings.py --rebuild`.
+    """
+
+    def __init__(self, kind: str, directory: str = EMBEDDING_DIR):
+        self.kind = kind
+        self.vectors_path = os.path.join(directory, f"{kind}.f32")
+        self.ids_path = os.path.join(directory, f"{kind}.ids")
+        self.meta_path = os.path.join(directory, f"{kind}.meta.json")
+        self.lock_path = os.path.join(directory, f"{kind}.lock")
+        self.directory = directory
+        self.dim = 0
+        self.embedder_name = ""
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        self._mapped_size = -1
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self):
+        """
+        Memory-map the current files. Cheap enough to call on every refresh.
+        """
+        meta = self._read_meta()
+        if not meta or not os.path.exists(self.ids_path):
+            self._matrix, self._ids, self._mapped_size = None, None, -1
+            return
+        size = os.path.getsize(self.ids_path)
+        if size == self._mapped_size:
+            return
+        self.dim = meta["dim"]
+        self.embedder_name = meta["embedder"]
+        vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        count = min(size // 8, vectors_size // (4 * self.dim))
+        if count == 0:
+            self._matrix, self._ids = None, None
+        else:
+            self._ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(count,))
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+        self._mapped_size = size
+
+    def __len__(self) -> int:
+        return 0 if self._ids is None else len(self._ids)
+
+    def update(self, embedder, rows_after) -> int:
+        """
+        Embed and append rows newer than the last indexed id. `rows_after(last_id)`
+        yields batches of (id, text). Only one process builds at a time; the others
+        skip and pick up the new rows on their next load().
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+            meta = self._read_meta()
+            if meta.get("embedder") != embedder.name or meta.get("dim") != embedder.dim:
+                # Different model: start over
+                for path in (self.vectors_path, self.ids_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                meta = {"embedder": embedder.name, "dim": embedder.dim, "last_id": 0}
+                self._write_meta(meta)
+            self._repair(meta)
+
+            added = 0
+            for batch in rows_after(meta["last_id"]):
+                ids = np.array([row_id for row_id, _ in batch], dtype=np.int64)
+                vectors = embedder.embed([text for _, text in batch]).astype(np.float32)
+                with open(self.vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+                with open(self.ids_path, "ab") as f:
+                    f.write(ids.tobytes())
+                meta["last_id"] = int(ids[-1])
+                self._write_meta(meta)
+                added += len(ids)
+            return added
+
+    def _repair(self, meta: Dict):
+        """
+        Realign the files after a build died between its writes: the id file is
+        authoritative, so drop a partial id and any vectors past it, and resume
+        after the last id actually written.
+        """
+        count = os.path.getsize(self.ids_path) // 8 if os.path.exists(self.ids_path) else 0
+        for path, size in ((self.ids_path, count * 8), (self.vectors_path, count * meta["dim"] * 4)):
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                os.truncate(path, size)
+        last_id = 0
+        if count:
+            last_id = int(np.fromfile(self.ids_path, dtype=np.int64, offset=(count - 1) * 8, count=1)[0])
+        if meta["last_id"] != last_id:
+            meta["last_id"] = last_id
+            self._write_meta(meta)
+
+    def _write_meta(self, meta: Dict):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
+
+    def search(self, queries: np.ndarray, k: int = 5) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k (id, cosine similarity) for each query row, via one matrix product.
+        """
+        if self._matrix is None or len(self) == 0:
+            return [[] for _ in range(len(queries))]
+        scores = queries @ self._matrix.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for q, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[q, candidates])]
+            results.append([(int(self._ids[i]), float(scores[q, i])) for i in ordered])
+        return results
+
+
+_indexes = {"jobs": VectorIndex("jobs"), "courses": VectorIndex("courses")}
+_last_refresh = 0.0
+_refresh_lock: Optional[asyncio.Lock] = None
+
+
+def _batches(model, to_text):
+    def rows_after(last_id: int):
+        db = database.SessionLocal()
+        try:
+            while True:
+                rows = db.query(model).filter(model.id > last_id).order_by(model.id).limit(EMBEDDING_BATCH_SIZE).all()
+                if not rows:
+                    return
+                yield [(row.id, to_text(row)) for row in rows]
+                last_id = rows[-1].id
+        finally:
+            db.close()
+    return rows_after
+
+
+def refresh_indexes(build: bool = True) -> Dict[str, int]:
+    """
+    Append embeddings for new rows (when `build`) and remap the files.
+    """
+    added = {}
+    for kind, model, to_text in (("jobs", models.Job, job_text), ("courses", models.Course, course_text)):
+        index = _indexes[kind]
+        if build:
+            added[kind] = index.update(get_embedder(), _batches(model, to_text))
+        index.load()
+    return added
+
+
+async def ensure_indexes():
+    global _last_refresh, _refresh_lock
+    if time.monotonic() - _last_refresh < EMBEDDING_REFRESH_SECONDS:
+        return
+    if _refresh_lock is None:
+        _refresh_lock = asyncio.Lock()
+    async with _refresh_lock:
+        if time.monotonic() - _last_refresh < EMBEDDING_REFRESH_SECONDS:
+            return
+        await asyncio.to_thread(refresh_indexes)
+        _last_refresh = time.monotonic()
+
+
+def _fetch(model, fields, hits: List[Tuple[int, float]]) -> List[Dict]:
+    if not hits:
+        return []
+    ids = [row_id for row_id, _ in hits]
+    db = database.SessionLocal()
+    try:
+        rows = {row.id: row for row in db.query(model).filter(model.id.in_(ids)).all()}
+    finally:
+        db.close()
+    return [{f: getattr(rows[i], f) for f in fields} for i in ids if i in rows]
+
+
+async def recommend(profile_data: Dict, k: int = 5) -> Optional[Dict]:
+    """
+    Semantic nearest-neighbour jobs and courses for a profile, or None if the
+    index is empty.
+    """
+    await ensure_indexes()
+    # Embedding, the matrix product and the row fetch all block; keep them off the loop
+    return await asyncio.to_thread(_recommend, profile_data, k)
+
+
+def _recommend(profile_data: Dict, k: int) -> Optional[Dict]:
+    embedder = get_embedder()
+    if not any(len(index) and index.embedder_name == embedder.name for index in _indexes.values()):
+        return None
+    query = embedder.embed([profile_text(profile_data)])
+    jobs = _fetch(models.Job, ("title", "company", "location", "description", "required_skills", "link"),
+                  _indexes["jobs"].search(query, k)[0])
+    courses = _fetch(models.Course, ("title", "platform", "link", "banner_url", "tags"),
+                     _indexes["courses"].search(query, k)[0])
+    for course in courses:
+        if not course.get("banner_url"):
+            course["banner_url"] = ai_service.get_platform_logo(course.get("platform") or "")
+    return {"courses": courses, "jobs": jobs}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or extend the job/course embedding index")
+    parser.add_argument("--rebuild", action="store_true", help="discard existing vectors and re-embed every row")
+    args = parser.parse_args()
+    if args.rebuild:
+        for index in _indexes.values():
+            for path in (index.vectors_path, index.ids_path, index.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+    started = time.perf_counter()
+    print(f"Added {refresh_indexes()} in {time.perf_counter() - started:.1f}s")
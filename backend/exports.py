@@ -0,0 +1,251 @@
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+from xml.sax.saxutils import escape
+
+from sqlalchemy.orm import Session
+
+import database
+import models
+
+# Rows fetched per round trip in bulk exports; memory stays at about one batch
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Serialized bytes buffered before a chunk is sent to the client
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+USER_COLUMNS = ["username", "email", "full_name", "skills", "experience", "education", "summary"]
+BULK_COLUMNS = [
+    "user_id", "username", "email", "is_active", "full_name", "skills", "experience", "education",
+    "summary", "phone", "location", "github_url", "linkedin_url", "portfolio_url", "languages",
+]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "jsonl": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Control characters are not allowed in XML 1.0
+_XML_ILLEGAL_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _csv_chunks(rows: Iterable[Dict], columns: Sequence[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(["" if row.get(c) is None else row.get(c) for c in columns])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _jsonl_chunks(rows: Iterable[Dict], columns: Sequence[str]) -> Iterator[bytes]:
+    parts: List[str] = []
+    size = 0
+    for row in rows:
+        line = json.dumps({c: row.get(c) for c in columns}, ensure_ascii=False, default=str) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    yield "".join(parts).encode("utf-8")
+
+
+def _json_chunks(rows: Iterable[Dict], columns: Sequence[str]) -> Iterator[bytes]:
+    # A JSON array, streamed element by element
+    yield b"["
+    separator = b""
+    for chunk in _jsonl_chunks(rows, columns):
+        if chunk:
+            yield separator + chunk.rstrip(b"\n").replace(b"\n", b",")
+            separator = b","
+    yield b"]"
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only, non-seekable file object that collects what zipfile writes so
+    it can be handed to the response as it is produced.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def _column_name(index: int) -> str:
+    name = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+
+def _xlsx_cell(ref: str, value) -> str:
+    if value is None or value == "":
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL_RE.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_chunks(rows: Iterable[Dict], columns: Sequence[str]) -> Iterator[bytes]:
+    """
+    Minimal single-sheet workbook with inline strings. The zip is written to a
+    non-seekable sink, so each member is compressed as it is written (sizes go
+    in data descriptors) and nothing is buffered beyond the current chunk.
+    """
+    sink = _ChunkSink()
+    letters = [_column_name(i) for i in range(len(columns))]
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for name, content in _XLSX_STATIC.items():
+            archive.writestr(name, content)
+        yield sink.drain()
+        with archive.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            header = "".join(_xlsx_cell(f"{letters[i]}1", c) for i, c in enumerate(columns))
+            sheet.write(f'<row r="1">{header}</row>'.encode("utf-8"))
+            for r, row in enumerate(rows, start=2):
+                cells = "".join(_xlsx_cell(f"{letters[i]}{r}", row.get(c)) for i, c in enumerate(columns))
+                sheet.write(f'<row r="{r}">{cells}</row>'.encode("utf-8"))
+                if sink.size >= EXPORT_CHUNK_BYTES:
+                    yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+WRITERS = {
+    "csv": _csv_chunks,
+    "json": _json_chunks,
+    "jsonl": _jsonl_chunks,
+    "xlsx": _xlsx_chunks,
+}
+
+
+def iter_profile_rows(db: Session, after_id: int = 0, limit: Optional[int] = None,
+                      include_recommendations: bool = False,
+                      batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+    """
+    Users joined to their profiles in user id order, fetched in keyset batches
+    through a server-side cursor. Only the selected columns are loaded and
+    each batch is released before the next, so memory does not grow with the
+    table. Pass the last exported user_id as `after_id` to resume.
+    """
+    user_columns = [models.User.id, models.User.username, models.User.email, models.User.is_active]
+    profile_fields = BULK_COLUMNS[4:] + (["recommendations"] if include_recommendations else [])
+    profile_columns = [getattr(models.Profile, f) for f in profile_fields]
+    names = ["user_id", "username", "email", "is_active"] + profile_fields
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        query = (
+            db.query(*user_columns, *profile_columns)
+            .outerjoin(models.Profile, models.Profile.user_id == models.User.id)
+            .filter(models.User.id > after_id)
+            .order_by(models.User.id)
+            .limit(size)
+            .execution_options(stream_results=True, yield_per=size)
+        )
+        count = 0
+        for values in query:
+            count += 1
+            row = dict(zip(names, values))
+            after_id = row["user_id"]
+            yield row
+        # Nothing from this batch is kept in the session
+        db.expunge_all()
+        if count < size:
+            return
+        if remaining is not None:
+            remaining -= count
+
+
+def stream_rows(rows: Iterable[Dict], format: str, columns: Sequence[str]) -> Iterator[bytes]:
+    return WRITERS[format](rows, columns)
+
+
+def stream_bulk_export(format: str, after_id: int = 0, limit: Optional[int] = None,
+                       include_recommendations: bool = False) -> Iterator[bytes]:
+    """
+    Bulk export as a synchronous generator. Starlette iterates it in a worker
+    thread, and it owns its session because the response outlives the
+    request's dependencies.
+    """
+    columns = BULK_COLUMNS + (["recommendations"] if include_recommendations else [])
+    db = database.SessionLocal()
+    try:
+        rows = iter_profile_rows(db, after_id, limit, include_recommendations)
+        yield from stream_rows(rows, format, columns)
+    finally:
+        db.close()
+
+
+def content_disposition(filename: str) -> Dict[str, str]:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
@@ -0,0 +1,93 @@
+import hashlib
+import logging
+import os
+from typing import Optional
+
+from fastapi import Request, Response
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware
+
+# Per-user responses: the browser may keep them but has to revalidate each
+# time, and shared caches must not store them at all.
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", "private, no-cache")
+
+# "gzip" compresses responses above COMPRESSION_MIN_BYTES, "off" disables
+COMPRESSION = os.getenv("COMPRESSION", "gzip").lower()
+# Smaller bodies aren't worth the CPU or the framing overhead
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Event streams must not be buffered; xlsx is already a zip
+_GZIP_EXCLUDED = DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",)
+
+
+def make_etag(*parts) -> str:
+    """
+    Validator from the values a representation is derived from. It is weak
+    because gzip and identity bodies of the same representation share it.
+    """
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: only the opaque part has to match
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def set_headers(response: Response, etag: Optional[str] = None):
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.headers["Vary"] = "Authorization"
+    if etag:
+        response.headers["ETag"] = etag
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_headers(response, etag)
+    return response
+
+
+class VaryOnEncoding:
+    """
+    Adds Accept-Encoding to Vary on every response. GZipMiddleware only does so
+    for bodies it compresses, which leaves small bodies and 304s without it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_vary(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                vary = {v.strip().lower() for v in headers.get("vary", "").split(",")}
+                if "accept-encoding" not in vary:
+                    headers.add_vary_header("Accept-Encoding")
+            await send(message)
+
+        await self.app(scope, receive, send_with_vary)
+
+
+def add_compression(app):
+    if COMPRESSION == "off":
+        return
+    if COMPRESSION != "gzip":
+        logging.warning(f"Unknown COMPRESSION={COMPRESSION}; using gzip")
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=COMPRESSION_MIN_BYTES,
+        compresslevel=GZIP_LEVEL,
+        exclude_content_types=_GZIP_EXCLUDED,
+    )
+    # Added last so it wraps GZipMiddleware and sees the Vary it sets
+    app.add_middleware(VaryOnEncoding)
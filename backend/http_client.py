@@ -0,0 +1,117 @@
+import asyncio
+import json
+import logging
+import os
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+import config  # noqa: F401  loads .env before the settings below are read
+import llm_quota
+import metrics
+
+# Shared async client for outbound LLM calls. One client per worker process keeps
+# TCP/TLS connections alive between requests instead of reconnecting every time.
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "your_openrouter_api_key_here")
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+# Upper bound on concurrent in-flight LLM calls per worker
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "100"))
+# Open a connection to OpenRouter at startup so the first user request skips DNS/TLS
+HTTP_WARMUP = os.getenv("HTTP_WARMUP", "false").lower() in ("1", "true", "yes")
+
+_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide AsyncClient, creating it on first use.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=OPENROUTER_BASE_URL,
+            headers={
+                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE
+            ),
+        )
+    return _client
+
+
+async def warm_up():
+    """
+    Create the client and, with HTTP_WARMUP, put one live connection in its pool.
+    """
+    client = get_client()
+    if HTTP_WARMUP:
+        try:
+            await client.get("/models", timeout=HTTP_CONNECT_TIMEOUT)
+        except httpx.HTTPError as e:
+            logging.warning(f"HTTP warm-up failed: {e}")
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def post_chat_completion(payload: Dict) -> Dict:
+    """
+    POST a chat completion request to OpenRouter and return the decoded JSON body.
+    Raises httpx.HTTPError on network failures and non-2xx responses.
+    """
+    async with _get_semaphore():
+        response = await get_client().post("/chat/completions", json=payload)
+        response.raise_for_status()
+        body = response.json()
+        metrics.record_llm_usage(body)
+        await llm_quota.record(body)
+        return body
+
+
+async def stream_chat_completion(payload: Dict) -> AsyncIterator[str]:
+    """
+    POST a streaming chat completion and yield content deltas as they arrive.
+    """
+    # Ask for a final chunk carrying token usage
+    payload = dict(payload, stream=True, stream_options={"include_usage": True})
+    async with _get_semaphore():
+        async with get_client().stream("POST", "/chat/completions", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                # SSE frames: "data: {...}"; lines starting with ':' are keep-alive comments
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if chunk.get("error"):
+                    raise httpx.HTTPError(f"Upstream error: {chunk['error']}")
+                if chunk.get("usage"):
+                    metrics.record_llm_usage(chunk)
+                    await llm_quota.record(chunk)
+                choices = chunk.get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    yield delta
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, undefer
+
+import database
+import llm_quota
+import models
+import recommender
+import resilience
+
+# Background workers per process; 0 disables the pool (jobs stay pending)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# A running job whose worker died is picked up again after this long
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Minimum wait before a failed or deferred job is retried; never shorter than
+# the breaker cooldown, so jobs deferred on an open circuit don't come straight back
+JOB_RETRY_SECONDS = max(int(os.getenv("JOB_RETRY_SECONDS", "30")), resilience.BREAKER_RESET_SECONDS)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_wakeup: Optional[asyncio.Event] = None
+_workers: List[asyncio.Task] = []
+
+
+def enqueue_recommendations(db: Session, user_id: int) -> models.RecommendationJob:
+    """
+    Queue a regeneration for `user_id`. An existing pending job is reused, so a
+    burst of profile saves produces a single model call. The partial unique
+    index on pending jobs settles concurrent enqueues: the loser reads the
+    winner's row.
+    """
+    job = _pending_job(db, user_id)
+    if job is None:
+        job = models.RecommendationJob(user_id=user_id, status=PENDING)
+        db.add(job)
+        try:
+            db.commit()
+            db.refresh(job)
+        except IntegrityError:
+            db.rollback()
+            job = _pending_job(db, user_id)
+    if _wakeup is not None:
+        _wakeup.set()
+    return job
+
+
+def _pending_job(db: Session, user_id: int) -> Optional[models.RecommendationJob]:
+    return db.query(models.RecommendationJob).filter(
+        models.RecommendationJob.user_id == user_id,
+        models.RecommendationJob.status == PENDING
+    ).first()
+
+
+def latest_job(db: Session, user_id: int) -> Optional[models.RecommendationJob]:
+    return db.query(models.RecommendationJob).filter(
+        models.RecommendationJob.user_id == user_id
+    ).order_by(models.RecommendationJob.id.desc()).first()
+
+
+def _claim_next(db: Session) -> Optional[models.RecommendationJob]:
+    """
+    Atomically move the oldest runnable job to running. The conditional UPDATE
+    makes this safe with several workers and processes polling the same table.
+    """
+    Job = models.RecommendationJob
+    now = datetime.utcnow()
+    # Jobs that were started before (failed or deferred) wait out the retry delay
+    runnable = or_(
+        (Job.status == PENDING) & (Job.started_at.is_(None) | (Job.updated_at < now - timedelta(seconds=JOB_RETRY_SECONDS))),
+        (Job.status == RUNNING) & (Job.started_at < now - timedelta(seconds=JOB_LEASE_SECONDS))
+    )
+    for candidate_id, in db.query(Job.id).filter(runnable).order_by(Job.id).limit(5).all():
+        claimed = db.query(Job).filter(Job.id == candidate_id, runnable).update(
+            {"status": RUNNING, "started_at": now, "updated_at": now, "attempts": Job.attempts + 1},
+            synchronize_session=False
+        )
+        db.commit()
+        if claimed == 1:
+            return db.query(Job).filter(Job.id == candidate_id).first()
+    return None
+
+
+async def _run_job(db: Session, job: models.RecommendationJob) -> bool:
+    """
+    Run a claimed job. Returns False if it was deferred because the circuit is open.
+    """
+    deferred = False
+    db_profile = db.query(models.Profile).options(undefer(models.Profile.recommendations)).filter(
+        models.Profile.user_id == job.user_id
+    ).first()
+    try:
+        if db_profile is not None:
+            await recommender.get_recommendations(db, db_profile, fallback=False)
+        job.status = DONE
+        job.error = None
+    except resilience.CircuitOpenError:
+        # Upstream is known to be down; wait for it without using up an attempt.
+        # started_at stays set, so the claim waits out the retry delay first.
+        db.rollback()
+        job.attempts -= 1
+        job.status = PENDING
+        deferred = True
+    except llm_quota.QuotaExceeded as e:
+        # Retrying today would fail the same way; the next request falls back to the catalog
+        db.rollback()
+        job.error = str(e)
+        job.status = FAILED
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Recommendation job {job.id} failed: {e}", exc_info=True)
+        job.error = str(e)
+        job.status = FAILED if job.attempts >= JOB_MAX_ATTEMPTS else PENDING
+    job.updated_at = datetime.utcnow()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Back to pending, but a newer pending job for this user will do the work
+        db.rollback()
+        job.status = DONE
+        job.error = "superseded"
+        job.updated_at = datetime.utcnow()
+        db.commit()
+    return not deferred
+
+
+async def _worker(index: int):
+    while True:
+        db = database.SessionLocal()
+        try:
+            job = _claim_next(db)
+            # A deferred job means the circuit is open: sleep instead of claiming the next one
+            if job is not None and await _run_job(db, job):
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Recommendation worker {index} error: {e}", exc_info=True)
+        finally:
+            db.close()
+
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_workers():
+    global _wakeup
+    _wakeup = asyncio.Event()
+    for i in range(JOB_WORKERS):
+        _workers.append(asyncio.ensure_future(_worker(i)))
+
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Optional
+
+import database
+import metrics
+import models
+from rate_limit import RATE_LIMIT_BACKEND
+
+# Daily model budget per user, counted from the `usage` block OpenRouter returns
+# with every completion. Once a user is over either limit, recommendations are
+# served from what is stored or cached, or from the local catalog, until the
+# next UTC day. 0 disables a limit.
+LLM_DAILY_TOKEN_QUOTA = int(os.getenv("LLM_DAILY_TOKEN_QUOTA", "200000"))
+LLM_DAILY_SPEND_QUOTA = float(os.getenv("LLM_DAILY_SPEND_QUOTA", "0"))  # USD
+# Used to price calls whose usage block has no `cost` field (USD per million tokens)
+LLM_PROMPT_PRICE_PER_M = float(os.getenv("LLM_PROMPT_PRICE_PER_M", "0"))
+LLM_COMPLETION_PRICE_PER_M = float(os.getenv("LLM_COMPLETION_PRICE_PER_M", "0"))
+
+# User whose quota pays for model calls made in this context. Tasks started
+# from it (e.g. a shared generation) inherit the value when they are created.
+_charged_user: ContextVar[Optional[int]] = ContextVar("charged_user", default=None)
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+@contextmanager
+def charge_to(user_id: Optional[int]):
+    token = _charged_user.set(user_id)
+    try:
+        yield
+    finally:
+        _charged_user.reset(token)
+
+
+def _today() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+
+def usage_cost(usage: Dict) -> float:
+    if usage.get("cost") is not None:
+        return float(usage["cost"])
+    return (
+        (usage.get("prompt_tokens") or 0) * LLM_PROMPT_PRICE_PER_M
+        + (usage.get("completion_tokens") or 0) * LLM_COMPLETION_PRICE_PER_M
+    ) / 1_000_000
+
+
+class MemoryStore:
+    """
+    Per-process counters. Useful for tests and single-worker runs.
+    """
+
+    def __init__(self):
+        self._usage: Dict[tuple, Dict] = {}
+        self._day = None
+        self._lock = threading.Lock()
+
+    def add(self, user_id: int, day: str, prompt_tokens: int, completion_tokens: int, cost: float):
+        with self._lock:
+            if day != self._day:
+                # Yesterday's counters are no longer needed
+                self._usage.clear()
+                self._day = day
+            entry = self._usage.setdefault((user_id, day), {
+                "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0, "requests": 0
+            })
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["cost"] += cost
+            entry["requests"] += 1
+
+    def get(self, user_id: int, day: str) -> Optional[Dict]:
+        entry = self._usage.get((user_id, day))
+        return dict(entry) if entry else None
+
+
+class DatabaseStore:
+    """
+    Counters in the llm_usage table, one row per user and day, shared by all workers.
+    """
+
+    def add(self, user_id: int, day: str, prompt_tokens: int, completion_tokens: int, cost: float):
+        table = models.LlmUsage.__table__
+        statement = database.upsert(table).values(
+            user_id=user_id, day=day, prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens, cost=cost, requests=1
+        ).on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day],
+            set_={
+                "prompt_tokens": table.c.prompt_tokens + prompt_tokens,
+                "completion_tokens": table.c.completion_tokens + completion_tokens,
+                "cost": table.c.cost + cost,
+                "requests": table.c.requests + 1,
+            },
+        )
+        with database.engine.begin() as conn:
+            conn.execute(statement)
+
+    def get(self, user_id: int, day: str) -> Optional[Dict]:
+        table = models.LlmUsage.__table__
+        with database.engine.connect() as conn:
+            row = conn.execute(
+                table.select().where(table.c.user_id == user_id, table.c.day == day)
+            ).mappings().first()
+        return dict(row) if row else None
+
+
+if RATE_LIMIT_BACKEND == "memory":
+    store = MemoryStore()
+else:
+    store = DatabaseStore()
+
+
+async def record(body: Dict):
+    """
+    Add a completion's `usage` to the daily total of the user being charged.
+    """
+    user_id = _charged_user.get()
+    usage = body.get("usage") or {}
+    if user_id is None or not usage:
+        return
+    try:
+        await asyncio.to_thread(
+            store.add, user_id, _today(), usage.get("prompt_tokens") or 0,
+            usage.get("completion_tokens") or 0, usage_cost(usage)
+        )
+    except Exception as e:
+        logging.warning(f"Could not record LLM usage for user {user_id}: {e}")
+
+
+def usage_today(user_id: int) -> Dict:
+    entry = store.get(user_id, _today()) or {}
+    return {
+        "prompt_tokens": entry.get("prompt_tokens") or 0,
+        "completion_tokens": entry.get("completion_tokens") or 0,
+        "cost": round(entry.get("cost") or 0.0, 6),
+        "requests": entry.get("requests") or 0,
+        "token_quota": LLM_DAILY_TOKEN_QUOTA or None,
+        "spend_quota": LLM_DAILY_SPEND_QUOTA or None,
+    }
+
+
+def allowed(user_id: Optional[int], feature: str = "recommendations") -> bool:
+    """
+    False once the user has used up today's token or spend quota. Calls not
+    tied to a user, and lookups that fail, are allowed.
+    """
+    if user_id is None or not (LLM_DAILY_TOKEN_QUOTA or LLM_DAILY_SPEND_QUOTA):
+        return True
+    try:
+        usage = usage_today(user_id)
+    except Exception as e:
+        logging.warning(f"Could not read LLM usage for user {user_id}: {e}")
+        return True
+    over = (
+        (LLM_DAILY_TOKEN_QUOTA and usage["prompt_tokens"] + usage["completion_tokens"] >= LLM_DAILY_TOKEN_QUOTA)
+        or (LLM_DAILY_SPEND_QUOTA and usage["cost"] >= LLM_DAILY_SPEND_QUOTA)
+    )
+    if over:
+        metrics.llm_quota_exhausted.inc(feature=feature)
+        logging.info(f"LLM quota exhausted for user {user_id}: {usage}")
+    return not over
@@ -1,116 +1,186 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+import time
+
+_import_started = time.perf_counter()
+
+import config  # first: loads .env before any module reads its settings
+
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response, status, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List, Optional
-import os
-import shutil
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, Optional, Set
+import asyncio
 import json
+import logging
 
-import models, schemas, auth, database, ai_service
+import models, schemas, auth, database, ai_service, http_client, rec_cache, recommender, jobs, resilience, batch, uploads, resume_pipeline, passwords, migrations, skills, exports, metrics, projection, http_cache, rate_limit, llm_quota, model_router, prompts
 
-# Create database tables
-models.Base.metadata.create_all(bind=database.engine)
+# Seconds spent in each boot phase of this worker, reported on /stats
+startup_timings: Dict[str, float] = {"imports": round(time.perf_counter() - _import_started, 4)}
 
-import logging
+router = APIRouter()
 
-# Configure logging to write to a file
-logging.basicConfig(
-    filename='app_error.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Fire-and-forget work started by requests. The event loop only keeps weak
+# references to tasks, so they are held here until done, and cancelled on shutdown.
+_background_tasks: Set[asyncio.Task] = set()
 
-app = FastAPI(title="Internship Portal API")
 
-# Setup CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def _spawn(coro) -> asyncio.Task:
+    with metrics.detached():
+        task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
-UPLOAD_DIR = "uploads"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
 
-@app.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    
-    hashed_password = auth.get_password_hash(user.password)
+async def _timed_step(name: str, step):
+    started = time.perf_counter()
+    result = step()
+    if asyncio.iscoroutine(result):
+        await result
+    startup_timings[name] = round(time.perf_counter() - started, 4)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    if migrations.MIGRATE_ON_STARTUP:
+        await _timed_step("migrations", lambda: asyncio.to_thread(migrations.upgrade))
+    await _timed_step("password_hashing", lambda: asyncio.to_thread(passwords.init))
+    await _timed_step("db_pool", lambda: asyncio.to_thread(database.warm_up))
+    await _timed_step("http_client", http_client.warm_up)
+    jobs.start_workers()
+    startup_timings["startup"] = round(time.perf_counter() - started, 4)
+    logging.info(f"Worker ready: {startup_timings}")
+    # Not needed to serve the first request; loaded while the worker idles
+    warm_rankers = asyncio.ensure_future(asyncio.to_thread(recommender.warm_up))
+
+    yield
+
+    warm_rankers.cancel()
+    for task in list(_background_tasks):
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await jobs.stop_workers()
+    await http_client.close_client()
+    resume_pipeline.shutdown_pool()
+    passwords.shutdown()
+    await database.dispose_async_engine()
+
+
+def create_app() -> FastAPI:
+    started = time.perf_counter()
+    config.setup_logging()
+    app = FastAPI(title="Internship Portal API", lifespan=lifespan)
+
+    # Setup CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["ETag"],
+    )
+    http_cache.add_compression(app)
+    app.add_middleware(uploads.UploadSizeLimit, paths=["/profile/resume"])
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.include_router(router)
+    startup_timings["create_app"] = round(time.perf_counter() - started, 4)
+    return app
+
+def _find_user(db: Session, username: str) -> Optional[models.User]:
+    return db.query(models.User).filter(models.User.username == username).first()
+
+def _create_user(db: Session, user: schemas.UserCreate, hashed_password: str) -> models.User:
     new_user = models.User(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(new_user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Username already registered")
     db.refresh(new_user)
+    # Loaded here so serializing the response doesn't query on the event loop
+    new_user.profile
     return new_user
 
-@app.post("/token", response_model=schemas.Token)
-def login_for_access_token(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if not db_user or not auth.verify_password(user.password, db_user.hashed_password):
+def _store_rehash(db: Session, db_user: models.User, new_hash: str):
+    db_user.hashed_password = new_hash
+    db.commit()
+
+# Async so hashing can wait on the bounded password pool; their queries run in
+# worker threads to keep them off the event loop.
+@router.post("/register", response_model=schemas.User)
+async def register(request: Request, user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    await rate_limit.check("auth", request, username=user.username)
+    if await asyncio.to_thread(_find_user, db, user.username):
+        raise HTTPException(status_code=400, detail="Username already registered")
+    
+    hashed_password = await passwords.hash_password(user.password)
+    return await asyncio.to_thread(_create_user, db, user, hashed_password)
+
+@router.post("/token", response_model=schemas.Token)
+async def login_for_access_token(request: Request, user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    await rate_limit.check("auth", request, username=user.username)
+    db_user = await asyncio.to_thread(_find_user, db, user.username)
+    verified, new_hash = (False, None)
+    if db_user:
+        verified, new_hash = await passwords.verify_and_update(user.password, db_user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = auth.create_access_token(data={"sub": db_user.username})
+    # Read before the commit below expires the row
+    claims = auth.token_claims(db_user)
+    if new_hash:
+        # Stored hash used an outdated cost; upgrade it now that we have the password
+        await asyncio.to_thread(_store_rehash, db, db_user, new_hash)
+    access_token = auth.create_access_token(data=claims)
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.get("/users/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
-    return current_user
-
-@app.post("/profile", response_model=schemas.Profile)
-async def create_profile(
-    profile: schemas.ProfileCreate,
+@router.get("/users/me", response_model=schemas.User)
+async def read_users_me(
+    request: Request,
+    response: Response,
+    view: projection.Projection = Depends(projection.params(include=["recommendations"])),
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    db_profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
-    if db_profile:
-        for key, value in profile.dict().items():
-            setattr(db_profile, key, value)
-    else:
-        db_profile = models.Profile(**profile.dict(), user_id=current_user.id)
-        db.add(db_profile)
-    
-    db.commit()
-    db.refresh(db_profile)
-    return db_profile
+    """
+    The caller and their profile, without the cached recommendations blob
+    unless asked for with ?include=recommendations. ?fields= trims further.
+    Answers 304 when If-None-Match still matches the profile version.
+    """
+    version = db.query(models.Profile.version).filter(models.Profile.user_id == current_user.id).scalar()
+    etag = http_cache.make_etag(
+        "me", current_user.id, current_user.email, current_user.is_active, version, view.fields, sorted(view.include)
+    )
+    if http_cache.matches(request, etag):
+        return http_cache.not_modified(etag)
+    model = schemas.UserWithRecommendations if "recommendations" in view.include else schemas.User
+    result = projection.respond(current_user, model, view)
+    http_cache.set_headers(result if isinstance(result, Response) else response, etag)
+    return result
 
-@app.post("/profile/resume")
-async def upload_resume(
-    file: UploadFile = File(...),
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(database.get_db)
-):
-    file_path = os.path.join(UPLOAD_DIR, f"{current_user.id}_{file.filename}")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Update profile with resume path
-    db_profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
-    if not db_profile:
-        db_profile = models.Profile(user_id=current_user.id, full_name=current_user.username, skills="", experience="", education="")
-        db.add(db_profile)
-    
-@app.post("/profile", response_model=schemas.Profile)
+@router.post("/profile", response_model=schemas.Profile)
 async def create_or_update_profile(
     profile: schemas.ProfileCreate,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
     db_profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
     
     if db_profile:
+        old_key = rec_cache.fingerprint(rec_cache.prompt_inputs(db_profile))
         db_profile.full_name = profile.full_name
         db_profile.skills = profile.skills
         db_profile.experience = profile.experience
@@ -122,7 +192,9 @@ async def create_or_update_profile(
         db_profile.linkedin_url = profile.linkedin_url
         db_profile.portfolio_url = profile.portfolio_url
         db_profile.languages = profile.languages
-        db_profile.recommendations = None # Clear cache on update
+        # Only clear the cache when a prompt input actually changed
+        if rec_cache.fingerprint(rec_cache.prompt_inputs(db_profile)) != old_key:
+            db_profile.recommendations = None
     else:
         db_profile = models.Profile(
             user_id=current_user.id,
@@ -131,93 +203,280 @@ async def create_or_update_profile(
         db.add(db_profile)
     
     try:
+        skills.sync_profile_skills(db, db_profile)
         db.commit()
         db.refresh(db_profile)
+        if db_profile.recommendations is None:
+            jobs.enqueue_recommendations(db, current_user.id)
         return db_profile
+    except IntegrityError:
+        # Another request created this user's profile first
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Profile was modified concurrently, please retry")
     except Exception as e:
         db.rollback()
         logging.error(f"Error saving profile: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Could not save profile")
 
-@app.post("/profile/resume")
+@router.post("/profile/resume", dependencies=[Depends(rate_limit.limit("resume"))])
 async def upload_resume(
     file: UploadFile = File(...),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
-    # Keep the folder structure for future use
-    file_path = os.path.join(UPLOAD_DIR, f"{current_user.id}_{file.filename}")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    file_path, digest, size = await uploads.save_upload(file)
     
     # Update profile with resume path
     db_profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
+    if db_profile and db_profile.resume_path == file_path and resume_pipeline.is_parsed(db, digest):
+        # Same content as the current resume, already parsed; keep the cached recommendations
+        return {"message": "Resume unchanged"}
     if not db_profile:
         db_profile = models.Profile(user_id=current_user.id, full_name=current_user.username, skills="", experience="", education="")
         db.add(db_profile)
     
     db_profile.resume_path = file_path
-    db_profile.recommendations = None # Clear cache on resume update
     db.commit()
+    # Extraction and parsing run in the background; recommendations are only
+    # invalidated if the parsed resume changes a prompt input.
+    _spawn(resume_pipeline.ingest_in_background(current_user.id, file_path, digest))
     return {"message": "Resume uploaded successfully"}
 
-@app.get("/recommendations")
+def _recommendations_etag(profile_id: int, version: int, key: str) -> str:
+    return http_cache.make_etag("recommendations", profile_id, version, key)
+
+# True when the profile has stored recommendations, evaluated in SQL so the
+# blob itself is not loaded
+_has_stored_recommendations = (
+    models.Profile.recommendations.isnot(None) & (models.Profile.recommendations != "")
+)
+
+@router.get("/recommendations")
 async def get_recommendations(
+    request: Request,
+    response: Response,
     refresh: bool = False,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
-    db_profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
-    print(f"DEBUG: Recommendation request for user_id={current_user.id} ({current_user.username}). Profile exists? {db_profile is not None}")
-    if not db_profile:
+    """
+    Stored recommendations carry an ETag from the profile version and the
+    cache key, so a repeat load with If-None-Match is a 304 that never reads
+    the payload. Fallback answers are not stored and get no ETag.
+    Refreshes are rate limited per user and IP.
+    """
+    if refresh:
+        await rate_limit.check("recommendations", request, current_user.id)
+    http_cache.set_headers(response)
+    row = db.query(models.Profile, _has_stored_recommendations).filter(
+        models.Profile.user_id == current_user.id
+    ).first()
+    if not row:
+        logging.debug(f"recommendations user_id={current_user.id} profile=missing")
         return {"courses": [], "jobs": []}
-    
-    # Check if we have cached recommendations (only if refresh is not requested)
-    if not refresh and db_profile.recommendations:
-        try:
-            print(f"DEBUG: Returning cached recommendations for user {current_user.username}")
-            return json.loads(db_profile.recommendations)
-        except Exception as e:
-            print(f"DEBUG: Failed to parse cached recommendations: {e}")
-            # Continue to fetch from AI if cache is corrupted
-            
-    print(f"DEBUG: Generating fresh recommendations for user {current_user.username}")
-    profile_data = {
-        "full_name": db_profile.full_name,
-        "skills": db_profile.skills,
-        "experience": db_profile.experience,
-        "education": db_profile.education,
-        "summary": db_profile.summary
-    }
+    db_profile, stored = row
+    key = rec_cache.fingerprint(rec_cache.prompt_inputs(db_profile))
+    # Catalog mode answers from the live catalog, which the version doesn't track
+    cacheable = not refresh and recommender.RECOMMENDER_MODE != "catalog"
+    if cacheable and stored:
+        etag = _recommendations_etag(db_profile.id, db_profile.version, key)
+        if http_cache.matches(request, etag):
+            return http_cache.not_modified(etag)
     
     try:
-        recommendations = ai_service.get_ai_recommendations(profile_data)
-        # Save to cache
-        db_profile.recommendations = json.dumps(recommendations)
-        db.commit()
-        
-        print(f"DEBUG: Recommendations generated and cached: {len(recommendations.get('courses', []))} courses, {len(recommendations.get('jobs', []))} jobs")
+        recommendations = await recommender.get_recommendations(db, db_profile, refresh=refresh)
+        logging.debug(
+            f"recommendations user_id={current_user.id} refresh={refresh} "
+            f"courses={len(recommendations.get('courses', []))} jobs={len(recommendations.get('jobs', []))}"
+        )
+        if cacheable:
+            # Saving new recommendations bumped the version; re-read it
+            version, stored = db.query(models.Profile.version, _has_stored_recommendations).filter(
+                models.Profile.id == db_profile.id
+            ).one()
+            if stored:
+                http_cache.set_headers(response, _recommendations_etag(db_profile.id, version, key))
         return recommendations
     except Exception as e:
-        print(f"DEBUG: Recommendations failed: {e}")
         logging.error(f"Recommendations endpoint failed: {e}", exc_info=True)
         # Fallback within the endpoint just in case
         return {"courses": [], "jobs": []}
 
-@app.get("/export/{format}")
-async def export_data(
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/recommendations/stream")
+async def stream_recommendations(
+    request: Request,
+    refresh: bool = False,
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    """
+    Server-Sent Events variant of /recommendations: one `course` or `job` event
+    per card as soon as it is complete, then a final `done` event.
+    """
+    if refresh:
+        await rate_limit.check("recommendations", request, current_user.id)
+    user_id = current_user.id
+
+    async def events():
+        # The request-scoped session may be closed before the body finishes streaming
+        stream_db = database.SessionLocal()
+        try:
+            db_profile = stream_db.query(models.Profile).options(undefer(models.Profile.recommendations)).filter(
+                models.Profile.user_id == user_id
+            ).first()
+            if db_profile:
+                async for section, item in recommender.stream_recommendations(stream_db, db_profile, refresh=refresh):
+                    yield sse_event("course" if section == "courses" else "job", item)
+            yield sse_event("done", {})
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/recommendations/status", response_model=schemas.RecommendationStatus)
+def get_recommendations_status(
+    current_user: auth.Principal = Depends(auth.get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    # Checked in SQL so the blob itself is never loaded
+    ready = db.query(models.Profile.id).filter(
+        models.Profile.user_id == current_user.id,
+        models.Profile.recommendations.isnot(None),
+        models.Profile.recommendations != ""
+    ).first() is not None
+    return {
+        "ready": ready,
+        "job": jobs.latest_job(db, current_user.id)
+    }
+
+@router.get("/users/me/usage")
+def get_llm_usage(current_user: auth.Principal = Depends(auth.get_current_principal)):
+    """
+    Today's model usage against the daily quota (UTC day).
+    """
+    return llm_quota.usage_today(current_user.id)
+
+@router.post("/admin/recommendations/batch", status_code=202)
+async def batch_recommendations(
+    request: schemas.BatchRecommendationRequest,
+    admin: auth.Principal = Depends(auth.get_current_admin)
+):
+    """
+    Warm recommendations for a cohort in the background. Progress and the
+    summary of the last run are reported on /stats.
+    """
+    _spawn(batch.run_in_background(request.user_ids, request.only_empty))
+    return {"message": "Batch started"}
+
+@router.get("/jobs/matching", response_model=List[schemas.JobMatch])
+def matching_jobs(
+    limit: int = 20,
+    view: projection.Projection = Depends(projection.params()),
+    current_user: auth.Principal = Depends(auth.get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    profile_id = db.query(models.Profile.id).filter(models.Profile.user_id == current_user.id).scalar()
+    if profile_id is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    matches = skills.jobs_matching_profile(db, profile_id, limit=min(limit, 100))
+    rows = [
+        {**{column.name: getattr(job, column.name) for column in models.Job.__table__.columns}, "shared_skills": shared}
+        for job, shared in matches
+    ]
+    return projection.respond(rows, schemas.JobMatch, view)
+
+@router.get("/admin/profiles/by-skills", response_model=List[schemas.Profile])
+def profiles_by_skills(
+    skills_filter: str = Query(..., alias="skills", description="Comma-separated; profiles must have all of them"),
+    limit: int = 100,
+    offset: int = 0,
+    view: projection.Projection = Depends(projection.params(include=["recommendations"])),
+    admin: auth.Principal = Depends(auth.get_current_admin),
+    db: Session = Depends(database.get_db)
+):
+    with_recommendations = "recommendations" in view.include
+    profiles = skills.profiles_with_all_skills(
+        db, skills_filter.split(","), limit=min(limit, 500), offset=offset,
+        options=[undefer(models.Profile.recommendations)] if with_recommendations else ()
+    )
+    model = schemas.ProfileWithRecommendations if with_recommendations else schemas.Profile
+    return projection.respond(profiles, model, view)
+
+@router.post("/admin/skills/backfill", status_code=202)
+async def backfill_skills(admin: auth.Principal = Depends(auth.get_current_admin)):
+    """
+    Rebuild the skill association tables from the comma-separated columns.
+    """
+    def run():
+        db = database.SessionLocal()
+        try:
+            skills.backfill(db)
+        except Exception as e:
+            logging.error(f"Skill backfill failed: {e}", exc_info=True)
+        finally:
+            db.close()
+
+    _spawn(asyncio.to_thread(run))
+    return {"message": "Backfill started"}
+
+@router.post("/admin/uploads/prune", status_code=202)
+async def prune_uploads(admin: auth.Principal = Depends(auth.get_current_admin)):
+    """
+    Delete uploaded files that no profile references any more.
+    """
+    def run():
+        db = database.SessionLocal()
+        try:
+            removed = uploads.prune(db)
+            logging.info(f"Pruned {removed} unreferenced uploads")
+        except Exception as e:
+            logging.error(f"Upload pruning failed: {e}", exc_info=True)
+        finally:
+            db.close()
+
+    _spawn(asyncio.to_thread(run))
+    return {"message": "Pruning started"}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/stats")
+def get_stats(admin: auth.Principal = Depends(auth.get_current_admin)):
+    return {
+        "recommendation_cache": rec_cache.store.stats(),
+        "llm": resilience.snapshot(),
+        "models": model_router.snapshot(),
+        "prompts": prompts.stats(),
+        "auth_cache": auth.principal_cache_stats(),
+        "password_hashing": passwords.snapshot(),
+        "rate_limit": rate_limit.snapshot(),
+        "last_batch": batch.last_run,
+        "startup": startup_timings
+    }
+
+def _check_export_format(format: str):
+    if format not in exports.WRITERS:
+        raise HTTPException(status_code=400, detail="Unsupported format")
+
+@router.get("/export/{format}")
+def export_data(
     format: str,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    import pandas as pd
-    from fastapi.responses import FileResponse
-    
+    _check_export_format(format)
     db_profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
     if not db_profile:
         raise HTTPException(status_code=404, detail="Profile not found")
-        
-    data = [{
+
+    row = {
         "username": current_user.username,
         "email": current_user.email,
         "full_name": db_profile.full_name,
@@ -225,21 +484,32 @@ async def export_data(
         "experience": db_profile.experience,
         "education": db_profile.education,
         "summary": db_profile.summary
-    }]
-    
-    df = pd.DataFrame(data)
-    file_path = f"data/user_data_{current_user.id}.{format}"
-    
-    if format == "csv":
-        df.to_csv(file_path, index=False)
-    elif format == "json":
-        df.to_json(file_path, orient="records")
-    elif format == "xlsx":
-        df.to_excel(file_path, index=False)
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported format")
-        
-    return FileResponse(file_path, filename=f"exported_data.{format}")
+    }
+    return StreamingResponse(
+        exports.stream_rows([row], format, exports.USER_COLUMNS),
+        media_type=exports.MEDIA_TYPES[format],
+        headers=exports.content_disposition(f"exported_data.{format}")
+    )
+
+@router.get("/admin/export/{format}")
+def export_all(
+    format: str,
+    after_id: int = Query(0, description="Resume after this user_id (the last one already received)"),
+    limit: Optional[int] = Query(None, ge=1),
+    include_recommendations: bool = False,
+    admin: auth.Principal = Depends(auth.get_current_admin)
+):
+    """
+    Stream every user and profile in user id order, in constant memory.
+    """
+    _check_export_format(format)
+    return StreamingResponse(
+        exports.stream_bulk_export(format, after_id, limit, include_recommendations),
+        media_type=exports.MEDIA_TYPES[format],
+        headers=exports.content_disposition(f"users_after_{after_id}.{format}")
+    )
+
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
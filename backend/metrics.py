@@ -0,0 +1,310 @@
+import bisect
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# In-process metrics rendered in the Prometheus text format on /metrics.
+# Each gunicorn worker keeps its own values, so scrape every worker (or add a
+# `worker` label at the scraper) rather than a load-balanced URL.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a final +Inf slot, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(counts), total[0]) for k, (counts, total) in self._values.items()]
+        lines = self.header()
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+_collectors: List[Callable[[], None]] = []
+
+
+def on_collect(fn: Callable[[], None]):
+    """
+    Register a callback that refreshes gauges from other modules' stats right
+    before each scrape.
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception as e:
+            logging.warning(f"Metrics collector {collect.__name__} failed: {e}")
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# HTTP
+http_requests = Counter("http_requests_total", "Requests handled", ["method", "route", "status"])
+http_latency = Histogram("http_request_duration_seconds", "Time until the response body is complete", ["method", "route"])
+http_in_flight = Gauge("http_requests_in_flight", "Requests currently being handled")
+
+# Database
+db_queries = Counter("db_queries_total", "SQL statements executed", ["route"])
+db_query_latency = Histogram("db_query_duration_seconds", "Time per SQL statement", ["route"], DB_BUCKETS)
+db_queries_per_request = Histogram("db_queries_per_request", "SQL statements per HTTP request", ["route"], COUNT_BUCKETS)
+db_time_per_request = Histogram("db_time_per_request_seconds", "Total SQL time per HTTP request", ["route"])
+
+# LLM
+llm_latency = Histogram("llm_request_duration_seconds", "Upstream LLM call time, retries included", ["endpoint", "outcome"], LLM_BUCKETS)
+llm_tokens = Counter("llm_tokens_total", "Tokens reported by OpenRouter", ["model", "kind"])
+llm_breaker_state = Gauge("llm_circuit_state", "0 closed, 1 half-open, 2 open", ["circuit"])
+llm_model_calls = Counter("llm_model_calls_total", "Routed model calls by validation outcome", ["task", "model", "outcome"])
+llm_escalations = Counter("llm_escalations_total", "Calls retried on a stronger model after invalid output", ["task", "model"])
+prompt_tokens = Counter("prompt_profile_tokens_total", "Estimated profile tokens before and after prompt compaction", ["stage"])
+llm_quota_exhausted = Counter("llm_quota_exhausted_total", "Model calls skipped because the user's daily quota is used up", ["feature"])
+
+# Rate limiting
+rate_limited = Counter("rate_limited_total", "Requests rejected with 429", ["route", "scope"])
+
+# Password hashing pool
+password_hash_queued = Gauge("password_hash_queued", "Hash and verify calls waiting for a pool thread")
+password_hash_running = Gauge("password_hash_running", "Hash and verify calls on a pool thread")
+password_hash_rejected = Counter("password_hash_rejected_total", "Hash and verify calls refused with 503 because the queue was full")
+
+# Caches
+cache_requests = Counter("cache_requests_total", "Cache lookups", ["cache", "result"])
+
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        # Filled in by the router, so dependencies' queries are labelled too
+        return _route_of(self.scope)
+
+
+# Set by the middleware. Threadpool endpoints run in a copy of the context, and
+# since the object is shared, their queries are counted against the request.
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("current_request", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _handle_error(exception_context):
+    # A statement that failed in the driver never reaches after_cursor_execute
+    conn = exception_context.connection
+    if exception_context.execution_context is not None and conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = current_request.get()
+    route = stats.route if stats else "background"
+    if stats:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    db_queries.inc(route=route)
+    db_query_latency.observe(elapsed, route=route)
+
+
+def instrument_engine(engine):
+    from sqlalchemy import event
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@contextlib.contextmanager
+def detached():
+    """
+    Tasks created inside this block are not attributed to the current request,
+    which may finish (and be observed) long before they do.
+    """
+    token = current_request.set(None)
+    try:
+        yield
+    finally:
+        current_request.reset(token)
+
+
+def record_llm_usage(body: Dict):
+    """
+    Count tokens from an OpenRouter response (or final stream chunk) `usage` block.
+    """
+    usage = body.get("usage") or {}
+    model = body.get("model") or "unknown"
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            llm_tokens.inc(usage[kind], model=model, kind=kind.split("_")[0])
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware) so streaming responses and
+    context variables behave normally. Routes are labelled by their path
+    template, never the raw URL, to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        http_in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            current_request.reset(token)
+            route = _route_of(scope)
+            elapsed = time.perf_counter() - started
+            http_requests.inc(method=scope["method"], route=route, status=str(status_code))
+            http_latency.observe(elapsed, method=scope["method"], route=route)
+            db_queries_per_request.observe(stats.queries, route=route)
+            db_time_per_request.observe(stats.db_seconds, route=route)
+            logging.debug(
+                f"request method={scope['method']} route={route} status={status_code} "
+                f"seconds={elapsed:.4f} db_queries={stats.queries} db_seconds={stats.db_seconds:.4f}"
+            )
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,59 @@
+"""
+Tables as they existed before migrations, when main.py called create_all().
+"""
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String, unique=True, index=True),
+    Column("email", String, unique=True, index=True),
+    Column("hashed_password", String),
+    Column("is_active", Boolean, default=True),
+)
+
+Table(
+    "profiles", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("full_name", String),
+    Column("skills", String),
+    Column("experience", Text),
+    Column("education", String),
+    Column("resume_path", String),
+    Column("summary", Text),
+    Column("recommendations", Text),
+    Column("phone", String),
+    Column("location", String),
+    Column("github_url", String),
+    Column("linkedin_url", String),
+    Column("portfolio_url", String),
+    Column("languages", String),
+)
+
+Table(
+    "jobs", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String),
+    Column("company", String),
+    Column("location", String),
+    Column("description", Text),
+    Column("required_skills", String),
+    Column("link", String),
+)
+
+Table(
+    "courses", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String),
+    Column("platform", String),
+    Column("link", String),
+    Column("banner_url", String),
+    Column("tags", String),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
@@ -0,0 +1,19 @@
+"""
+Profile columns older databases got from fix_db.py and update_db_v2.py.
+"""
+from migrations import add_column
+
+COLUMNS = [
+    ("summary", "TEXT"),
+    ("phone", "VARCHAR"),
+    ("location", "VARCHAR"),
+    ("github_url", "VARCHAR"),
+    ("linkedin_url", "VARCHAR"),
+    ("portfolio_url", "VARCHAR"),
+    ("languages", "VARCHAR"),
+]
+
+
+def upgrade(conn):
+    for column, type_sql in COLUMNS:
+        add_column(conn, "profiles", column, type_sql)
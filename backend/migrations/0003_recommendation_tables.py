@@ -0,0 +1,53 @@
+"""
+Shared recommendation cache, generation locks, the job queue and resume
+extraction results.
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+# Referenced by recommendation_jobs.user_id; already created by 0001
+Table("users", metadata, Column("id", Integer, primary_key=True))
+
+Table(
+    "recommendation_cache", metadata,
+    Column("key", String, primary_key=True),
+    Column("payload", Text),
+    Column("created_at", DateTime),
+    Column("last_accessed_at", DateTime, index=True),
+    Column("touch_count", Integer),
+)
+
+Table(
+    "generation_locks", metadata,
+    Column("key", String, primary_key=True),
+    Column("owner", String),
+    Column("expires_at", DateTime, index=True),
+)
+
+Table(
+    "recommendation_jobs", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), index=True),
+    Column("status", String, index=True),
+    Column("attempts", Integer),
+    Column("error", Text),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+    Column("started_at", DateTime),
+)
+
+Table(
+    "resume_extractions", metadata,
+    Column("content_hash", String, primary_key=True),
+    Column("text", Text),
+    Column("parsed", Text),
+    Column("timings", Text),
+    Column("created_at", DateTime),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True, tables=[
+        t for name, t in metadata.tables.items() if name != "users"
+    ])
@@ -0,0 +1,35 @@
+"""
+Unique index on profiles.user_id, built without locking out writes.
+
+The old code could create several profiles for one user, so duplicates are
+removed first, keeping the newest row per user. Rows pointing at deleted
+users are removed as well: SQLite connections now enforce foreign keys, and
+those rows could never be read through a user anyway.
+"""
+import logging
+
+from sqlalchemy import text
+
+from migrations import create_index
+
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    # Each statement is idempotent, as non-transactional migrations require
+    orphans = conn.execute(text(
+        "DELETE FROM profiles WHERE user_id IS NOT NULL AND user_id NOT IN (SELECT id FROM users)"
+    )).rowcount
+    orphans += conn.execute(text(
+        "DELETE FROM recommendation_jobs WHERE user_id IS NOT NULL AND user_id NOT IN (SELECT id FROM users)"
+    )).rowcount
+    duplicates = conn.execute(text(
+        "DELETE FROM profiles WHERE user_id IS NOT NULL AND id NOT IN ("
+        "SELECT MAX(id) FROM profiles WHERE user_id IS NOT NULL GROUP BY user_id)"
+    )).rowcount
+    if orphans or duplicates:
+        logging.warning(f"Removed {duplicates} duplicate profiles and {orphans} rows of deleted users")
+    if conn.dialect.name == "sqlite":
+        for table, rowid, parent, _ in conn.execute(text("PRAGMA foreign_key_check")):
+            logging.warning(f"Row {rowid} of {table} references a missing {parent} row")
+    create_index(conn, "ix_profiles_user_id", "profiles", ["user_id"], unique=True)
@@ -0,0 +1,38 @@
+"""
+Canonical skills, their aliases and the profile/job/course association
+tables. Existing comma-separated values are filled in by `python skills.py`.
+"""
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+# Referenced tables; already created by 0001
+Table("profiles", metadata, Column("id", Integer, primary_key=True))
+Table("jobs", metadata, Column("id", Integer, primary_key=True))
+Table("courses", metadata, Column("id", Integer, primary_key=True))
+
+Table(
+    "skills", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, unique=True, index=True),
+)
+
+Table(
+    "skill_aliases", metadata,
+    Column("alias", String, primary_key=True),
+    Column("skill_id", Integer, ForeignKey("skills.id"), index=True),
+)
+
+for owner, table in (("profile", "profiles"), ("job", "jobs"), ("course", "courses")):
+    Table(
+        f"{owner}_skills", metadata,
+        Column(f"{owner}_id", Integer, ForeignKey(f"{table}.id", ondelete="CASCADE"), primary_key=True),
+        Column("skill_id", Integer, ForeignKey("skills.id"), primary_key=True),
+        Index(f"ix_{owner}_skills_skill_id", "skill_id", f"{owner}_id"),
+    )
+
+NEW_TABLES = ("skills", "skill_aliases", "profile_skills", "job_skills", "course_skills")
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True, tables=[metadata.tables[name] for name in NEW_TABLES])
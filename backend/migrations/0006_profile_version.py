@@ -0,0 +1,10 @@
+"""
+Row version on profiles, bumped on every update and used to derive ETags.
+A constant default is a catalog-only change on Postgres 11+ and on SQLite,
+so existing rows read as version 1 without a table rewrite.
+"""
+from migrations import add_column
+
+
+def upgrade(conn):
+    add_column(conn, "profiles", "version", "INTEGER NOT NULL DEFAULT 1")
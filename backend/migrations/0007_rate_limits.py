@@ -0,0 +1,33 @@
+"""
+Token buckets for rate limiting and per-user daily LLM usage.
+"""
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+# Referenced by llm_usage.user_id; already created by 0001
+Table("users", metadata, Column("id", Integer, primary_key=True))
+
+Table(
+    "rate_limit_buckets", metadata,
+    Column("key", String, primary_key=True),
+    Column("tokens", Float),
+    Column("updated_at", Float, index=True),
+    Column("granted", Boolean),
+)
+
+Table(
+    "llm_usage", metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("day", String, primary_key=True),
+    Column("prompt_tokens", Integer),
+    Column("completion_tokens", Integer),
+    Column("cost", Float),
+    Column("requests", Integer),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True, tables=[
+        t for name, t in metadata.tables.items() if name != "users"
+    ])
@@ -0,0 +1,23 @@
+"""
+At most one pending recommendation job per user, enforced by a partial
+unique index so concurrent enqueues cannot both insert. Duplicates left by
+the old check-then-insert are marked done first, keeping the oldest.
+Running jobs are not covered: a profile saved mid-run needs its own pass.
+"""
+from sqlalchemy import text
+
+from migrations import create_index
+
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    conn.execute(text(
+        "UPDATE recommendation_jobs SET status = 'done', error = 'superseded' "
+        "WHERE status = 'pending' AND id NOT IN ("
+        "SELECT MIN(id) FROM recommendation_jobs WHERE status = 'pending' GROUP BY user_id)"
+    ))
+    create_index(
+        conn, "ix_recommendation_jobs_pending_user", "recommendation_jobs", ["user_id"],
+        unique=True, where="status = 'pending'"
+    )
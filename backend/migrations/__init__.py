@@ -0,0 +1,194 @@
+import contextlib
+import fcntl
+import importlib
+import logging
+import os
+import pkgutil
+import re
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+import database
+
+# Run pending migrations when a worker starts. Deployments that migrate in a
+# separate step (python -m migrations) can turn this off; either way an up to
+# date database costs one query on the version table, with no reflection.
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+# Postgres: give up on a DDL statement that waits this long for a table lock
+# instead of queueing every request behind it; the migration is retried.
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+MIGRATION_RETRIES = int(os.getenv("MIGRATION_RETRIES", "5"))
+
+VERSION_TABLE = "schema_migrations"
+# Arbitrary constant shared by every worker for pg_advisory_lock
+ADVISORY_LOCK_KEY = 72_110_015
+
+_MODULE_RE = re.compile(r"^(\d{4})_\w+$")
+_local_lock = threading.Lock()
+
+
+class Migration:
+    def __init__(self, version: str, name: str, module):
+        self.version = version
+        self.name = name
+        self.module = module
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        self.transactional = getattr(module, "TRANSACTIONAL", True)
+
+    def upgrade(self, conn):
+        self.module.upgrade(conn)
+
+
+def discover() -> List[Migration]:
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _MODULE_RE.match(info.name)
+        if match:
+            module = importlib.import_module(f"{__name__}.{info.name}")
+            found.append(Migration(match.group(1), info.name, module))
+    return sorted(found, key=lambda m: m.version)
+
+
+def _is_postgres(engine: Engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+@contextlib.contextmanager
+def _migration_lock(engine: Engine):
+    """
+    Only one process migrates at a time; the others wait and then find
+    nothing left to do.
+    """
+    if _is_postgres(engine):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                conn.commit()
+        return
+
+    path = engine.url.database
+    with _local_lock:
+        if not path or path == ":memory:":
+            yield
+            return
+        with open(f"{path}.migrate.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _ensure_version_table(engine: Engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+            "version VARCHAR(16) PRIMARY KEY, name VARCHAR(255), applied_at TIMESTAMP)"
+        ))
+
+
+def applied_versions(engine: Engine) -> Set[str]:
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text(f"SELECT version FROM {VERSION_TABLE}"))}
+
+
+def pending(engine: Optional[Engine] = None) -> List[Migration]:
+    engine = engine or database.engine
+    _ensure_version_table(engine)
+    done = applied_versions(engine)
+    return [m for m in discover() if m.version not in done]
+
+
+def _apply(engine: Engine, migration: Migration):
+    record = text(f"INSERT INTO {VERSION_TABLE} (version, name, applied_at) VALUES (:v, :n, :t)")
+    params = {"v": migration.version, "n": migration.name, "t": datetime.utcnow()}
+    if migration.transactional:
+        with engine.begin() as conn:
+            if _is_postgres(engine):
+                conn.execute(text(f"SET LOCAL lock_timeout = '{MIGRATION_LOCK_TIMEOUT}'"))
+            migration.upgrade(conn)
+            conn.execute(record, params)
+    else:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if _is_postgres(engine):
+                conn.execute(text(f"SET lock_timeout = '{MIGRATION_LOCK_TIMEOUT}'"))
+            # Statements must be idempotent: a failure part way leaves earlier ones applied
+            migration.upgrade(conn)
+            conn.execute(record, params)
+
+
+def upgrade(engine: Optional[Engine] = None) -> List[str]:
+    """
+    Apply every pending migration in order. Returns the versions applied.
+    """
+    engine = engine or database.engine
+    applied = []
+    with _migration_lock(engine):
+        for migration in pending(engine):
+            started = time.perf_counter()
+            for attempt in range(1, MIGRATION_RETRIES + 1):
+                try:
+                    _apply(engine, migration)
+                    break
+                except OperationalError as e:
+                    if attempt == MIGRATION_RETRIES:
+                        raise
+                    logging.warning(f"Migration {migration.name} attempt {attempt} failed, retrying: {e}")
+                    time.sleep(min(2 ** attempt, 30))
+            applied.append(migration.version)
+            logging.info(f"Applied migration {migration.name} in {time.perf_counter() - started:.2f}s")
+    return applied
+
+
+# Helpers for migration files. They check before acting so the baseline can
+# run against databases created by the old create_all() startup.
+
+def has_table(conn, table: str) -> bool:
+    from sqlalchemy import inspect
+    return inspect(conn).has_table(table)
+
+
+def has_column(conn, table: str, column: str) -> bool:
+    from sqlalchemy import inspect
+    return column in {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def add_column(conn, table: str, column: str, type_sql: str):
+    """
+    Add a nullable column. Without a default this is a catalog-only change on
+    Postgres and SQLite, so it is instant on large tables. Backfill separately.
+    """
+    if not has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {type_sql}"))
+
+
+def create_index(conn, name: str, table: str, columns: List[str], unique: bool = False, where: Optional[str] = None):
+    """
+    Create an index without blocking writes. On Postgres this uses
+    CONCURRENTLY, so the migration must set TRANSACTIONAL = False. `where`
+    makes it a partial index over the rows matching that SQL condition.
+    """
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    cols = ", ".join(columns)
+    predicate = f" WHERE {where}" if where else ""
+    if conn.dialect.name == "postgresql":
+        # A failed concurrent build leaves an invalid index that IF NOT EXISTS would skip
+        invalid = conn.execute(text(
+            "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({cols}){predicate}"))
+    else:
+        conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({cols}){predicate}"))
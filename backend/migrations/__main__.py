@@ -0,0 +1,18 @@
+import argparse
+import logging
+
+import database
+from migrations import discover, pending, upgrade
+
+parser = argparse.ArgumentParser(description="Apply database migrations")
+parser.add_argument("--status", action="store_true", help="list migrations without applying them")
+args = parser.parse_args()
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+if args.status:
+    waiting = {m.version for m in pending(database.engine)}
+    for migration in discover():
+        print(f"{'pending' if migration.version in waiting else 'applied'}  {migration.name}")
+else:
+    versions = upgrade(database.engine)
+    print(f"Applied {len(versions)} migration(s)" + (f": {', '.join(versions)}" if versions else ""))
@@ -0,0 +1,150 @@
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import metrics
+import prompts
+
+# Models from cheapest/fastest to strongest. Short prompts start on the first
+# tier; anything else starts on the second. A call whose output fails
+# validation (malformed JSON, empty lists) is retried on the next tier up.
+# A single model disables routing.
+MODEL_TIERS = [m.strip() for m in os.getenv(
+    "LLM_MODEL_TIERS", "google/gemini-2.0-flash-lite-001,google/gemini-2.0-flash-001"
+).split(",") if m.strip()]
+# Prompts up to this many (approximate) tokens count as simple, per task
+SIMPLE_MAX_TOKENS = {
+    "recommendations": int(os.getenv("LLM_ROUTER_SIMPLE_RECOMMENDATIONS_TOKENS", "350")),
+    "resume": int(os.getenv("LLM_ROUTER_SIMPLE_RESUME_TOKENS", "800")),
+    "batch": 0,
+}
+# A tier whose recent validation success rate for a task drops below this is
+# skipped for that task, except for a share of calls that keep measuring it.
+MIN_SUCCESS_RATE = float(os.getenv("LLM_ROUTER_MIN_SUCCESS_RATE", "0.8"))
+MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "10"))
+EXPLORE_RATE = float(os.getenv("LLM_ROUTER_EXPLORE_RATE", "0.1"))
+WINDOW = 100
+
+
+class InvalidOutput(ValueError):
+    """Raised by a validator when the model answered but the answer is unusable."""
+
+
+class ModelStats:
+    """
+    Rolling outcomes, latencies and token counts for one model on one task.
+    """
+
+    def __init__(self):
+        self.outcomes = deque(maxlen=WINDOW)
+        self.latencies = deque(maxlen=WINDOW)
+        self.tokens = deque(maxlen=WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.escalations = 0
+
+    def record(self, ok: bool, seconds: float, tokens: int):
+        self.calls += 1
+        self.outcomes.append(ok)
+        self.latencies.append(seconds)
+        if tokens:
+            self.tokens.append(tokens)
+
+    def success_rate(self) -> Optional[float]:
+        if not self.outcomes:
+            return None
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def healthy(self) -> bool:
+        rate = self.success_rate()
+        return len(self.outcomes) < MIN_SAMPLES or rate >= MIN_SUCCESS_RATE
+
+    def snapshot(self) -> Dict:
+        rate = self.success_rate()
+        ordered = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "escalations": self.escalations,
+            "success_rate": round(rate, 3) if rate is not None else None,
+            "p50_seconds": round(ordered[len(ordered) // 2], 3) if ordered else None,
+            "mean_tokens": round(sum(self.tokens) / len(self.tokens)) if self.tokens else None,
+            "healthy": self.healthy(),
+        }
+
+
+_stats: Dict[str, Dict[str, ModelStats]] = {}
+
+
+def _model_stats(task: str, model: str) -> ModelStats:
+    return _stats.setdefault(task, {}).setdefault(model, ModelStats())
+
+
+def plan(task: str, prompt: str) -> List[str]:
+    """
+    Models to try for this prompt, in order.
+    """
+    simple = prompts.count_tokens(prompt) <= SIMPLE_MAX_TOKENS.get(task, 0)
+    start = 0 if simple else min(1, len(MODEL_TIERS) - 1)
+    while (start < len(MODEL_TIERS) - 1 and not _model_stats(task, MODEL_TIERS[start]).healthy()
+           and random.random() >= EXPLORE_RATE):
+        start += 1
+    return MODEL_TIERS[start:]
+
+
+def record(task: str, model: str, ok: bool, seconds: float, body: Optional[Dict] = None):
+    usage = (body or {}).get("usage") or {}
+    tokens = (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+    _model_stats(task, model).record(ok, seconds, tokens)
+    metrics.llm_model_calls.inc(task=task, model=model, outcome="ok" if ok else "invalid")
+
+
+def escalated(task: str, model: str):
+    _model_stats(task, model).escalations += 1
+    metrics.llm_escalations.inc(task=task, model=model)
+
+
+async def complete(
+    task: str,
+    prompt: str,
+    send: Callable[[str], Awaitable[Dict]],
+    validate: Callable[[Dict], Any],
+) -> Any:
+    """
+    Call `send(model)` on each planned model until `validate` accepts the
+    response body, and return what it returned. Validators raise
+    InvalidOutput (or ValueError/KeyError for malformed JSON) to escalate;
+    any other error, such as an upstream failure, is raised at once.
+    """
+    models = plan(task, prompt)
+    for i, model in enumerate(models):
+        started = time.monotonic()
+        try:
+            body = await send(model)
+        except Exception:
+            # Upstream failures say nothing about the model's output, so they
+            # are counted but don't move the routing
+            _model_stats(task, model).errors += 1
+            metrics.llm_model_calls.inc(task=task, model=model, outcome="error")
+            raise
+        try:
+            result = validate(body)
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            record(task, model, False, time.monotonic() - started, body)
+            if i == len(models) - 1:
+                raise
+            escalated(task, model)
+            logging.info(f"LLM '{task}' output from {model} rejected ({e}); escalating to {models[i + 1]}")
+            continue
+        record(task, model, True, time.monotonic() - started, body)
+        return result
+
+
+def snapshot() -> Dict:
+    return {
+        "tiers": MODEL_TIERS,
+        "tasks": {task: {model: stats.snapshot() for model, stats in models.items()} for task, models in _stats.items()},
+    }
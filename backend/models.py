@@ -1,5 +1,7 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, Float
-from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Table, Text, Float, DateTime, event, text
+from sqlalchemy.orm import deferred, object_session, relationship
 from database import Base
 
 class User(Base):
@@ -17,23 +19,34 @@ class Profile(Base):
     __tablename__ = "profiles"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
     full_name = Column(String)
     skills = Column(String)  # Comma-separated or JSON string
     experience = Column(Text)
     education = Column(String)
     resume_path = Column(String)
     summary = Column(Text)
-    recommendations = Column(Text)
+    # Cached recommendation JSON, often several KB; only loaded when accessed
+    # or undeferred, so ordinary profile reads don't pull it in
+    recommendations = deferred(Column(Text))
     phone = Column(String)
     location = Column(String)
     github_url = Column(String)
     linkedin_url = Column(String)
     portfolio_url = Column(String)
     languages = Column(String)
+    # Bumped on every update (see _bump_profile_version); ETags are derived from it
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     user = relationship("User", back_populates="profile")
 
+@event.listens_for(Profile, "before_update")
+def _bump_profile_version(mapper, connection, target):
+    # before_update also fires for objects without net column changes
+    if object_session(target).is_modified(target, include_collections=False):
+        # Incremented in SQL so concurrent writers can't both write the same number
+        target.version = Profile.version + 1
+
 class Job(Base):
     __tablename__ = "jobs"
 
@@ -54,3 +67,101 @@ class Course(Base):
     link = Column(String)
     banner_url = Column(String)
     tags = Column(String)
+
+class RecommendationCache(Base):
+    __tablename__ = "recommendation_cache"
+
+    key = Column(String, primary_key=True)  # sha256 of the normalized prompt inputs
+    payload = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    touch_count = Column(Integer, default=0)  # hits that refreshed last_accessed_at, at most one per touch interval
+
+class GenerationLock(Base):
+    __tablename__ = "generation_locks"
+
+    key = Column(String, primary_key=True)
+    owner = Column(String)  # host:pid of the worker holding the lock
+    expires_at = Column(DateTime, index=True)
+
+class RecommendationJob(Base):
+    __tablename__ = "recommendation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String, default="pending", index=True)  # pending, running, done, failed
+    attempts = Column(Integer, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+
+    __table_args__ = (
+        # One pending job per user (migration 0009); enqueue relies on it
+        Index(
+            "ix_recommendation_jobs_pending_user", "user_id", unique=True,
+            sqlite_where=text("status = 'pending'"), postgresql_where=text("status = 'pending'")
+        ),
+    )
+
+class ResumeExtraction(Base):
+    __tablename__ = "resume_extractions"
+
+    content_hash = Column(String, primary_key=True)  # sha256 of the uploaded file
+    text = Column(Text)  # extracted and truncated text
+    parsed = Column(Text)  # JSON profile fields returned by the model
+    timings = Column(Text)  # JSON seconds per stage
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)  # route:scope:id, e.g. "recommendations:user:42"
+    tokens = Column(Float)  # tokens left at updated_at
+    updated_at = Column(Float, index=True)  # unix time of the last take
+    granted = Column(Boolean)  # outcome of the last take
+
+class LlmUsage(Base):
+    __tablename__ = "llm_usage"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(String, primary_key=True)  # UTC date, YYYY-MM-DD
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    cost = Column(Float, default=0.0)  # USD
+    requests = Column(Integer, default=0)
+
+class Skill(Base):
+    __tablename__ = "skills"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True)  # canonical, normalized form
+
+class SkillAlias(Base):
+    __tablename__ = "skill_aliases"
+
+    alias = Column(String, primary_key=True)  # squashed spelling, e.g. "reactjs"
+    skill_id = Column(Integer, ForeignKey("skills.id"), index=True)
+
+# Association tables. The primary key serves owner -> skills lookups and the
+# second index serves skill -> owners, so both directions are index scans.
+profile_skills = Table(
+    "profile_skills", Base.metadata,
+    Column("profile_id", Integer, ForeignKey("profiles.id", ondelete="CASCADE"), primary_key=True),
+    Column("skill_id", Integer, ForeignKey("skills.id"), primary_key=True),
+    Index("ix_profile_skills_skill_id", "skill_id", "profile_id"),
+)
+
+job_skills = Table(
+    "job_skills", Base.metadata,
+    Column("job_id", Integer, ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True),
+    Column("skill_id", Integer, ForeignKey("skills.id"), primary_key=True),
+    Index("ix_job_skills_skill_id", "skill_id", "job_id"),
+)
+
+course_skills = Table(
+    "course_skills", Base.metadata,
+    Column("course_id", Integer, ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True),
+    Column("skill_id", Integer, ForeignKey("skills.id"), primary_key=True),
+    Index("ix_course_skills_skill_id", "skill_id", "course_id"),
+)
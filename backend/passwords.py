@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from passlib.hash import pbkdf2_sha256
+
+import metrics
+
+# pbkdf2 runs inside hashlib with the GIL released, so a thread pool gives real parallelism
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Requests allowed to wait for a hashing thread before new ones get 503
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+# Fixed cost, or calibrate at startup so one hash takes about PASSWORD_HASH_TARGET_MS
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "0"))
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "0"))
+# Hashes below this fraction of the current cost are upgraded on login. The slack
+# stops workers that calibrated slightly differently from rehashing each other's output.
+REHASH_BELOW_FRACTION = 0.8
+
+pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_in_flight = 0
+_running = 0
+_stats = {"completed": 0, "rejected": 0, "rehashed": 0, "total_seconds": 0.0}
+
+
+def configure_rounds(rounds: int):
+    pwd_context.update(
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=max(1, int(rounds * REHASH_BELOW_FRACTION)),
+    )
+    logging.info(f"Password hashing: pbkdf2_sha256 with {rounds} rounds")
+
+
+def calibrate(target_ms: float, sample_rounds: int = 20000) -> int:
+    """
+    Rounds needed for one hash to take about `target_ms` on this machine.
+    """
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        pbkdf2_sha256.using(rounds=sample_rounds).hash("calibration")
+        best = min(best, time.perf_counter() - started)
+    rounds = int(sample_rounds * (target_ms / 1000.0) / best)
+    # Round so workers on identical hardware settle on the same value
+    return max(1000, round(rounds, -3))
+
+
+def init():
+    """
+    Apply the configured cost. Called once per worker at startup.
+    """
+    if PASSWORD_HASH_ROUNDS:
+        configure_rounds(PASSWORD_HASH_ROUNDS)
+    elif PASSWORD_HASH_TARGET_MS:
+        configure_rounds(calibrate(PASSWORD_HASH_TARGET_MS))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+    return _executor
+
+
+def _timed(fn, *args):
+    global _running
+    with _lock:
+        _running += 1
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        elapsed = time.perf_counter() - started
+        with _lock:
+            _running -= 1
+            _stats["completed"] += 1
+            _stats["total_seconds"] += elapsed
+
+
+async def _submit(fn, *args):
+    global _in_flight
+    with _lock:
+        if _in_flight >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING:
+            _stats["rejected"] += 1
+            metrics.password_hash_rejected.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many login attempts in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+        _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), _timed, fn, *args)
+    finally:
+        with _lock:
+            _in_flight -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _submit(pwd_context.hash, password)
+
+
+async def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password off the event loop. The second value is a replacement
+    hash when the stored one uses an outdated cost, otherwise None.
+    """
+    ok, new_hash = await _submit(pwd_context.verify_and_update, password, hashed)
+    if new_hash:
+        with _lock:
+            _stats["rehashed"] += 1
+    return ok, new_hash
+
+
+@metrics.on_collect
+def _export_pool_state():
+    with _lock:
+        metrics.password_hash_queued.set(max(0, _in_flight - _running))
+        metrics.password_hash_running.set(_running)
+
+
+def snapshot() -> Dict:
+    with _lock:
+        completed = _stats["completed"]
+        return {
+            "workers": PASSWORD_HASH_WORKERS,
+            "max_pending": PASSWORD_HASH_MAX_PENDING,
+            "in_flight": _in_flight,
+            "running": _running,
+            "queued": max(0, _in_flight - _running),
+            "completed": completed,
+            "rejected": _stats["rejected"],
+            "rehashed": _stats["rehashed"],
+            "avg_seconds": round(_stats["total_seconds"] / completed, 4) if completed else None,
+            "rounds": pwd_context.to_dict().get("pbkdf2_sha256__default_rounds", pbkdf2_sha256.default_rounds),
+        }
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -0,0 +1,94 @@
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Response projections for read endpoints:
+#   ?fields=username,profile.skills   keep only these (dotted names reach into nested objects)
+#   ?include=recommendations          add heavy fields that are left out by default
+
+
+class Projection(NamedTuple):
+    fields: Optional[List[str]]
+    include: FrozenSet[str]
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def params(include: Sequence[str] = ()):
+    """
+    Dependency factory reading ?fields= and ?include=. `include` lists the
+    optional extras the endpoint knows how to load.
+    """
+    allowed = frozenset(include)
+
+    def dependency(
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. username,profile.skills"),
+        include: Optional[str] = Query(None, description=f"Optional extras: {', '.join(sorted(allowed)) or 'none'}")
+    ) -> Projection:
+        requested = frozenset(_split(include))
+        unknown = requested - allowed
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Cannot include: {', '.join(sorted(unknown))}")
+        return Projection(_split(fields) or None, requested)
+
+    return dependency
+
+
+def _tree(fields: Sequence[str]) -> Dict[str, Dict]:
+    tree: Dict[str, Dict] = {}
+    for field in fields:
+        node = tree
+        for part in field.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _select(data: Any, tree: Dict[str, Dict], prefix: str, missing: List[str]) -> Any:
+    if isinstance(data, list):
+        return [_select(item, tree, prefix, missing) for item in data]
+    if not isinstance(data, dict):
+        # e.g. a null profile: nothing below it to select
+        return data
+    out = {}
+    for key, subtree in tree.items():
+        if key not in data:
+            missing.append(prefix + key)
+            continue
+        out[key] = _select(data[key], subtree, f"{prefix}{key}.", missing) if subtree else data[key]
+    return out
+
+
+def project(data: Any, fields: Sequence[str]) -> Any:
+    """
+    Keep only `fields` of a serialized object (or of each item of a list).
+    Unknown field names are a 400 rather than silently dropped.
+    """
+    missing: List[str] = []
+    result = _select(data, _tree(fields), "", missing)
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(set(missing)))}")
+    return result
+
+
+def _dump(model, obj) -> Dict:
+    if hasattr(model, "model_validate"):  # pydantic 2
+        return model.model_validate(obj, from_attributes=True).model_dump(mode="json")
+    return jsonable_encoder(model.parse_obj(obj) if isinstance(obj, dict) else model.from_orm(obj))
+
+
+def respond(obj, model, view: Projection):
+    """
+    Without a projection the object is returned as is, so the endpoint's
+    response_model does the usual serialization. Otherwise it is serialized
+    with `model` (which may carry included extras) and trimmed to `fields`.
+    """
+    if not view.fields and not view.include:
+        return obj
+    data = [_dump(model, item) for item in obj] if isinstance(obj, list) else _dump(model, obj)
+    if view.fields:
+        data = project(data, view.fields)
+    return JSONResponse(data)
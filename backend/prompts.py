@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List
+
+import metrics
+import skills
+from ttl_cache import TTLCache
+
+# Prompt building with a token budget. Profile fields are compacted before
+# they are interpolated, so whatever users paste into a profile or upload as
+# a resume, the prompt stays bounded:
+#   1. clean every field: whitespace, boilerplate lines, repeated lines (always)
+#   2. deduplicate skills (always)
+#   3. trim experience, then summary, education and skills, each only as far
+#      as needed to fit the budget and never below its minimum share
+PROFILE_TOKEN_BUDGET = int(os.getenv("PROMPT_PROFILE_TOKEN_BUDGET", "1000"))
+# Resume text sent for parsing (also what is stored after extraction)
+RESUME_TOKEN_BUDGET = int(os.getenv("RESUME_TOKEN_BUDGET", "3000"))
+# Recommendation prompts are cached by a hash of their inputs
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "1024"))
+PROMPT_CACHE_TTL_SECONDS = float(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600"))
+
+# Fields in the order they give up tokens, with the share of the budget each keeps
+TRIM_ORDER = (("experience", 0.4), ("summary", 0.15), ("education", 0.1), ("skills", 0.15))
+
+_TOKEN_RE = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+_SPACE_RE = re.compile(r"[ \t\u00a0]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+")
+_SKILL_SPLIT_RE = re.compile(r"[,;\n|•·]+")
+_BULLET_RE = re.compile(r"^[\-*•·▪●◦>]+\s*")
+_BOILERPLATE_RE = re.compile(
+    r"^(?:"
+    r"(?:curriculum vitae|resume|résumé|cv)"
+    r"|page \d+(?: of \d+)?"
+    r"|references?(?: are)?(?: available)?(?: (?:up)?on request)?\.?"
+    r"|i hereby declare\b.*"
+    r"|declaration:?.*"
+    r"|\S+@\S+\.\S+"
+    r"|(?:https?://|www\.)\S+"
+    r"|(?:phone|mobile|tel|e-?mail|linkedin|github)\s*:\s*\S.*"
+    r"|(?=(?:\D*\d){10})[+\d][\d\s()\-]+"
+    r")$",
+    re.IGNORECASE,
+)
+
+_cache = TTLCache(maxsize=PROMPT_CACHE_SIZE, ttl=PROMPT_CACHE_TTL_SECONDS)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Offline approximation of a BPE tokenizer: ASCII words cost one token per
+    six letters, numbers one per three digits, punctuation one each, and
+    other scripts one per character. Errs slightly high on English prose.
+    """
+    total = 0
+    for piece in _TOKEN_RE.findall(text or ""):
+        if piece.isdigit():
+            total += (len(piece) + 2) // 3
+        elif piece.isascii():
+            total += (len(piece) + 5) // 6
+        else:
+            total += len(piece)
+    return total
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+
+def clean_text(text: str) -> str:
+    """
+    Collapse whitespace and drop blank, boilerplate and repeated lines.
+    """
+    lines, seen = [], set()
+    for line in (text or "").splitlines():
+        line = _SPACE_RE.sub(" ", line).strip()
+        key = _BULLET_RE.sub("", line).lower()
+        if not key or key in seen or _BOILERPLATE_RE.match(key):
+            continue
+        seen.add(key)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def dedupe_skills(value: str) -> str:
+    """
+    One entry per skill, in first-seen order, comparing normalized spellings
+    ("ReactJS" and "react" are the same skill).
+    """
+    kept, seen = [], set()
+    for part in _SKILL_SPLIT_RE.split(value or ""):
+        part = _BULLET_RE.sub("", part.strip())
+        key = skills.normalize_skill(part)
+        if key and key not in seen:
+            seen.add(key)
+            kept.append(part)
+    return ", ".join(kept)
+
+
+def _cut_words(text: str, budget: int) -> str:
+    out, used = [], 0
+    for word in text.split(" "):
+        cost = count_tokens(word)
+        if used + cost > budget:
+            break
+        out.append(word)
+        used += cost
+    return " ".join(out)
+
+
+def trim_to_tokens(text: str, budget: int) -> str:
+    """
+    Keep whole lines, then whole sentences, from the start of `text` while
+    they fit `budget`; the first sentence that does not fit is cut at a word.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    lines, used = [], 0
+    for line in text.splitlines():
+        sentences = []
+        for sentence in _SENTENCE_RE.split(line):
+            cost = count_tokens(sentence)
+            if used + cost > budget:
+                partial = _cut_words(sentence, budget - used - 1)
+                if partial:
+                    sentences.append(partial + " …")
+                if sentences:
+                    lines.append(" ".join(sentences))
+                return "\n".join(lines)
+            sentences.append(sentence)
+            used += cost
+        lines.append(" ".join(sentences))
+    return "\n".join(lines)
+
+
+def compact_profile(profile_data: Dict, budget: int = PROFILE_TOKEN_BUDGET) -> Dict[str, str]:
+    """
+    The profile fields that go into a prompt, compacted to fit `budget` tokens.
+    """
+    fields = {name: clean_text(_text(profile_data.get(name))) for name, _ in TRIM_ORDER}
+    fields["skills"] = dedupe_skills(fields["skills"])
+    sizes = {name: count_tokens(value) for name, value in fields.items()}
+    for name, share in TRIM_ORDER:
+        over = sum(sizes.values()) - budget
+        if over <= 0:
+            break
+        target = max(int(budget * share), sizes[name] - over)
+        if target < sizes[name]:
+            fields[name] = trim_to_tokens(fields[name], target)
+            sizes[name] = count_tokens(fields[name])
+    return fields
+
+
+def _key(kind: str, *parts) -> str:
+    raw = json.dumps([kind, *parts], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cached(kind: str, inputs: List, build) -> str:
+    key = _key(kind, *inputs)
+    prompt = _cache.get(key)
+    if prompt is None:
+        prompt = build()
+        _cache.set(key, prompt)
+    return prompt
+
+
+def _profile_block(profile_data: Dict, budget: int) -> str:
+    raw = sum(count_tokens(_text(profile_data.get(name))) for name, _ in TRIM_ORDER)
+    fields = compact_profile(profile_data, budget)
+    metrics.prompt_tokens.inc(raw, stage="raw")
+    metrics.prompt_tokens.inc(sum(count_tokens(v) for v in fields.values()), stage="compacted")
+    return f"""Skills: {fields['skills']}
+    Experience: {fields['experience']}
+    Education: {fields['education']}
+    Summary: {fields['summary']}"""
+
+
+def recommendation_prompt(profile_data: Dict, budget: int = PROFILE_TOKEN_BUDGET) -> str:
+    # The name is deliberately left out: recommendations are cached by the
+    # fingerprint of these fields, so the prompt must not depend on anything else.
+    inputs = [budget] + [_text(profile_data.get(name)) for name, _ in TRIM_ORDER]
+    return _cached("recommendations", inputs, lambda: f"""
+    Based on the following user profile, suggest 5 relevant courses and 5 relevant jobs.
+    Return the response in a strict JSON format with keys 'courses' and 'jobs'.
+    Each course should have 'title', 'platform', 'link', 'banner_url', 'tags'.
+    IMPORTANT: For 'banner_url', try to provide a relevant educational image or logo.
+    Each job should have 'title', 'company', 'location', 'description', 'required_skills', 'link'.
+
+    Profile:
+    {_profile_block(profile_data, budget)}
+    """)
+
+
+def batch_prompt(profiles: Dict[str, Dict], budget: int = PROFILE_TOKEN_BUDGET) -> str:
+    """
+    One prompt for several profiles; `budget` applies to each profile. Not
+    cached as a whole since batches rarely repeat, but the profiles are
+    compacted the same way.
+    """
+    sections = "\n".join(
+        f"""
+    Profile id: {profile_id}
+    {_profile_block(data, budget)}
+    """ for profile_id, data in profiles.items()
+    )
+    return f"""
+    For EACH of the following user profiles, suggest 5 relevant courses and 5 relevant jobs.
+    Return the response in a strict JSON format: {{"results": [{{"id": <profile id>, "courses": [...], "jobs": [...]}}]}}
+    with one entry per profile id.
+    Each course should have 'title', 'platform', 'link', 'banner_url', 'tags'.
+    Each job should have 'title', 'company', 'location', 'description', 'required_skills', 'link'.
+    {sections}
+    """
+
+
+def compact_resume_text(text: str, budget: int = RESUME_TOKEN_BUDGET) -> str:
+    return trim_to_tokens(clean_text(text), budget)
+
+
+def resume_prompt(text: str, budget: int = RESUME_TOKEN_BUDGET) -> str:
+    # Not cached: parses are already stored per file hash in resume_extractions
+    return f"""
+    Extract personal information from this resume text and return it in a strict JSON format with keys:
+    'full_name', 'skills', 'experience', 'education', 'summary'.
+
+    Resume Text:
+    {compact_resume_text(text, budget)}
+    """
+
+
+def stats() -> Dict:
+    return dict(_cache.stats(), profile_token_budget=PROFILE_TOKEN_BUDGET, resume_token_budget=RESUME_TOKEN_BUDGET)
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import case, select
+
+import auth
+import database
+import metrics
+import models
+
+# Token buckets in front of the routes that cost a model call or a password
+# hash. Each route has a bucket per user and one per client IP (auth routes key
+# on the submitted username instead of a user); a request takes one token from
+# each, or none at all with a 429 and Retry-After when any of them is empty.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# "db": rate_limit_buckets table shared by every gunicorn worker.
+# "memory": per process, for tests and single-worker runs.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "db")
+# Proxies in front of the app that append to X-Forwarded-For (1 on Render). The
+# client IP is the entry that many hops from the right; anything further left
+# was sent by the client and can be forged. 0 uses the socket peer address.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv(
+    "RATE_LIMIT_TRUSTED_PROXIES",
+    # Older setting, equivalent to one proxy
+    "1" if os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes") else "0"
+))
+
+# Buckets not touched for this long are deleted; they would be full anyway
+_PRUNE_AFTER_SECONDS = 24 * 3600
+_PRUNE_INTERVAL_SECONDS = 3600
+
+
+class Limit(NamedTuple):
+    capacity: float  # burst size
+    per_minute: float  # refill rate
+
+    @property
+    def per_second(self) -> float:
+        return self.per_minute / 60.0
+
+
+def _limit(route: str, scope: str, default: str) -> Optional[Limit]:
+    """
+    RATE_LIMIT_<ROUTE>_<SCOPE>="burst/per_minute", e.g. "5/2" allows bursts of
+    five refilled at two a minute. "0" or "off" disables that bucket.
+    """
+    value = os.getenv(f"RATE_LIMIT_{route.upper()}_{scope.upper()}", default).strip().lower()
+    if value in ("", "0", "off"):
+        return None
+    capacity, _, per_minute = value.partition("/")
+    return Limit(float(capacity), float(per_minute or capacity))
+
+
+LIMITS: Dict[str, Dict[str, Optional[Limit]]] = {
+    # Refreshed or streamed recommendations: one model call each
+    "recommendations": {
+        "user": _limit("recommendations", "user", "5/2"),
+        "ip": _limit("recommendations", "ip", "30/10"),
+    },
+    # Resume uploads: text extraction plus a model call
+    "resume": {
+        "user": _limit("resume", "user", "5/2"),
+        "ip": _limit("resume", "ip", "30/10"),
+    },
+    # Register and login: a pbkdf2 hash each, and no user yet to key on. Guessing
+    # is limited per username, however many addresses it comes from; the IP
+    # bucket only caps floods, since a campus or office NAT puts many real users
+    # behind one address.
+    "auth": {
+        "user": None,
+        "account": _limit("auth", "account", "10/5"),
+        "ip": _limit("auth", "ip", "300/60"),
+    },
+}
+
+
+def _wait(limit: Limit, tokens: float, cost: float) -> float:
+    return 0.0 if tokens >= cost else (cost - tokens) / limit.per_second
+
+
+class MemoryStore:
+    """
+    Per-process buckets. Useful for tests and single-worker runs.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.time()
+
+    def _refilled(self, key: str, limit: Limit, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (limit.capacity, now))
+        return min(limit.capacity, tokens + (now - updated_at) * limit.per_second)
+
+    def peek(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        """
+        Seconds until `cost` tokens are available, without taking them.
+        """
+        with self._lock:
+            tokens = self._refilled(key, limit, time.time())
+        return _wait(limit, tokens, cost)
+
+    def take(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        """
+        Take `cost` tokens; returns 0 if granted, else seconds until they are available.
+        """
+        now = time.time()
+        with self._lock:
+            tokens = self._refilled(key, limit, now)
+            granted = tokens >= cost
+            self._buckets[key] = (tokens - cost if granted else tokens, now)
+            if now - self._last_prune > _PRUNE_INTERVAL_SECONDS:
+                self._prune(now)
+        return 0.0 if granted else _wait(limit, tokens, cost)
+
+    def _prune(self, now: float):
+        self._last_prune = now
+        cutoff = now - _PRUNE_AFTER_SECONDS
+        for key in [key for key, (_, updated_at) in self._buckets.items() if updated_at < cutoff]:
+            del self._buckets[key]
+
+    def stats(self) -> Dict:
+        return {"backend": "memory", "buckets": len(self._buckets)}
+
+
+class DatabaseStore:
+    """
+    Buckets in the rate_limit_buckets table, shared by all workers. Each take
+    is a single upsert that refills and spends in SQL, so concurrent workers
+    never read-modify-write the same row.
+    """
+
+    def __init__(self):
+        self._last_prune = time.time()
+
+    def peek(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        table = models.RateLimitBucket.__table__
+        with database.engine.connect() as conn:
+            row = conn.execute(select(table.c.tokens, table.c.updated_at).where(table.c.key == key)).first()
+        if row is None:
+            return 0.0
+        tokens = min(limit.capacity, row.tokens + (time.time() - row.updated_at) * limit.per_second)
+        return _wait(limit, tokens, cost)
+
+    def take(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        now = time.time()
+        table = models.RateLimitBucket.__table__
+        refilled = table.c.tokens + (now - table.c.updated_at) * limit.per_second
+        available = case((refilled > limit.capacity, limit.capacity), else_=refilled)
+        statement = database.upsert(table).values(
+            key=key, tokens=limit.capacity - cost, updated_at=now, granted=True
+        ).on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={
+                "tokens": case((available >= cost, available - cost), else_=available),
+                "updated_at": now,
+                "granted": available >= cost,
+            },
+        ).returning(table.c.tokens, table.c.granted)
+        with database.engine.begin() as conn:
+            tokens, granted = conn.execute(statement).one()
+            if now - self._last_prune > _PRUNE_INTERVAL_SECONDS:
+                self._last_prune = now
+                conn.execute(table.delete().where(table.c.updated_at < now - _PRUNE_AFTER_SECONDS))
+        return 0.0 if granted else _wait(limit, tokens, cost)
+
+    def stats(self) -> Dict:
+        return {"backend": "db"}
+
+
+if RATE_LIMIT_BACKEND == "memory":
+    store = MemoryStore()
+else:
+    store = DatabaseStore()
+
+
+def client_ip(request: Request) -> str:
+    peer = request.client.host if request.client else "unknown"
+    if RATE_LIMIT_TRUSTED_PROXIES > 0:
+        hops = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        # Fewer entries than proxies means the request skipped them; trust only the peer
+        if len(hops) >= RATE_LIMIT_TRUSTED_PROXIES:
+            return hops[-RATE_LIMIT_TRUSTED_PROXIES]
+    return peer
+
+
+def _spend(buckets: List[Tuple[str, str, Limit]], cost: float) -> Optional[Tuple[str, float]]:
+    """
+    Take `cost` from every bucket, or from none when one of them is short, so a
+    rejected request does not drain the buckets that still had room. Returns
+    the scope that refused and its wait, or None when granted.
+    """
+    for scope, key, limit in buckets:
+        retry_after = store.peek(key, limit, cost)
+        if retry_after > 0:
+            return scope, retry_after
+    for scope, key, limit in buckets:
+        retry_after = store.take(key, limit, cost)
+        if retry_after > 0:
+            # Emptied by a concurrent request since the peek
+            return scope, retry_after
+    return None
+
+
+async def check(
+    route: str,
+    request: Request,
+    user_id: Optional[int] = None,
+    cost: float = 1.0,
+    username: Optional[str] = None
+):
+    """
+    Spend from the route's IP, user and (for anonymous routes given the
+    submitted `username`) account buckets, raising 429 when any is empty.
+    A backend failure lets the request through rather than failing it.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    subjects = [("ip", client_ip(request))]
+    if user_id is not None:
+        subjects.append(("user", user_id))
+    if username:
+        subjects.append(("account", username.strip().lower()))
+    buckets = [
+        (scope, f"{route}:{scope}:{subject}", LIMITS[route][scope])
+        for scope, subject in subjects if LIMITS[route].get(scope) is not None
+    ]
+    try:
+        refused = await asyncio.to_thread(_spend, buckets, cost)
+    except Exception as e:
+        logging.warning(f"Rate limit check failed for {route}: {e}")
+        return
+    if refused is not None:
+        scope, retry_after = refused
+        metrics.rate_limited.inc(route=route, scope=scope)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def limit(route: str):
+    """
+    Dependency for authenticated routes: per-user and per-IP buckets.
+    """
+    async def dependency(request: Request, current_user: auth.Principal = Depends(auth.get_current_principal)):
+        await check(route, request, current_user.id)
+
+    return dependency
+
+
+def snapshot() -> Dict:
+    return dict(
+        store.stats(),
+        enabled=RATE_LIMIT_ENABLED,
+        limits={route: {scope: limit._asdict() if limit else None for scope, limit in scopes.items()}
+                for route, scopes in LIMITS.items()},
+    )
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import database
+import metrics
+import models
+from ttl_cache import TTLCache
+
+# "db" shares entries across workers and restarts, "memory" is per-process
+REC_CACHE_BACKEND = os.getenv("REC_CACHE_BACKEND", "db")
+REC_CACHE_TTL_SECONDS = int(os.getenv("REC_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+REC_CACHE_MAX_ENTRIES = int(os.getenv("REC_CACHE_MAX_ENTRIES", "50000"))
+# Trim expired and excess entries every N writes or this often, whichever
+# comes first, rather than counting the table on every write
+REC_CACHE_EVICT_EVERY = int(os.getenv("REC_CACHE_EVICT_EVERY", "100"))
+REC_CACHE_EVICT_INTERVAL = timedelta(seconds=int(os.getenv("REC_CACHE_EVICT_INTERVAL_SECONDS", "60")))
+# Only refresh last_accessed_at this often, so cache hits don't turn into writes
+_TOUCH_INTERVAL = timedelta(minutes=5)
+
+# Bump when the prompt or response format changes to orphan old entries
+FINGERPRINT_VERSION = "v2"
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _normalize_text(value: Optional[str]) -> str:
+    return _WS_RE.sub(" ", (value or "")).strip().lower()
+
+
+def _normalize_skills(value: Optional[str]) -> str:
+    skills = {_normalize_text(s) for s in (value or "").split(",")}
+    skills.discard("")
+    return ",".join(sorted(skills))
+
+
+def prompt_inputs(profile) -> Dict:
+    """
+    The profile fields that feed the recommendation prompt.
+    """
+    return {
+        "skills": profile.skills,
+        "experience": profile.experience,
+        "education": profile.education,
+        "summary": profile.summary
+    }
+
+
+def fingerprint(profile_data: Dict) -> str:
+    """
+    Content hash of the normalized prompt inputs. Profiles that only differ in
+    name, contact details, skill order or whitespace map to the same key.
+    """
+    normalized = {
+        "v": FINGERPRINT_VERSION,
+        "skills": _normalize_skills(profile_data.get("skills")),
+        "experience": _normalize_text(profile_data.get("experience")),
+        "education": _normalize_text(profile_data.get("education")),
+        "summary": _normalize_text(profile_data.get("summary")),
+    }
+    raw = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _count(hits: int, misses: int):
+    if hits:
+        metrics.cache_requests.inc(hits, cache="recommendations", result="hit")
+    if misses:
+        metrics.cache_requests.inc(misses, cache="recommendations", result="miss")
+
+
+class MemoryStore:
+    """
+    Per-process store backed by TTLCache. Useful for tests and single-worker runs.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, db: Session, key: str, record: bool = True) -> Optional[Dict]:
+        value = self._cache.get(key)
+        if record:
+            _count(value is not None, value is None)
+        return value
+
+    def set(self, db: Session, key: str, value: Dict):
+        self._cache.set(key, value)
+
+    def get_many(self, db: Session, keys: List[str]) -> Dict[str, Dict]:
+        found = {key: self._cache.get(key) for key in keys}
+        found = {key: value for key, value in found.items() if value is not None}
+        _count(len(found), len(keys) - len(found))
+        return found
+
+    def set_many(self, db: Session, values: Dict[str, Dict]):
+        for key, value in values.items():
+            self._cache.set(key, value)
+
+    def delete(self, db: Session, key: str):
+        self._cache.pop(key)
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+class DatabaseStore:
+    """
+    Store backed by the recommendation_cache table, shared by all workers.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = timedelta(seconds=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._last_evict = datetime.utcnow()
+
+    def get(self, db: Session, key: str, record: bool = True) -> Optional[Dict]:
+        """
+        Fresh entry for `key`. With `record=False` (repeated polls while another
+        worker generates) the lookup is left out of the hit/miss counts.
+        """
+        entry = db.query(models.RecommendationCache).filter(models.RecommendationCache.key == key).first()
+        now = datetime.utcnow()
+        value = None
+        if entry is not None and entry.created_at >= now - self.ttl:
+            try:
+                value = json.loads(entry.payload)
+            except ValueError:
+                pass
+        if not record:
+            return value
+        if value is None:
+            self.misses += 1
+            _count(0, 1)
+            return None
+        self.hits += 1
+        _count(1, 0)
+        if entry.last_accessed_at is None or entry.last_accessed_at < now - _TOUCH_INTERVAL:
+            entry.last_accessed_at = now
+            entry.touch_count = (entry.touch_count or 0) + 1
+            db.commit()
+        return value
+
+    def _upsert(self, db: Session, rows: List[Dict]):
+        """
+        Insert or overwrite in one statement, so two workers filling the same
+        key both succeed instead of one losing on the primary key.
+        """
+        stmt = database.upsert(models.RecommendationCache.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={
+                "payload": stmt.excluded.payload,
+                "created_at": stmt.excluded.created_at,
+                "last_accessed_at": stmt.excluded.last_accessed_at,
+            },
+        )
+        db.execute(stmt, rows)
+        db.commit()
+
+    def set(self, db: Session, key: str, value: Dict):
+        now = datetime.utcnow()
+        self._upsert(db, [{"key": key, "payload": json.dumps(value), "created_at": now, "last_accessed_at": now}])
+        self._maybe_evict(db, now, 1)
+
+    def get_many(self, db: Session, keys: List[str]) -> Dict[str, Dict]:
+        """
+        Fresh entries for `keys`, fetched in chunks. Used by batch jobs, so access
+        times are not touched.
+        """
+        cutoff = datetime.utcnow() - self.ttl
+        found = {}
+        for i in range(0, len(keys), 500):
+            for entry in db.query(models.RecommendationCache).filter(
+                models.RecommendationCache.key.in_(keys[i:i + 500]),
+                models.RecommendationCache.created_at >= cutoff
+            ):
+                try:
+                    found[entry.key] = json.loads(entry.payload)
+                except ValueError:
+                    pass
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        _count(len(found), len(keys) - len(found))
+        return found
+
+    def set_many(self, db: Session, values: Dict[str, Dict]):
+        """
+        Upsert many entries in one transaction.
+        """
+        if not values:
+            return
+        now = datetime.utcnow()
+        self._upsert(db, [
+            {"key": key, "payload": json.dumps(value), "created_at": now, "last_accessed_at": now}
+            for key, value in values.items()
+        ])
+        self._maybe_evict(db, now, len(values))
+
+    def delete(self, db: Session, key: str):
+        db.query(models.RecommendationCache).filter(models.RecommendationCache.key == key).delete()
+        db.commit()
+
+    def _maybe_evict(self, db: Session, now: datetime, written: int):
+        self._writes += written
+        if self._writes < REC_CACHE_EVICT_EVERY and now - self._last_evict < REC_CACHE_EVICT_INTERVAL:
+            return
+        self._writes = 0
+        self._last_evict = now
+        self._evict(db, now)
+
+    def _evict(self, db: Session, now: datetime):
+        Cache = models.RecommendationCache
+        removed = db.query(Cache).filter(Cache.created_at < now - self.ttl).delete(synchronize_session=False)
+        excess = db.query(Cache).count() - self.maxsize
+        if excess > 0:
+            oldest = select(Cache.key).order_by(Cache.last_accessed_at).limit(excess)
+            removed += db.query(Cache).filter(Cache.key.in_(oldest)).delete(synchronize_session=False)
+        if removed:
+            self.evictions += removed
+            db.commit()
+
+    def stats(self) -> Dict:
+        return {
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+if REC_CACHE_BACKEND == "memory":
+    store = MemoryStore(REC_CACHE_MAX_ENTRIES, REC_CACHE_TTL_SECONDS)
+else:
+    store = DatabaseStore(REC_CACHE_MAX_ENTRIES, REC_CACHE_TTL_SECONDS)
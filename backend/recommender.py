@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+from typing import AsyncIterator, Dict, Tuple
+
+from sqlalchemy.orm import Session
+
+import ai_service
+import database
+import llm_quota
+import models
+import rec_cache
+import singleflight
+
+# "llm": model first, local catalog as fallback. "catalog": catalog first, model
+# only when the catalog has nothing to offer.
+RECOMMENDER_MODE = os.getenv("RECOMMENDER_MODE", "llm")
+# Local ranking used by the catalog path: "bm25" keyword matching or "semantic" embeddings
+LOCAL_RANKER = os.getenv("LOCAL_RANKER", "bm25")
+
+_generations = singleflight.SingleFlight()
+
+
+def load_profile_recommendations(db_profile: models.Profile):
+    """
+    Returns the recommendations stored on the profile, or None if absent/corrupt.
+    """
+    if not db_profile.recommendations:
+        return None
+    try:
+        return json.loads(db_profile.recommendations)
+    except ValueError as e:
+        logging.warning(f"Failed to parse cached recommendations for profile {db_profile.id}: {e}")
+        return None
+
+
+async def _generate_and_cache(key: str, profile_data: Dict) -> Dict:
+    """
+    Call the model and store the result under `key`. Runs detached from the
+    request, so it uses its own session.
+    """
+    db = database.SessionLocal()
+    try:
+        async def generate():
+            recommendations = await ai_service.request_ai_recommendations(profile_data)
+            rec_cache.store.set(db, key, recommendations)
+            return recommendations
+
+        if singleflight.SINGLEFLIGHT_DB_LOCK:
+            return await singleflight.run_exclusive(
+                db, key, generate, lambda: rec_cache.store.get(db, key, record=False)
+            )
+        return await generate()
+    finally:
+        db.close()
+
+
+async def generate_recommendations(key: str, profile_data: Dict) -> Dict:
+    """
+    Concurrent callers with the same fingerprint share a single model call,
+    whether it was started here or by a stream.
+    """
+    try:
+        return await _generations.do(key, lambda: _generate_and_cache(key, profile_data))
+    except singleflight.Abandoned:
+        # The stream producing it was closed early; generate it ourselves
+        return await _generations.do(key, lambda: _generate_and_cache(key, profile_data))
+
+
+def warm_up():
+    """
+    Import the local rankers ahead of the first fallback request.
+    """
+    import catalog  # noqa: F401
+    if LOCAL_RANKER == "semantic":
+        import embeddings  # noqa: F401
+
+
+async def local_recommendations(profile_data: Dict):
+    """
+    Rank the jobs/courses tables in-process. Falls back to BM25 when the
+    semantic index is empty or unavailable.
+    """
+    # Imported on first use: numpy and the indexes are not needed to boot a worker
+    import catalog
+    if LOCAL_RANKER == "semantic":
+        import embeddings
+        local = await embeddings.recommend(profile_data)
+        if local:
+            return local
+    return await catalog.recommend(profile_data)
+
+
+async def fallback_recommendations(profile_data: Dict) -> Dict:
+    """
+    Best answer available without the model: the local catalog, else static data.
+    """
+    try:
+        local = await local_recommendations(profile_data)
+    except Exception as e:
+        logging.error(f"Catalog recommendations failed: {e}", exc_info=True)
+        local = None
+    return local or ai_service.get_fallback_data()
+
+
+async def get_recommendations(
+    db: Session,
+    db_profile: models.Profile,
+    refresh: bool = False,
+    fallback: bool = True
+) -> Dict:
+    """
+    Resolve recommendations for a profile: per-profile copy, then the shared
+    content-addressed cache, then the LLM. Catalog/fallback data is returned on
+    failure but never cached, so the next request retries the model. With
+    `fallback=False` the error is raised instead.
+
+    A user over their daily LLM quota gets the stored or cached answer even
+    when asking for a refresh, and the catalog when there is none.
+    """
+    profile_data = rec_cache.prompt_inputs(db_profile)
+    if RECOMMENDER_MODE == "catalog":
+        local = await local_recommendations(profile_data)
+        if local:
+            return local
+
+    within_quota = None
+    if refresh:
+        within_quota = llm_quota.allowed(db_profile.user_id)
+        # Over quota, a refresh settles for what is already stored
+        refresh = within_quota
+
+    if not refresh:
+        cached = load_profile_recommendations(db_profile)
+        if cached is not None:
+            return cached
+
+    key = rec_cache.fingerprint(profile_data)
+
+    recommendations = None if refresh else rec_cache.store.get(db, key)
+    if recommendations is None:
+        if within_quota is None:
+            within_quota = llm_quota.allowed(db_profile.user_id)
+        if not within_quota:
+            if not fallback:
+                raise llm_quota.QuotaExceeded(f"Daily LLM quota used up for user {db_profile.user_id}")
+            return await fallback_recommendations(profile_data)
+        # Return the connection to the pool while waiting on the model
+        db.commit()
+        try:
+            with llm_quota.charge_to(db_profile.user_id):
+                recommendations = await generate_recommendations(key, profile_data)
+        except Exception as e:
+            if not fallback:
+                raise
+            logging.error(f"AI Recommendations Error: {e}", exc_info=True)
+            return await fallback_recommendations(profile_data)
+
+    save_profile_recommendations(db, db_profile, key, recommendations)
+    return recommendations
+
+
+def save_profile_recommendations(db: Session, db_profile: models.Profile, key: str, recommendations: Dict):
+    """
+    Store recommendations on the profile unless it was edited while they were
+    being generated, in which case they belong to the old inputs.
+    """
+    db.refresh(db_profile)
+    if rec_cache.fingerprint(rec_cache.prompt_inputs(db_profile)) != key:
+        return
+    db_profile.recommendations = json.dumps(recommendations)
+    db.commit()
+
+
+def _items(recommendations: Dict):
+    for section in ("courses", "jobs"):
+        for item in recommendations.get(section, []):
+            yield section, item
+
+
+async def stream_recommendations(
+    db: Session,
+    db_profile: models.Profile,
+    refresh: bool = False
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Like get_recommendations, but yields ('courses' | 'jobs', item) pairs as the
+    model produces them. Cached answers are replayed at once and the streamed
+    result is cached when the completion finishes.
+    """
+    profile_data = rec_cache.prompt_inputs(db_profile)
+    key = rec_cache.fingerprint(profile_data)
+
+    within_quota = None
+    if refresh:
+        within_quota = llm_quota.allowed(db_profile.user_id)
+        # Over quota, a refresh settles for what is already stored
+        refresh = within_quota
+
+    recommendations = None
+    if not refresh:
+        recommendations = load_profile_recommendations(db_profile) or rec_cache.store.get(db, key)
+    if recommendations is None:
+        db.commit()
+        if within_quota is None:
+            within_quota = llm_quota.allowed(db_profile.user_id)
+        if not within_quota:
+            recommendations = await fallback_recommendations(profile_data)
+    flight = None
+    if recommendations is None:
+        flight = _generations.lead(key)
+        if flight is None:
+            # Someone is already generating this fingerprint; wait for it instead of paying twice
+            try:
+                recommendations = await generate_recommendations(key, profile_data)
+            except Exception as e:
+                logging.error(f"AI Recommendations Error: {e}", exc_info=True)
+                recommendations = await fallback_recommendations(profile_data)
+    if recommendations is not None:
+        for pair in _items(recommendations):
+            yield pair
+        return
+
+    # This stream is now the generation for `key`: concurrent streams and
+    # get_recommendations calls wait for its result instead of starting their own
+    streamed = {"courses": [], "jobs": []}
+    try:
+        try:
+            with llm_quota.charge_to(db_profile.user_id):
+                async for section, item in ai_service.stream_ai_recommendations(profile_data):
+                    streamed[section].append(item)
+                    yield section, item
+        except Exception as e:
+            logging.error(f"AI Recommendations stream error: {e}", exc_info=True)
+            flight.set_exception(e)
+            if streamed["courses"] or streamed["jobs"]:
+                # Keep what the client already has; fill only the missing section
+                fallback = await fallback_recommendations(profile_data)
+                for section in ("courses", "jobs"):
+                    if not streamed[section]:
+                        for item in fallback.get(section, []):
+                            yield section, item
+            else:
+                for pair in _items(await fallback_recommendations(profile_data)):
+                    yield pair
+            return
+
+        rec_cache.store.set(db, key, streamed)
+        flight.set_result(streamed)
+        save_profile_recommendations(db, db_profile, key, streamed)
+    finally:
+        if not flight.done():
+            # Client went away mid-stream: release the waiters to generate themselves
+            flight.set_exception(singleflight.Abandoned(key))
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+import metrics
+
+# Breaker: open after this many consecutive upstream failures, probe again after the cooldown
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# Retries for 429/5xx/network errors, with full-jitter exponential backoff
+RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+# Hedging: fire a second identical request once the first is slower than p95
+HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "2"))
+
+# Total time an endpoint may spend on the LLM, retries included
+LATENCY_BUDGETS = {
+    "recommendations": float(os.getenv("LLM_BUDGET_RECOMMENDATIONS_SECONDS", "25")),
+    "resume": float(os.getenv("LLM_BUDGET_RESUME_SECONDS", "45")),
+    "batch": float(os.getenv("LLM_BUDGET_BATCH_SECONDS", "120")),
+}
+DEFAULT_BUDGET_SECONDS = 30.0
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the breaker is open."""
+
+
+class BudgetExceededError(Exception):
+    """Raised when the latency budget runs out before a successful response."""
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures. After
+    `reset_timeout` one probe call is let through (half-open); its outcome closes
+    or re-opens the breaker.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.opens = 0
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "closed":
+            return True
+        # A probe whose caller vanished without reporting back must not wedge the breaker
+        if self.state == "half_open" and (not self._probe_in_flight or now - self._probe_started > self.reset_timeout):
+            self._probe_in_flight = True
+            self._probe_started = now
+            return True
+        self.short_circuits += 1
+        return False
+
+    def record_success(self):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self.state != "closed":
+            logging.info(f"Circuit '{self.name}' closed")
+        self.state = "closed"
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opens += 1
+                logging.warning(f"Circuit '{self.name}' opened after {self.consecutive_failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "short_circuits": self.short_circuits,
+            "opens": self.opens,
+        }
+
+
+class EndpointStats:
+    """
+    Rolling latency window and counters for one LLM endpoint.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.latencies = deque(maxlen=200)
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_exceeded = 0
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def snapshot(self) -> Dict:
+        p95 = self.p95()
+        return {
+            "budget_seconds": self.budget,
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "budget_exceeded": self.budget_exceeded,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+        }
+
+
+breaker = CircuitBreaker("openrouter", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+_endpoints: Dict[str, EndpointStats] = {}
+
+
+def _stats(endpoint: str) -> EndpointStats:
+    if endpoint not in _endpoints:
+        _endpoints[endpoint] = EndpointStats(LATENCY_BUDGETS.get(endpoint, DEFAULT_BUDGET_SECONDS))
+    return _endpoints[endpoint]
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Failures that say something about upstream health: network errors, timeouts,
+    429 and 5xx. Other 4xx responses and bad payloads are our problem.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        code = error.response.status_code
+        return code == 429 or code >= 500
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    if isinstance(error, httpx.HTTPStatusError):
+        retry_after = error.response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+async def _hedged(fn: Callable[[], Awaitable[Any]], stats: EndpointStats) -> Any:
+    threshold = stats.p95() if HEDGE_ENABLED else None
+    if threshold is None:
+        return await fn()
+    tasks = [asyncio.ensure_future(fn())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=max(threshold, HEDGE_MIN_DELAY_SECONDS))
+        if done:
+            return tasks[0].result()
+        stats.hedges += 1
+        tasks.append(asyncio.ensure_future(fn()))
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is tasks[1]:
+                        stats.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call(endpoint: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run an upstream call under the endpoint's latency budget, with retries,
+    optional hedging and the shared circuit breaker.
+    """
+    stats = _stats(endpoint)
+    stats.calls += 1
+    call_started = time.monotonic()
+    outcome = "error"
+    try:
+        result = await _call(endpoint, fn, stats, call_started + stats.budget)
+        outcome = "ok"
+        return result
+    except CircuitOpenError:
+        outcome = "circuit_open"
+        raise
+    except BudgetExceededError:
+        outcome = "budget_exceeded"
+        raise
+    finally:
+        metrics.llm_latency.observe(time.monotonic() - call_started, endpoint=endpoint, outcome=outcome)
+
+
+async def _call(endpoint: str, fn: Callable[[], Awaitable[Any]], stats: EndpointStats, deadline: float) -> Any:
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit '{breaker.name}' is open")
+        remaining = deadline - time.monotonic()
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(_hedged(fn, stats), timeout=remaining)
+        except Exception as e:
+            if not is_retryable(e):
+                # Upstream answered; a bad request says nothing about its health
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            attempt += 1
+            delay = _retry_delay(e, attempt)
+            if breaker.state == "open":
+                raise
+            if attempt >= RETRY_MAX_ATTEMPTS or time.monotonic() + delay >= deadline:
+                if time.monotonic() >= deadline or isinstance(e, asyncio.TimeoutError):
+                    stats.budget_exceeded += 1
+                    raise BudgetExceededError(f"{endpoint}: no answer within {stats.budget}s") from e
+                raise
+            stats.retries += 1
+            logging.warning(f"LLM call '{endpoint}' failed ({e!r}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        stats.latencies.append(time.monotonic() - started)
+        return result
+
+
+@metrics.on_collect
+def _export_breaker_state():
+    metrics.llm_breaker_state.set(
+        {"closed": 0, "half_open": 1, "open": 2}[breaker.state], circuit=breaker.name
+    )
+
+
+def snapshot() -> Dict:
+    return {
+        "breaker": breaker.snapshot(),
+        "endpoints": {name: stats.snapshot() for name, stats in _endpoints.items()},
+    }
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+import ai_service
+import database
+import jobs
+import llm_quota
+import models
+import prompts
+import rec_cache
+import skills
+import text_extraction
+
+# Extraction is CPU-bound; a small per-worker pool keeps it off the event loop
+# without taking every core away from request handling.
+RESUME_EXTRACT_WORKERS = int(os.getenv("RESUME_EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Token budget for the extraction prompt
+RESUME_TOKEN_BUDGET = prompts.RESUME_TOKEN_BUDGET
+RESUME_LLM_CONCURRENCY = int(os.getenv("RESUME_LLM_CONCURRENCY", "8"))
+
+PROFILE_FIELDS = ("full_name", "skills", "experience", "education", "summary")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and DB pools is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=RESUME_EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def truncate_to_budget(text: str, token_budget: int = RESUME_TOKEN_BUDGET) -> str:
+    """
+    Collapse whitespace, drop blank and boilerplate lines and cut at a line or
+    sentence boundary so the text fits the token budget.
+    """
+    return prompts.compact_resume_text(text, token_budget)
+
+
+def _as_text(value) -> str:
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return str(value or "").strip()
+
+
+def merge_into_profile(db_profile: models.Profile, parsed: Dict) -> bool:
+    """
+    Fill empty profile fields from the parsed resume and add any new skills.
+    Values the user typed are never overwritten. Returns True if a field changed.
+    """
+    changed = False
+    for field in PROFILE_FIELDS:
+        value = _as_text(parsed.get(field))
+        if not value:
+            continue
+        current = getattr(db_profile, field) or ""
+        if field == "skills":
+            known = {s.strip().lower() for s in current.split(",") if s.strip()}
+            new = [s.strip() for s in value.split(",") if s.strip() and s.strip().lower() not in known]
+            if new:
+                db_profile.skills = ", ".join(filter(None, [current.strip(", ")] + new))
+                changed = True
+        elif not current.strip() or (field == "full_name" and current == db_profile.user.username):
+            setattr(db_profile, field, value)
+            changed = True
+    return changed
+
+
+async def _extract(path: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), text_extraction.extract_text, path)
+
+
+async def _parse(text: str) -> Optional[Dict]:
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(RESUME_LLM_CONCURRENCY)
+    async with _llm_semaphore:
+        return await ai_service.parse_resume_to_profile(text)
+
+
+def _find(db: Session, digest: str) -> Optional[models.ResumeExtraction]:
+    return db.query(models.ResumeExtraction).filter(models.ResumeExtraction.content_hash == digest).first()
+
+
+def is_parsed(db: Session, digest: str) -> bool:
+    """
+    True once a parse is stored for this content hash, so re-uploading the
+    file has nothing left to do. Failed or quota-skipped parses return False.
+    """
+    return db.query(models.ResumeExtraction.parsed).filter(
+        models.ResumeExtraction.content_hash == digest
+    ).scalar() is not None
+
+
+async def analyze_resume(db: Session, path: str, digest: str, use_llm: bool = True) -> Optional[Dict]:
+    """
+    Run extraction -> truncation -> LLM parsing for one file, reusing any stage
+    already stored for this content hash. Returns the parsed profile fields.
+    With `use_llm=False` only a previously stored parse is used.
+    """
+    entry = _find(db, digest)
+    if entry is None:
+        # Concurrent uploads of one file both get here; the second insert is a no-op
+        db.execute(database.upsert(models.ResumeExtraction.__table__).values(content_hash=digest).on_conflict_do_nothing())
+        db.commit()
+        entry = _find(db, digest)
+    timings = json.loads(entry.timings) if entry.timings else {}
+
+    if entry.text is None:
+        # Release the pooled connection while the extraction pool works
+        db.commit()
+        started = time.perf_counter()
+        raw = await _extract(path)
+        timings["extract"] = round(time.perf_counter() - started, 4)
+        started = time.perf_counter()
+        entry.text = truncate_to_budget(raw)
+        timings["truncate"] = round(time.perf_counter() - started, 4)
+        entry.timings = json.dumps(timings)
+        db.commit()
+
+    if entry.parsed is None and entry.text and use_llm:
+        text = entry.text
+        # Same for the length of the model call
+        db.commit()
+        started = time.perf_counter()
+        parsed = await _parse(text)
+        timings["llm"] = round(time.perf_counter() - started, 4)
+        entry.timings = json.dumps(timings)
+        if parsed:
+            entry.parsed = json.dumps(parsed)
+        db.commit()
+
+    logging.info(f"Resume {digest[:12]} stages: {timings}")
+    return json.loads(entry.parsed) if entry.parsed else None
+
+
+async def ingest_resume(db: Session, user_id: int, path: str, digest: str) -> bool:
+    """
+    Analyze a resume and merge it into the user's profile. If the merge changed
+    any prompt input, cached recommendations are cleared and regenerated.
+    A user over their daily LLM quota only gets a parse stored for the same file.
+    """
+    within_quota = llm_quota.allowed(user_id, feature="resume")
+    with llm_quota.charge_to(user_id):
+        parsed = await analyze_resume(db, path, digest, use_llm=within_quota)
+    db_profile = db.query(models.Profile).filter(models.Profile.user_id == user_id).first()
+    if not parsed or db_profile is None:
+        return False
+    started = time.perf_counter()
+    old_key = rec_cache.fingerprint(rec_cache.prompt_inputs(db_profile))
+    if not merge_into_profile(db_profile, parsed):
+        return False
+    skills.sync_profile_skills(db, db_profile)
+    if rec_cache.fingerprint(rec_cache.prompt_inputs(db_profile)) != old_key:
+        db_profile.recommendations = None
+    db.commit()
+    if db_profile.recommendations is None:
+        jobs.enqueue_recommendations(db, user_id)
+    logging.info(f"Resume {digest[:12]} merged into profile {db_profile.id} in {time.perf_counter() - started:.4f}s")
+    return True
+
+
+async def ingest_in_background(user_id: int, path: str, digest: str):
+    db = database.SessionLocal()
+    try:
+        await ingest_resume(db, user_id, path, digest)
+    except Exception as e:
+        logging.error(f"Resume ingestion failed for user {user_id}: {e}", exc_info=True)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import hashlib
+    import shutil
+
+    import http_client
+    import uploads
+
+    parser = argparse.ArgumentParser(
+        description="Bulk-import resumes. Each file's name (without extension) is the username it belongs to."
+    )
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="extraction processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="resumes in flight at once")
+    args = parser.parse_args()
+    # Offline import: use every core for extraction
+    RESUME_EXTRACT_WORKERS = args.workers
+
+    def store(path: str):
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        target = uploads.content_path(digest, os.path.splitext(path)[1].lower())
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not os.path.exists(target):
+            shutil.copyfile(path, target)
+        return target, digest
+
+    async def import_one(path: str, limit: asyncio.Semaphore) -> str:
+        async with limit:
+            return await _import_one(path)
+
+    async def _import_one(path: str) -> str:
+        username = os.path.splitext(os.path.basename(path))[0]
+        db = database.SessionLocal()
+        try:
+            user = db.query(models.User).filter(models.User.username == username).first()
+            if user is None:
+                return f"{path}: no user '{username}'"
+            target, digest = store(path)
+            db_profile = db.query(models.Profile).filter(models.Profile.user_id == user.id).first()
+            if db_profile is None:
+                db_profile = models.Profile(user_id=user.id, full_name=user.username, skills="", experience="", education="")
+                db.add(db_profile)
+            db_profile.resume_path = target
+            db.commit()
+            merged = await ingest_resume(db, user.id, target, digest)
+            return f"{path}: {'merged' if merged else 'no changes'}"
+        except Exception as e:
+            return f"{path}: failed ({e})"
+        finally:
+            db.close()
+
+    async def main():
+        try:
+            limit = asyncio.Semaphore(args.concurrency)
+            for line in await asyncio.gather(*(import_one(p, limit) for p in args.files)):
+                print(line)
+        finally:
+            shutdown_pool()
+            await http_client.close_client()
+
+    asyncio.run(main())
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -21,11 +22,14 @@ class Profile(ProfileBase):
     id: int
     user_id: int
     resume_path: Optional[str] = None
-    recommendations: Optional[str] = None
 
     class Config:
         orm_mode = True
 
+class ProfileWithRecommendations(Profile):
+    # Cached recommendation JSON as stored; only sent with ?include=recommendations
+    recommendations: Optional[str] = None
+
 class UserBase(BaseModel):
     username: str
     email: str
@@ -41,6 +45,9 @@ class User(UserBase):
     class Config:
         orm_mode = True
 
+class UserWithRecommendations(User):
+    profile: Optional[ProfileWithRecommendations] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -60,6 +67,9 @@ class Job(BaseModel):
     class Config:
         orm_mode = True
 
+class JobMatch(Job):
+    shared_skills: int
+
 class Course(BaseModel):
     id: int
     title: str
@@ -70,3 +80,22 @@ class Course(BaseModel):
 
     class Config:
         orm_mode = True
+
+class RecommendationJob(BaseModel):
+    id: int
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class RecommendationStatus(BaseModel):
+    ready: bool
+    job: Optional[RecommendationJob] = None
+
+class BatchRecommendationRequest(BaseModel):
+    user_ids: Optional[List[int]] = None
+    only_empty: bool = True
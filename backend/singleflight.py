@@ -0,0 +1,129 @@
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import metrics
+import models
+
+# Cross-worker locking through the generation_locks table. Off by default since it
+# only pays off with several workers sharing the database cache backend.
+SINGLEFLIGHT_DB_LOCK = os.getenv("SINGLEFLIGHT_DB_LOCK", "false").lower() in ("1", "true", "yes")
+LOCK_TTL_SECONDS = int(os.getenv("SINGLEFLIGHT_LOCK_TTL_SECONDS", "120"))
+LOCK_WAIT_SECONDS = float(os.getenv("SINGLEFLIGHT_LOCK_WAIT_SECONDS", "90"))
+LOCK_POLL_SECONDS = float(os.getenv("SINGLEFLIGHT_LOCK_POLL_SECONDS", "0.5"))
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Abandoned(Exception):
+    """
+    The caller leading a flight stopped before producing a result.
+    """
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one execution. The work runs
+    in its own task, so a caller disconnecting does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            # Shared by every waiter, so not counted against the request that started it
+            with metrics.detached():
+                task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def lead(self, key: str) -> Optional[asyncio.Future]:
+        """
+        Register the caller as the one producing `key`, for work that has to run
+        in the caller itself, such as a stream it consumes. Returns None if
+        someone else already is. The caller must resolve the returned future;
+        callers of do() for the same key wait on it meanwhile.
+        """
+        if key in self._inflight:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return future
+
+    def _finish(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def pending(self, key: str) -> bool:
+        return key in self._inflight
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+
+def try_acquire(db: Session, key: str) -> bool:
+    """
+    Take the cross-worker lock for `key`, stealing it if the holder's lease expired.
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=LOCK_TTL_SECONDS)
+    db.add(models.GenerationLock(key=key, owner=OWNER, expires_at=expires_at))
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+    taken = db.query(models.GenerationLock).filter(
+        models.GenerationLock.key == key,
+        models.GenerationLock.expires_at < now
+    ).update({"owner": OWNER, "expires_at": expires_at}, synchronize_session=False)
+    db.commit()
+    return taken == 1
+
+
+def release(db: Session, key: str):
+    db.query(models.GenerationLock).filter(
+        models.GenerationLock.key == key,
+        models.GenerationLock.owner == OWNER
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+async def run_exclusive(
+    db: Session,
+    key: str,
+    fn: Callable[[], Awaitable[Any]],
+    poll: Callable[[], Optional[Any]]
+) -> Any:
+    """
+    Run `fn` while holding the database lock for `key`. While another worker holds
+    it, `poll` is called until it returns a result (typically a cache lookup).
+    If the wait times out the work is done anyway rather than failing the request.
+    The lock queries and `poll` block, so they run on a worker thread.
+    """
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while True:
+        if await asyncio.to_thread(try_acquire, db, key):
+            try:
+                return await fn()
+            finally:
+                await asyncio.to_thread(release, db, key)
+        result = await asyncio.to_thread(poll)
+        if result is not None:
+            return result
+        if time.monotonic() > deadline:
+            return await fn()
+        await asyncio.sleep(LOCK_POLL_SECONDS)
@@ -0,0 +1,268 @@
+import logging
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import database
+import models
+from ttl_cache import TTLCache
+
+SKILL_BACKFILL_BATCH = int(os.getenv("SKILL_BACKFILL_BATCH", "1000"))
+# Alias -> skill id never changes once written, so resolved ids are cached per process
+_ids = TTLCache(maxsize=50000, ttl=3600)
+
+# Common spellings mapped to one canonical name. Keys are squashed (see _squash),
+# so "React.js", "react js" and "ReactJS" all hit the "reactjs" entry.
+SKILL_ALIASES = {
+    "js": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "python3": "python",
+    "reactjs": "react",
+    "node": "nodejs",
+    "golang": "go",
+    "ml": "machine learning",
+    "ai": "artificial intelligence",
+    "fastapi": "fast api",
+    "postgres": "postgresql",
+    "k8s": "kubernetes",
+    "cpp": "c++",
+    "csharp": "c#",
+}
+
+_SPACE_RE = re.compile(r"\s+")
+_SQUASH_RE = re.compile(r"[\s\-_.]+")
+_TRIM = " \t.;:/|"
+
+ENTITIES = {
+    # name: (model, text column, association table, owner column)
+    "profiles": (models.Profile, "skills", models.profile_skills, "profile_id"),
+    "jobs": (models.Job, "required_skills", models.job_skills, "job_id"),
+    "courses": (models.Course, "tags", models.course_skills, "course_id"),
+}
+
+
+def _squash(skill: str) -> str:
+    return _SQUASH_RE.sub("", skill)
+
+
+def normalize_skill(skill: str) -> str:
+    """
+    Canonical spelling of a skill: lower case, single spaces, known aliases
+    folded ("ReactJS" -> "react", "ROS 2" -> "ros2").
+    """
+    s = _SPACE_RE.sub(" ", skill.lower()).strip(_TRIM)
+    key = _squash(s)
+    if key in SKILL_ALIASES:
+        return SKILL_ALIASES[key]
+    # Separators inside short tokens are spelling noise ("ros 2", "node-js")
+    return key if len(key) <= 6 and key.isalnum() else s
+
+
+def parse_skills(value: Optional[str]) -> List[str]:
+    """
+    Split a comma-separated skills/tags string into normalized, de-duplicated skills.
+    """
+    seen = []
+    for part in (value or "").split(","):
+        skill = normalize_skill(part)
+        if skill and skill not in seen:
+            seen.append(skill)
+    return seen
+
+
+def _lookup(db: Session, keys: List[str]) -> Dict[str, int]:
+    found = {}
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        rows = db.query(models.SkillAlias.alias, models.SkillAlias.skill_id).filter(
+            models.SkillAlias.alias.in_(chunk)
+        )
+        found.update(dict(rows))
+    return found
+
+
+def _create(db: Session, name: str, key: str) -> int:
+    try:
+        with db.begin_nested():
+            skill = db.query(models.Skill).filter(models.Skill.name == name).first()
+            if skill is None:
+                skill = models.Skill(name=name)
+                db.add(skill)
+                db.flush()
+            db.add(models.SkillAlias(alias=key, skill_id=skill.id))
+    except IntegrityError:
+        # Another worker created it first
+        return _lookup(db, [key])[key]
+    return skill.id
+
+
+def resolve(db: Session, names: Iterable[str], create: bool = True) -> Dict[str, int]:
+    """
+    Map normalized skill names to skill ids, creating unknown skills unless
+    `create` is False (then unknown names are left out). Spellings that squash
+    to the same key ("machine-learning", "machine learning") each get an entry.
+    """
+    names = [name for name in names if name]
+    keys = {_squash(name): name for name in names}
+    by_key: Dict[str, int] = {}
+    missing = []
+    for key in keys:
+        skill_id = _ids.get(key)
+        if skill_id is None:
+            missing.append(key)
+        else:
+            by_key[key] = skill_id
+    if missing:
+        found = _lookup(db, missing)
+        for key in missing:
+            skill_id = found.get(key)
+            if skill_id is not None:
+                _ids.set(key, skill_id)
+            elif create:
+                # Not cached: the caller's transaction may still roll back
+                skill_id = _create(db, keys[key], key)
+            if skill_id is not None:
+                by_key[key] = skill_id
+    return {name: by_key[_squash(name)] for name in names if _squash(name) in by_key}
+
+
+def _sync(db: Session, entity: str, owner_id: int, value: Optional[str]):
+    _, _, table, owner_column = ENTITIES[entity]
+    owner = table.c[owner_column]
+    wanted = set(resolve(db, parse_skills(value)).values())
+    current = {row[0] for row in db.execute(select(table.c.skill_id).where(owner == owner_id))}
+    removed = current - wanted
+    if removed:
+        db.execute(delete(table).where(owner == owner_id, table.c.skill_id.in_(removed)))
+    added = wanted - current
+    if added:
+        db.execute(insert(table), [{owner_column: owner_id, "skill_id": s} for s in added])
+
+
+def sync_profile_skills(db: Session, db_profile: models.Profile):
+    """
+    Bring profile_skills in line with Profile.skills. Does not commit.
+    """
+    if db_profile.id is None:
+        db.flush()
+    _sync(db, "profiles", db_profile.id, db_profile.skills)
+
+
+def profiles_with_all_skills(db: Session, names: Iterable[str], limit: int = 100, offset: int = 0,
+                             options: Sequence = ()) -> List[models.Profile]:
+    """
+    Profiles that have every one of `names`, e.g. ["ROS2", "Python"].
+    `options` are loader options for the profile query.
+    """
+    # Keyed like resolve(), so "machine-learning" and "machine learning" count once
+    wanted = {_squash(skill): skill for skill in (normalize_skill(n) for n in names) if skill}
+    ids = resolve(db, wanted.values(), create=False)
+    if not wanted or len(ids) < len(wanted):
+        return []
+    # Different names can still be aliases of one skill
+    skill_ids = set(ids.values())
+    table = models.profile_skills
+    matching = (
+        select(table.c.profile_id)
+        .where(table.c.skill_id.in_(skill_ids))
+        .group_by(table.c.profile_id)
+        .having(func.count() == len(skill_ids))
+    )
+    return (
+        db.query(models.Profile)
+        .options(*options)
+        .filter(models.Profile.id.in_(matching))
+        .order_by(models.Profile.id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
+
+def jobs_matching_profile(db: Session, profile_id: int, limit: int = 20) -> List[Tuple[models.Job, int]]:
+    """
+    Jobs sharing at least one skill with the profile, most shared skills first.
+    """
+    ps, js = models.profile_skills, models.job_skills
+    shared = func.count(js.c.skill_id).label("shared")
+    ranked = (
+        select(js.c.job_id, shared)
+        .join(ps, ps.c.skill_id == js.c.skill_id)
+        .where(ps.c.profile_id == profile_id)
+        .group_by(js.c.job_id)
+        .order_by(shared.desc(), js.c.job_id)
+        .limit(limit)
+        .subquery()
+    )
+    rows = (
+        db.query(models.Job, ranked.c.shared)
+        .join(ranked, ranked.c.job_id == models.Job.id)
+        .order_by(ranked.c.shared.desc(), models.Job.id)
+    )
+    return [(job, count) for job, count in rows]
+
+
+def backfill(db: Session, entities: Iterable[str] = tuple(ENTITIES), batch_size: int = SKILL_BACKFILL_BATCH) -> Dict[str, int]:
+    """
+    Parse the existing comma-separated columns into the association tables.
+    Walks each table by primary key in batches and commits per batch, so it
+    can be stopped and rerun at any point. The app never writes jobs or
+    courses itself, so rerun this after importing catalog rows.
+    """
+    summary = {}
+    for entity in entities:
+        model, column, table, owner_column = ENTITIES[entity]
+        started = time.perf_counter()
+        last_id, rows_done = 0, 0
+        while True:
+            batch = (
+                db.query(model.id, getattr(model, column))
+                .filter(model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            parsed = {owner_id: parse_skills(value) for owner_id, value in batch}
+            ids = resolve(db, {name for names in parsed.values() for name in names})
+            owner_ids = list(parsed)
+            db.execute(delete(table).where(table.c[owner_column].in_(owner_ids)))
+            links = [
+                {owner_column: owner_id, "skill_id": skill_id}
+                for owner_id, names in parsed.items()
+                for skill_id in {ids[name] for name in names}
+            ]
+            if links:
+                db.execute(insert(table), links)
+            db.commit()
+            last_id = owner_ids[-1]
+            rows_done += len(batch)
+        summary[entity] = rows_done
+        logging.info(f"Skill backfill '{entity}': {rows_done} rows in {time.perf_counter() - started:.2f}s")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Fill the skill association tables from the comma-separated columns")
+    parser.add_argument("entities", nargs="*", help=f"any of {', '.join(ENTITIES)} (default: all)")
+    parser.add_argument("--batch-size", type=int, default=SKILL_BACKFILL_BATCH)
+    args = parser.parse_args()
+    unknown = set(args.entities) - set(ENTITIES)
+    if unknown:
+        parser.error(f"unknown entities: {', '.join(sorted(unknown))}")
+
+    db = database.SessionLocal()
+    try:
+        print(json.dumps(backfill(db, args.entities or list(ENTITIES), args.batch_size), indent=2))
+    finally:
+        db.close()
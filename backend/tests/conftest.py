@@ -0,0 +1,32 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Settings are read at import time, so point everything at a scratch
+# database before any app module is imported.
+_tmp = tempfile.mkdtemp(prefix="backend-tests-")
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ.setdefault("LOG_FILE", "")
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+
+import pytest  # noqa: E402
+
+import database  # noqa: E402
+import migrations  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    migrations.upgrade()
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,33 @@
+import uuid
+
+import auth
+import models
+
+
+def _user(db):
+    name = f"u-{uuid.uuid4().hex[:8]}"
+    user = models.User(username=name, email=f"{name}@example.com", is_active=True)
+    db.add(user)
+    db.commit()
+    auth._principals.set(name, auth.Principal(user.id, name, True))
+    return user
+
+
+def test_deactivating_a_user_drops_the_cached_principal(db):
+    user = _user(db)
+    user.is_active = False
+    db.commit()
+    assert auth._principals.get(user.username) is None
+
+
+def test_renaming_or_deleting_a_user_drops_the_cached_principal(db):
+    user = _user(db)
+    old = user.username
+    user.username = f"{old}-renamed"
+    db.commit()
+    assert auth._principals.get(old) is None
+
+    auth._principals.set(user.username, auth.Principal(user.id, user.username, True))
+    db.delete(user)
+    db.commit()
+    assert auth._principals.get(user.username) is None
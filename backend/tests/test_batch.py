@@ -0,0 +1,72 @@
+import asyncio
+import json
+import uuid
+
+import ai_service
+import batch
+import database
+import model_router
+import models
+import recommender
+
+
+def _profile(db, skills):
+    user = models.User(username=f"u-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com")
+    db.add(user)
+    db.flush()
+    profile = models.Profile(user_id=user.id, skills=skills, experience="", education="", summary="")
+    db.add(profile)
+    db.commit()
+    return profile
+
+
+def test_profiles_edited_during_generation_are_not_overwritten(db, monkeypatch):
+    kept = _profile(db, f"python, {uuid.uuid4().hex}")
+    edited = _profile(db, f"ros2, {uuid.uuid4().hex}")
+    answer = {"courses": [{"title": "c"}], "jobs": [{"title": "j"}]}
+
+    async def generate(key, profile_data):
+        # The user saves their profile while the model is working
+        session = database.SessionLocal()
+        try:
+            profile = session.get(models.Profile, edited.id)
+            profile.skills = "go, kubernetes"
+            session.commit()
+        finally:
+            session.close()
+        return answer
+
+    monkeypatch.setattr(recommender, "generate_recommendations", generate)
+    summary = asyncio.run(batch.warm_recommendations(user_ids=[kept.user_id, edited.user_id], pack_size=1))
+
+    assert summary["updated"] == 1
+    assert summary["stale"] == 1
+    db.expire_all()
+    assert json.loads(db.get(models.Profile, kept.id).recommendations) == answer
+    fresh = db.get(models.Profile, edited.id)
+    assert fresh.skills == "go, kubernetes"
+    assert fresh.recommendations is None
+    assert fresh.version == 2
+
+
+def test_packed_prompt_uses_ordinal_ids(monkeypatch):
+    keys = ["a" * 64, "b" * 64]
+    seen = {}
+
+    async def complete(task, prompt, send, validate):
+        seen["prompt"] = prompt
+        content = {"results": [
+            {"id": 2, "courses": [{"title": "second"}], "jobs": [{"title": "j"}]},
+            {"id": "1", "courses": [{"title": "first"}], "jobs": [{"title": "j"}]},
+            {"id": 3, "courses": [{"title": "unknown"}], "jobs": [{"title": "j"}]},
+        ]}
+        return validate({"choices": [{"message": {"content": json.dumps(content)}}]})
+
+    monkeypatch.setattr(model_router, "complete", complete)
+    answers = asyncio.run(ai_service.request_batch_recommendations({k: {"skills": k[0]} for k in keys}))
+
+    assert "Profile id: 1" in seen["prompt"] and "Profile id: 2" in seen["prompt"]
+    assert keys[0] not in seen["prompt"]
+    assert answers[keys[0]]["courses"][0]["title"] == "first"
+    assert answers[keys[1]]["courses"][0]["title"] == "second"
+    assert set(answers) == set(keys)
@@ -0,0 +1,49 @@
+import numpy as np
+
+import embeddings
+
+
+def _rows(rows):
+    def rows_after(last_id):
+        batch = [(row_id, text) for row_id, text in rows if row_id > last_id]
+        if batch:
+            yield batch
+    return rows_after
+
+
+def test_update_truncates_vectors_left_by_a_crashed_build(tmp_path):
+    embedder = embeddings.HashingEmbedder(16)
+    index = embeddings.VectorIndex("jobs", directory=str(tmp_path))
+    first = [(1, "python developer"), (2, "ros2 robotics")]
+    assert index.update(embedder, _rows(first)) == 2
+
+    # A build that died after writing vectors but before their ids and meta
+    with open(index.vectors_path, "ab") as f:
+        f.write(embedder.embed(["orphaned"]).tobytes())
+    # and one that died part way through an id
+    with open(index.ids_path, "ab") as f:
+        f.write(b"\x03\x00\x00")
+
+    rows = first + [(3, "data engineer"), (4, "frontend react")]
+    assert index.update(embedder, _rows(rows)) == 2
+    index.load()
+
+    assert len(index) == 4
+    assert list(index._ids) == [1, 2, 3, 4]
+    assert np.allclose(index._matrix, embedder.embed([text for _, text in rows]))
+
+
+def test_update_resumes_after_ids_written_before_meta(tmp_path):
+    embedder = embeddings.HashingEmbedder(16)
+    index = embeddings.VectorIndex("courses", directory=str(tmp_path))
+    rows = [(1, "intro to python"), (2, "linear algebra")]
+    index.update(embedder, _rows(rows[:1]))
+    # Second batch reached both files but the meta still says last_id 1
+    with open(index.vectors_path, "ab") as f:
+        f.write(embedder.embed([rows[1][1]]).tobytes())
+    with open(index.ids_path, "ab") as f:
+        f.write(np.array([2], dtype=np.int64).tobytes())
+
+    assert index.update(embedder, _rows(rows)) == 0
+    index.load()
+    assert list(index._ids) == [1, 2]
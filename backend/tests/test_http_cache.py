@@ -0,0 +1,37 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import http_cache
+
+
+def _app():
+    app = FastAPI()
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/large")
+    def large():
+        return {"items": ["x" * 64] * 100}
+
+    http_cache.add_compression(app)
+    return app
+
+
+def test_every_response_varies_on_accept_encoding():
+    with TestClient(_app()) as client:
+        small = client.get("/small")
+        large = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert small.headers["vary"] == "Accept-Encoding"
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["vary"] == "Accept-Encoding"
+
+
+def test_etags_are_weak_and_compared_weakly():
+    etag = http_cache.make_etag("recommendations", 1, 2)
+    request = Request({"type": "http", "headers": [(b"if-none-match", etag.removeprefix("W/").encode())]})
+
+    assert etag.startswith('W/"')
+    assert http_cache.matches(request, etag)
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import uuid
+
+import database
+import jobs
+import models
+import recommender
+import resilience
+
+
+def _user(db):
+    user = models.User(username=f"u-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def test_concurrent_enqueues_create_one_pending_job(db):
+    user_id = _user(db)
+    barrier = threading.Barrier(4)
+    ids, errors = [], []
+
+    def enqueue():
+        session = database.SessionLocal()
+        try:
+            barrier.wait()
+            ids.append(jobs.enqueue_recommendations(session, user_id).id)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=enqueue) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(set(ids)) == 1
+    assert db.query(models.RecommendationJob).filter_by(user_id=user_id, status=jobs.PENDING).count() == 1
+
+
+def _profile_user(db):
+    user_id = _user(db)
+    db.add(models.Profile(user_id=user_id, skills="python"))
+    db.commit()
+    return user_id
+
+
+def test_jobs_deferred_on_open_circuit_are_not_reclaimed_at_once(db, monkeypatch):
+    calls = []
+
+    async def circuit_open(*args, **kwargs):
+        calls.append(args)
+        raise resilience.CircuitOpenError("Circuit 'openrouter' is open")
+
+    monkeypatch.setattr(recommender, "get_recommendations", circuit_open)
+    monkeypatch.setattr(jobs, "JOB_POLL_SECONDS", 0.1)
+    db.query(models.RecommendationJob).filter_by(status=jobs.PENDING).delete()
+    db.commit()
+    for _ in range(2):
+        jobs.enqueue_recommendations(db, _profile_user(db))
+
+    async def run_worker():
+        jobs._wakeup = asyncio.Event()
+        worker = asyncio.ensure_future(jobs._worker(0))
+        await asyncio.sleep(0.5)
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    asyncio.run(run_worker())
+
+    # Each job is tried once, then waits out the retry delay instead of spinning
+    assert len(calls) == 2
+    deferred = db.query(models.RecommendationJob).filter_by(status=jobs.PENDING).all()
+    assert len(deferred) == 2
+    assert all(job.attempts == 0 and job.started_at is not None for job in deferred)
+    assert jobs._claim_next(db) is None
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import database
+import metrics
+
+
+def test_failed_statements_do_not_leak_query_timers():
+    with database.engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.exec_driver_sql("SELECT * FROM no_such_table")
+        conn.exec_driver_sql("SELECT 1")
+        assert conn.info["query_started"] == []
+
+
+def test_detached_tasks_do_not_inherit_the_request():
+    async def scenario():
+        token = metrics.current_request.set(metrics.RequestStats({}))
+        try:
+            with metrics.detached():
+                background = asyncio.ensure_future(_current())
+            inherited = asyncio.ensure_future(_current())
+            return await background, await inherited
+        finally:
+            metrics.current_request.reset(token)
+
+    async def _current():
+        return metrics.current_request.get()
+
+    background, inherited = asyncio.run(scenario())
+    assert background is None
+    assert inherited is not None
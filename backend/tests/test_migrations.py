@@ -0,0 +1,28 @@
+import importlib
+
+from sqlalchemy import create_engine, text
+
+import migrations
+
+unique_profiles = importlib.import_module("migrations.0004_profiles_user_id_unique")
+
+
+def test_profiles_unique_index_removes_duplicates_and_orphans(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    # A database created by the old create_all() startup, before migrations
+    old_tables = [m for m in migrations.discover() if m.version < "0004"]
+    with engine.begin() as conn:
+        for migration in old_tables:
+            migration.upgrade(conn)
+        conn.execute(text("INSERT INTO users (id, username) VALUES (1, 'a'), (2, 'b')"))
+        conn.execute(text(
+            "INSERT INTO profiles (id, user_id, full_name) VALUES "
+            "(1, 1, 'old'), (2, 1, 'new'), (3, 2, 'only'), (4, 99, 'orphan'), (5, NULL, 'none')"
+        ))
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        unique_profiles.upgrade(conn)
+        unique_profiles.upgrade(conn)
+        rows = conn.execute(text("SELECT id, user_id, full_name FROM profiles ORDER BY id")).fetchall()
+
+    assert [tuple(r) for r in rows] == [(2, 1, "new"), (3, 2, "only"), (5, None, "none")]
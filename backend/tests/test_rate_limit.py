@@ -0,0 +1,78 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import rate_limit
+
+
+def _request(forwarded=None, peer="10.0.0.1"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded is not None else []
+    return Request({"type": "http", "method": "POST", "path": "/token", "headers": headers, "client": (peer, 1234)})
+
+
+@pytest.mark.parametrize("proxies, forwarded, expected", [
+    (0, "6.6.6.6, 1.2.3.4", "10.0.0.1"),
+    # The leftmost entry is whatever the client sent
+    (1, "6.6.6.6, 1.2.3.4", "1.2.3.4"),
+    (1, "1.2.3.4", "1.2.3.4"),
+    (2, "6.6.6.6, 1.2.3.4, 172.16.0.5", "1.2.3.4"),
+    # Fewer entries than proxies: the header did not come through them
+    (2, "6.6.6.6", "10.0.0.1"),
+    (1, "", "10.0.0.1"),
+    (1, None, "10.0.0.1"),
+])
+def test_client_ip_counts_trusted_hops_from_the_right(monkeypatch, proxies, forwarded, expected):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUSTED_PROXIES", proxies)
+    assert rate_limit.client_ip(_request(forwarded)) == expected
+
+
+def _auth_limits(monkeypatch, account, ip):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "store", rate_limit.MemoryStore())
+    monkeypatch.setitem(rate_limit.LIMITS, "auth", {"user": None, "account": account, "ip": ip})
+
+
+def test_auth_is_limited_per_username_across_addresses(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUSTED_PROXIES", 0)
+    _auth_limits(monkeypatch, rate_limit.Limit(2, 1), rate_limit.Limit(100, 100))
+
+    async def attempt(username, peer):
+        await rate_limit.check("auth", _request(peer=peer), username=username)
+
+    asyncio.run(attempt("alice", "10.0.0.1"))
+    asyncio.run(attempt("Alice", "10.0.0.2"))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(attempt("alice", "10.0.0.3"))
+    assert exc.value.status_code == 429
+    # Another user behind the same NAT address is unaffected
+    asyncio.run(attempt("bob", "10.0.0.3"))
+
+
+def test_rejected_requests_spend_from_no_bucket(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUSTED_PROXIES", 0)
+    _auth_limits(monkeypatch, rate_limit.Limit(1, 1), rate_limit.Limit(3, 0.001))
+
+    async def attempt(username):
+        await rate_limit.check("auth", _request(), username=username)
+
+    asyncio.run(attempt("alice"))
+    for _ in range(5):
+        with pytest.raises(HTTPException):
+            asyncio.run(attempt("alice"))
+    # The refused attempts left the IP bucket alone
+    asyncio.run(attempt("bob"))
+    asyncio.run(attempt("carol"))
+
+
+def test_database_store_peek_does_not_spend(db):
+    store = rate_limit.DatabaseStore()
+    key = f"test:peek:{uuid.uuid4().hex}"
+    limit = rate_limit.Limit(1, 0.001)
+
+    assert store.peek(key, limit) == 0
+    assert store.take(key, limit) == 0
+    assert store.peek(key, limit) > 0
+    assert store.take(key, limit) > 0
@@ -0,0 +1,57 @@
+import threading
+
+import database
+import models
+import rec_cache
+
+
+def test_concurrent_fills_of_one_key_both_succeed():
+    store = rec_cache.DatabaseStore(maxsize=100, ttl=3600)
+    key = rec_cache.fingerprint({"skills": "python, ros2"})
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def fill(n):
+        session = database.SessionLocal()
+        try:
+            barrier.wait()
+            store.set(session, key, {"jobs": [n]})
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=fill, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    session = database.SessionLocal()
+    try:
+        assert session.query(models.RecommendationCache).filter_by(key=key).count() == 1
+        assert store.get(session, key)["jobs"][0] in range(4)
+    finally:
+        session.close()
+
+
+def test_set_many_overwrites_rows_another_worker_inserted(db):
+    store = rec_cache.DatabaseStore(maxsize=100, ttl=3600)
+    other = rec_cache.DatabaseStore(maxsize=100, ttl=3600)
+    other.set(db, "k1", {"v": "old"})
+    store.set_many(db, {"k1": {"v": "new"}, "k2": {"v": 2}})
+    assert store.get(db, "k1") == {"v": "new"}
+    assert store.get(db, "k2") == {"v": 2}
+
+
+def test_eviction_runs_every_n_writes(db, monkeypatch):
+    monkeypatch.setattr(rec_cache, "REC_CACHE_EVICT_EVERY", 3)
+    store = rec_cache.DatabaseStore(maxsize=1, ttl=3600)
+    db.query(models.RecommendationCache).delete()
+    db.commit()
+    store.set(db, "a", {})
+    store.set(db, "b", {})
+    assert db.query(models.RecommendationCache).count() == 2
+    store.set(db, "c", {})
+    assert db.query(models.RecommendationCache).count() == 1
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import ai_service
+import database
+import models
+import recommender
+import singleflight
+
+
+def _profile(db, skills):
+    user = models.User(username=f"u-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com")
+    db.add(user)
+    db.flush()
+    profile = models.Profile(user_id=user.id, skills=skills, experience="", education="", summary="")
+    db.add(profile)
+    db.commit()
+    return profile.id
+
+
+async def _collect(profile_id):
+    db = database.SessionLocal()
+    try:
+        profile = db.get(models.Profile, profile_id)
+        return [pair async for pair in recommender.stream_recommendations(db, profile)]
+    finally:
+        db.close()
+
+
+def test_concurrent_first_streams_share_one_model_call(db, monkeypatch):
+    calls = []
+
+    async def fake_stream(profile_data):
+        calls.append(profile_data)
+        await asyncio.sleep(0.05)
+        yield "courses", {"title": "ROS 2 basics"}
+        await asyncio.sleep(0.05)
+        yield "jobs", {"title": "Robotics engineer"}
+
+    monkeypatch.setattr(ai_service, "stream_ai_recommendations", fake_stream)
+    first = _profile(db, f"ros2, {uuid.uuid4().hex}")
+    skills = db.get(models.Profile, first).skills
+    second = _profile(db, skills)
+
+    async def both():
+        return await asyncio.gather(_collect(first), _collect(second))
+
+    a, b = asyncio.run(both())
+    assert len(calls) == 1
+    assert a == b == [("courses", {"title": "ROS 2 basics"}), ("jobs", {"title": "Robotics engineer"})]
+
+
+def test_waiters_generate_themselves_when_the_leading_stream_is_closed(db, monkeypatch):
+    async def fake_stream(profile_data):
+        yield "courses", {"title": "first"}
+        await asyncio.sleep(1)
+        yield "jobs", {"title": "never reached"}
+
+    async def fake_request(profile_data):
+        return {"courses": [{"title": "own"}], "jobs": []}
+
+    monkeypatch.setattr(ai_service, "stream_ai_recommendations", fake_stream)
+    monkeypatch.setattr(ai_service, "request_ai_recommendations", fake_request)
+    profile_id = _profile(db, f"python, {uuid.uuid4().hex}")
+    profile = db.get(models.Profile, profile_id)
+    key = recommender.rec_cache.fingerprint(recommender.rec_cache.prompt_inputs(profile))
+    data = recommender.rec_cache.prompt_inputs(profile)
+
+    async def scenario():
+        session = database.SessionLocal()
+        stream = recommender.stream_recommendations(session, session.get(models.Profile, profile_id))
+        await stream.__anext__()
+        waiter = asyncio.ensure_future(recommender.generate_recommendations(key, data))
+        await asyncio.sleep(0)
+        await stream.aclose()
+        session.close()
+        return await waiter
+
+    assert asyncio.run(scenario()) == {"courses": [{"title": "own"}], "jobs": []}
+
+
+def test_lock_waiters_poll_off_the_event_loop(db):
+    key = f"lock-{uuid.uuid4().hex}"
+    db.add(models.GenerationLock(key=key, owner="other-worker", expires_at=datetime.utcnow() + timedelta(minutes=5)))
+    db.commit()
+    polled_on = []
+
+    def poll():
+        polled_on.append(threading.get_ident())
+        return {"courses": [], "jobs": []}
+
+    async def generate():
+        raise AssertionError("the lock holder is generating it")
+
+    result = asyncio.run(singleflight.run_exclusive(db, key, generate, poll))
+
+    assert result == {"courses": [], "jobs": []}
+    assert polled_on and threading.get_ident() not in polled_on
@@ -0,0 +1,52 @@
+import asyncio
+import uuid
+
+import database
+import models
+import resume_pipeline
+
+
+def test_analyze_resume_survives_a_concurrent_insert_of_the_same_file(db, monkeypatch):
+    digest = uuid.uuid4().hex
+    # Another worker inserts the row between our lookup and our insert
+    other = database.SessionLocal()
+    other.add(models.ResumeExtraction(content_hash=digest))
+    other.commit()
+    other.close()
+    real_find = resume_pipeline._find
+    lookups = []
+
+    def find(db, d):
+        lookups.append(d)
+        return None if len(lookups) == 1 else real_find(db, d)
+
+    monkeypatch.setattr(resume_pipeline, "_find", find)
+
+    async def extract(path):
+        return "Jane Doe. Python, ROS2."
+
+    async def parse(text):
+        return {"skills": "Python, ROS2"}
+
+    monkeypatch.setattr(resume_pipeline, "_extract", extract)
+    monkeypatch.setattr(resume_pipeline, "_parse", parse)
+
+    parsed = asyncio.run(resume_pipeline.analyze_resume(db, "/dev/null", digest))
+    assert parsed == {"skills": "Python, ROS2"}
+    assert resume_pipeline.is_parsed(db, digest)
+
+
+def test_failed_parse_is_not_reported_as_parsed(db, monkeypatch):
+    digest = uuid.uuid4().hex
+
+    async def extract(path):
+        return "text"
+
+    async def parse(text):
+        return None
+
+    monkeypatch.setattr(resume_pipeline, "_extract", extract)
+    monkeypatch.setattr(resume_pipeline, "_parse", parse)
+
+    assert asyncio.run(resume_pipeline.analyze_resume(db, "/dev/null", digest)) is None
+    assert not resume_pipeline.is_parsed(db, digest)
@@ -0,0 +1,42 @@
+import uuid
+
+import models
+import skills
+
+
+def test_profiles_with_all_skills_ignores_spelling_variants(db):
+    user = models.User(username=f"u-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com")
+    db.add(user)
+    db.flush()
+    profile = models.Profile(user_id=user.id, skills="Machine Learning, Python, ROS 2")
+    db.add(profile)
+    skills.sync_profile_skills(db, profile)
+    db.commit()
+
+    found = skills.profiles_with_all_skills(db, ["machine-learning", "Machine Learning", "python", "ros2", "ROS 2"])
+    assert [p.id for p in found] == [profile.id]
+    assert skills.profiles_with_all_skills(db, ["python", "haskell"]) == []
+
+
+def test_backfill_handles_spellings_that_squash_together(db):
+    user = models.User(username=f"u-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com")
+    db.add(user)
+    db.flush()
+    profile = models.Profile(user_id=user.id, skills="machine-learning, Machine Learning, deep-learning")
+    other = models.Profile(user_id=None, skills="deep learning")
+    db.add_all([profile, other])
+    db.commit()
+
+    skills.backfill(db, ["profiles"])
+
+    linked = db.execute(
+        models.profile_skills.select().where(models.profile_skills.c.profile_id.in_([profile.id, other.id]))
+    ).fetchall()
+    assert len([row for row in linked if row.profile_id == profile.id]) == 2
+    assert len([row for row in linked if row.profile_id == other.id]) == 1
+
+
+def test_resolve_returns_every_spelling(db):
+    ids = skills.resolve(db, ["data-science", "data science"])
+    assert set(ids) == {"data-science", "data science"}
+    assert len(set(ids.values())) == 1
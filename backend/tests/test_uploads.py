@@ -0,0 +1,67 @@
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+import models
+import uploads
+
+
+def _app(max_bytes):
+    app = FastAPI()
+    reads = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        reads.append(len(await file.read()))
+        return {"size": reads[-1]}
+
+    app.add_middleware(uploads.UploadSizeLimit, paths=["/upload"], max_bytes=max_bytes)
+    return app, reads
+
+
+def test_oversized_uploads_are_rejected_before_the_body_is_parsed():
+    app, reads = _app(max_bytes=1024)
+    big = b"x" * (uploads._MULTIPART_OVERHEAD + 2048)
+
+    def chunks():
+        for i in range(0, len(big), 4096):
+            yield big[i:i + 4096]
+
+    with TestClient(app) as client:
+        small = client.post("/upload", files={"file": ("cv.pdf", b"x" * 100)})
+        declared = client.post("/upload", files={"file": ("cv.pdf", big)})
+        streamed = client.post("/upload", content=chunks(), headers={"Content-Type": "multipart/form-data; boundary=b"})
+
+    assert small.status_code == 200
+    assert declared.status_code == 413
+    assert streamed.status_code == 413
+    assert reads == [100]
+
+
+def test_prune_keeps_referenced_and_recent_uploads(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    old = time.time() - 2 * uploads.UPLOAD_PRUNE_GRACE_SECONDS
+
+    def stored(name, mtime=None):
+        path = uploads.content_path(name, ".pdf")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+        if mtime:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    kept = stored(uuid.uuid4().hex, old)
+    orphan = stored(uuid.uuid4().hex, old)
+    recent = stored(uuid.uuid4().hex)
+    user = models.User(username=f"u-{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com")
+    db.add(user)
+    db.flush()
+    db.add(models.Profile(user_id=user.id, resume_path=kept))
+    db.commit()
+
+    assert uploads.prune(db) == 1
+    assert os.path.exists(kept) and os.path.exists(recent)
+    assert not os.path.exists(orphan)
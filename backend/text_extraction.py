@@ -0,0 +1,60 @@
+import os
+
+# Kept free of app imports: this module is loaded in the extraction process pool.
+
+
+class ExtractionError(Exception):
+    pass
+
+
+def _extract_pdf(path: str) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ExtractionError("PDF support requires the 'pypdf' package")
+    reader = PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def _extract_docx(path: str) -> str:
+    try:
+        import docx
+    except ImportError:
+        raise ExtractionError("DOCX support requires the 'python-docx' package")
+    document = docx.Document(path)
+    return "\n".join(paragraph.text for paragraph in document.paragraphs)
+
+
+def _extract_txt(path: str) -> str:
+    with open(path, "rb") as f:
+        raw = f.read()
+    for encoding in ("utf-8", "latin-1"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode("utf-8", errors="ignore")
+
+
+EXTRACTORS = {
+    ".pdf": _extract_pdf,
+    ".docx": _extract_docx,
+    ".txt": _extract_txt,
+    ".md": _extract_txt,
+}
+
+
+def extract_text(path: str) -> str:
+    """
+    Plain text of a resume file, chosen by extension.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    extractor = EXTRACTORS.get(ext)
+    if extractor is None:
+        raise ExtractionError(f"Unsupported resume format: {ext or 'unknown'}")
+    try:
+        return extractor(path)
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"Could not read {os.path.basename(path)}: {e}")
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import time
+from typing import Iterable, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+import models
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SIZE = 256 * 1024
+# Room for the multipart boundaries and part headers around the file itself
+_MULTIPART_OVERHEAD = 64 * 1024
+# Unreferenced files younger than this are kept: their upload may not be
+# committed to a profile yet
+UPLOAD_PRUNE_GRACE_SECONDS = int(os.getenv("UPLOAD_PRUNE_GRACE_SECONDS", "3600"))
+
+_EXT_RE = re.compile(r"^\.[a-z0-9]{1,8}$")
+
+
+def _extension(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if _EXT_RE.match(ext) else ""
+
+
+def content_path(digest: str, ext: str) -> str:
+    # Fan out by hash prefix so no directory grows too large
+    return os.path.join(UPLOAD_DIR, digest[:2], f"{digest}{ext}")
+
+
+def _too_large():
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"
+    )
+
+
+def _publish(tmp_path: str, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        # Same content is already stored; the new mtime keeps prune() off it
+        # until the profile pointing at it is committed
+        os.remove(tmp_path)
+        os.utime(path)
+    else:
+        os.replace(tmp_path, path)
+
+
+async def save_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[str, str, int]:
+    """
+    Stream an upload to content-addressed storage in chunks, hashing as it goes.
+    All disk I/O runs in worker threads so the event loop stays free.
+    Returns (path, sha256 hex digest, size in bytes).
+    """
+    if getattr(file, "size", None) and file.size > max_bytes:
+        raise _too_large()
+
+    tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large()
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+        path = content_path(digest.hexdigest(), _extension(file.filename))
+        await asyncio.to_thread(_publish, tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path, digest.hexdigest(), size
+
+
+class UploadSizeLimit:
+    """
+    Rejects oversized upload requests before Starlette spools the body to disk.
+    A Content-Length over the cap gets a 413 without reading anything; bodies
+    without one are counted as they arrive and cut off at the cap.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_request_bytes = max_bytes + _MULTIPART_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_request_bytes:
+            error = _too_large()
+            await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def counted_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_request_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing as they are
+                    raise _too_large()
+            return message
+
+        await self.app(scope, counted_receive, send)
+
+
+def prune(db: Session, grace_seconds: int = UPLOAD_PRUNE_GRACE_SECONDS) -> int:
+    """
+    Delete stored uploads that no profile points at any more, such as replaced
+    resumes and temp files of interrupted uploads. Returns the number removed.
+    """
+    referenced = {
+        os.path.normpath(path)
+        for (path,) in db.query(models.Profile.resume_path).filter(models.Profile.resume_path.isnot(None))
+    }
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    for root, _, files in os.walk(UPLOAD_DIR):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if path in referenced:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                # Removed or replaced meanwhile
+                pass
+    return removed